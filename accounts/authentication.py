@@ -0,0 +1,72 @@
+'''
+CachedJWTAuthentication: JWTAuthentication sin consultar la tabla de usuarios en cada petición.
+
+El usuario se resuelve con el user_id del token. Los campos que deciden el acceso (username, is_active,
+is_staff, is_superuser) se guardan por usuario en la caché ACCOUNTS_CACHE_ALIAS, acotada por MAX_ENTRIES
+y TIMEOUT. request.user es un User con el resto de los campos diferidos: email, password, etc. se cargan
+de la base solo si la vista los lee, y sirve tal cual como clave foránea (Rating.user, ReportJob.requested_by).
+
+signals.py borra la entrada al guardar o borrar un usuario (desactivación, cambio de contraseña o de
+permisos). Con varios procesos la caché debe ser compartida (BOBEDA_REDIS_URL); si no, es locmem por
+proceso con un TIMEOUT corto, lo que tardan los demás procesos en ver el cambio. Al faltar en la caché
+la fila se lee del primario: una réplica atrasada volvería a cachear, p. ej., is_active=True.
+Los update() sobre User no emiten señales: llamar a invalidar().
+'''
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+CAMPOS = ('username', 'is_active', 'is_staff', 'is_superuser')
+
+
+def get_cache():
+    return caches[getattr(settings, 'ACCOUNTS_CACHE_ALIAS', 'default')]
+
+
+def clave(user_id):
+    return f'accounts:usuario:{user_id}'
+
+
+def invalidar(user_id):
+    get_cache().delete(clave(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def datos(self, user_id):
+        """Campos cacheados del usuario; la contraseña solo como el hash que compara CHECK_REVOKE_TOKEN."""
+        cache = get_cache()
+        datos = cache.get(clave(user_id))
+        if datos is None:
+            datos = (
+                self.user_model.objects.using(DEFAULT_DB_ALIAS).filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values('pk', 'password', *CAMPOS)
+                .first()
+            )
+            if datos is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            datos['password'] = get_md5_hash_password(datos['password'])
+            cache.set(clave(user_id), datos)
+        return datos
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        datos = self.datos(user_id)
+        if api_settings.CHECK_USER_IS_ACTIVE and not datos['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != datos['password']:
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        # from_db recibe los valores en el orden de los campos del modelo; los que faltan quedan diferidos
+        cargados = {self.user_model._meta.pk.attname: datos['pk'], **{campo: datos[campo] for campo in CAMPOS}}
+        campos = [campo.attname for campo in self.user_model._meta.concrete_fields if campo.attname in cargados]
+        # Los valores cacheados vienen del primario
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, campos, [cargados[campo] for campo in campos])
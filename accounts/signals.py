@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidar
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidar_usuario_cacheado(sender, instance, **kwargs):
+    user_id = instance.pk
+    invalidar(user_id)
+    # Otra vez tras el commit: una petición concurrente pudo cachear la fila anterior mientras tanto
+    transaction.on_commit(lambda: invalidar(user_id))
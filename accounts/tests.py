@@ -1,3 +1,72 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from bobeda.routers import PrimaryReplicaRouter
+from libros.models import Author, Book, Rating
+
+from .authentication import CachedJWTAuthentication, api_settings, clave, get_cache, invalidar
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.usuario = User.objects.create_user('lector', 'lector@example.com', 'secreta')
+        self.libro = Book.objects.create(
+            title='Libro', author=Author.objects.create(name='Autor'), published_date=date(2000, 1, 1), isbn='1'
+        )
+        token = self.client.post(reverse('login'), {'username': 'lector', 'password': 'secreta'}).json()['access']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def calificar(self, score=4):
+        return self.client.post(reverse('rating-create'), {'book': self.libro.pk, 'score': score}, format='json')
+
+    def consultas_a_usuarios(self, score=4):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.calificar(score)
+        self.assertEqual(response.status_code, 201)
+        return [c['sql'] for c in consultas if '"auth_user"' in c['sql']]
+
+    def test_sin_consultar_usuarios_con_la_cache_llena(self):
+        self.assertEqual(len(self.consultas_a_usuarios()), 1)
+        Rating.objects.all().delete()
+        self.assertEqual(self.consultas_a_usuarios(5), [])
+        self.assertEqual(Rating.objects.get().user, self.usuario)
+
+    def test_desactivar_invalida(self):
+        self.calificar()
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertIsNone(get_cache().get(clave(self.usuario.pk)))
+        self.assertEqual(self.calificar().status_code, 401)
+
+    @mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True)  # simplejwt no relee override_settings
+    def test_cambio_de_contrasena_revoca_el_token(self):
+        token = AccessToken.for_user(self.usuario)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.calificar().status_code, 201)
+        self.usuario.set_password('otra')
+        self.usuario.save()
+        self.assertEqual(self.calificar().status_code, 401)
+
+    def test_campos_no_cacheados_se_cargan_al_leerlos(self):
+        user = CachedJWTAuthentication().get_user(AccessToken.for_user(self.usuario))
+        with self.assertNumQueries(0):
+            self.assertEqual((user.pk, user.username, user.is_staff), (self.usuario.pk, 'lector', False))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'lector@example.com')
 
-# Create your tests here.
+    def test_sin_cache_lee_del_primario(self):
+        invalidar(self.usuario.pk)
+        # Una réplica atrasada podría volver a cachear un usuario ya desactivado
+        with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', return_value='replica-atrasada'):
+            user = CachedJWTAuthentication().get_user(AccessToken.for_user(self.usuario))
+        self.assertEqual((user.pk, user.is_active, user._state.db), (self.usuario.pk, True, 'default'))
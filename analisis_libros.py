@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*- 
 # NathalyCoronel-Reporte
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -7,39 +8,99 @@ import requests
 import os
 import sys
 import io
+import functools
+import json
+import time
+import math
+import re
+import shutil
+import argparse
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Image, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 
-# Configurar codificación UTF-8
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-
 # --- Configuración inicial ---
 REPORTS_DIR = "reportes"
 os.makedirs(REPORTS_DIR, exist_ok=True)
 
+API_URL = 'http://127.0.0.1:8000/api/books/'
+
 # --- 1. Función para obtener datos desde la API ---
-def fetch_libros_desde_api():
+def crear_sesion(max_workers=4, reintentos=3, backoff=0.5):
+    """Sesión con pool de conexiones y reintentos con backoff exponencial para GET."""
+    session = requests.Session()
+    retry = Retry(
+        total=reintentos,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _fetch_pagina(session, url, pagina, page_size, timeout, params=None):
+    response = session.get(url, params={**(params or {}), 'page': pagina, 'page_size': page_size}, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+def _fetch_huella(session, url, timeout):
+    """Conteo y suma de ids del catálogo (/api/books/huella/)."""
+    response = session.get(url.rstrip('/') + '/huella/', timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+def descargar_paginas(session, url, params=None, page_size=200, max_workers=4, timeout=(3.05, 30)):
+    """Descarga todas las páginas (la primera secuencial, el resto en paralelo) y las une en orden."""
+    primera = _fetch_pagina(session, url, 1, page_size, timeout, params)
+    if isinstance(primera, list):  # API sin paginación
+        return pd.DataFrame(primera)
+
+    paginas = {1: pd.DataFrame(primera['results'])}
+    por_pagina = len(primera['results']) or 1  # El servidor puede limitar page_size
+    total_paginas = max(1, math.ceil(primera['count'] / por_pagina))
+    # Descarga el resto de páginas en paralelo (acotado por max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {
+            executor.submit(_fetch_pagina, session, url, pagina, por_pagina, timeout, params): pagina
+            for pagina in range(2, total_paginas + 1)
+        }
+        for futuro in as_completed(futuros):
+            paginas[futuros[futuro]] = pd.DataFrame(futuro.result()['results'])
+
+    no_vacias = [paginas[pagina] for pagina in sorted(paginas) if not paginas[pagina].empty]
+    return pd.concat(no_vacias, ignore_index=True) if no_vacias else pd.DataFrame()
+
+def _validar_columnas(df):
+    # Validar columnas críticas
+    required_columns = ['title', 'genres', 'ratings']
+    for col in required_columns:
+        if col not in df.columns:
+            print(f"⚠️ Columna '{col}' no encontrada en los datos.")
+            return False
+    return True
+
+def fetch_libros_desde_api(url=API_URL, page_size=200, max_workers=4, timeout=(3.05, 30), reintentos=3, backoff=0.5):
     try:
-        response = requests.get('http://127.0.0.1:8000/api/books/')
-        response.raise_for_status()
-        data = response.json()
-        
-        if not data:
+        with crear_sesion(max_workers, reintentos, backoff) as session:
+            df = descargar_paginas(session, url, None, page_size, max_workers, timeout)
+
+        if df.empty:
             print("⚠️ La API no devolvió datos.")
             return pd.DataFrame()
         
-        df = pd.DataFrame(data)
-        
-        # Validar columnas críticas
-        required_columns = ['title', 'genres', 'ratings']
-        for col in required_columns:
-            if col not in df.columns:
-                print(f"⚠️ Columna '{col}' no encontrada en los datos.")
-                return pd.DataFrame()
+        if not _validar_columnas(df):
+            return pd.DataFrame()
         
         print("\n✅ Datos cargados correctamente. Primeras filas:")
         print(df[['title', 'genres']].head())
@@ -52,6 +113,105 @@ def fetch_libros_desde_api():
         print(f"❌ Error inesperado al obtener datos: {e}")
         return pd.DataFrame()
 
+# --- 1b. Snapshot local columnar (Feather) con sincronización incremental ---
+SNAPSHOT_DIR = ".cache_libros"
+SNAPSHOT_TABLAS = ('books', 'genres', 'ratings')
+SNAPSHOT_SOLAPE = pd.Timedelta(minutes=5)  # Margen para transacciones que confirmaron tarde
+
+def _explotar(df, columna):
+    """Lista anidada → tabla plana con book_id (una fila por género o calificación)."""
+    serie = df.set_index('id')[columna].explode().dropna()
+    if serie.empty:
+        return pd.DataFrame({'book_id': pd.Series(dtype='int64')})
+    tabla = pd.DataFrame(serie.tolist())
+    tabla.insert(0, 'book_id', serie.index.to_numpy())
+    return tabla
+
+def normalizar_libros(df):
+    return {
+        'books': df.drop(columns=['genres', 'ratings']).reset_index(drop=True),
+        'genres': _explotar(df, 'genres'),
+        'ratings': _explotar(df, 'ratings'),
+    }
+
+def ensamblar_libros(tablas, columnas=None):
+    """Reconstruye el DataFrame con la misma forma que devuelve /api/books/."""
+    df = tablas['books'].sort_values('id').reset_index(drop=True)
+    for columna in ('genres', 'ratings'):
+        tabla = tablas[columna]
+        agrupados = {}
+        registros = tabla.drop(columns='book_id').to_dict('records')
+        for book_id, registro in zip(tabla['book_id'].tolist(), registros):
+            agrupados.setdefault(book_id, []).append(registro)
+        df[columna] = [agrupados.get(book_id, []) for book_id in df['id'].tolist()]
+    return df[columnas] if columnas else df
+
+def guardar_snapshot(tablas, url, columnas, snapshot_dir=SNAPSHOT_DIR):
+    os.makedirs(snapshot_dir, exist_ok=True)
+    try:
+        for nombre in SNAPSHOT_TABLAS:
+            temporal = os.path.join(snapshot_dir, f'{nombre}.feather.tmp')
+            tablas[nombre].reset_index(drop=True).to_feather(temporal)
+            os.replace(temporal, os.path.join(snapshot_dir, f'{nombre}.feather'))
+    except ImportError:  # Feather necesita pyarrow
+        print("⚠️ pyarrow no está instalado; no se guarda el snapshot local.")
+        return
+    watermark = pd.to_datetime(tablas['books']['updated_at'], utc=True, format='ISO8601').max()
+    meta = {'url': url, 'watermark': watermark.isoformat(), 'columnas': list(columnas)}
+    with open(os.path.join(snapshot_dir, 'meta.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(meta, archivo)
+
+def leer_snapshot(url, snapshot_dir=SNAPSHOT_DIR):
+    """Devuelve (tablas, meta) o None si no hay snapshot válido para esta URL."""
+    try:
+        with open(os.path.join(snapshot_dir, 'meta.json'), encoding='utf-8') as archivo:
+            meta = json.load(archivo)
+        if meta.get('url') != url:
+            return None
+        tablas = {nombre: pd.read_feather(os.path.join(snapshot_dir, f'{nombre}.feather')) for nombre in SNAPSHOT_TABLAS}
+        return tablas, meta
+    except (OSError, ValueError, ImportError):  # Sin pyarrow se descarga completo
+        return None
+
+def cargar_libros(url=API_URL, snapshot_dir=SNAPSHOT_DIR, page_size=200, max_workers=4, timeout=(3.05, 30), reintentos=3, backoff=0.5):
+    """Carga el catálogo desde el snapshot local y pide a la API solo los libros modificados desde la última sincronización."""
+    snapshot = leer_snapshot(url, snapshot_dir)
+    if snapshot is None or 'updated_at' not in snapshot[0]['books']:
+        df = fetch_libros_desde_api(url, page_size, max_workers, timeout, reintentos, backoff)
+        if not df.empty and 'updated_at' in df.columns:
+            guardar_snapshot(normalizar_libros(df), url, df.columns, snapshot_dir)
+        return df
+
+    tablas, meta = snapshot
+    desde = pd.Timestamp(meta['watermark']) - SNAPSHOT_SOLAPE
+    try:
+        with crear_sesion(max_workers, reintentos, backoff) as session:
+            delta = descargar_paginas(session, url, {'updated_since': desde.isoformat()}, page_size, max_workers, timeout)
+            huella = _fetch_huella(session, url, timeout)  # Después del delta: detecta bajas
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ No se pudo sincronizar con la API ({e}); se usa el snapshot local.")
+        return ensamblar_libros(tablas, meta['columnas'])
+
+    if not delta.empty:
+        nuevas = normalizar_libros(delta)
+        ids = set(delta['id'].tolist())
+        for nombre, columna in (('books', 'id'), ('genres', 'book_id'), ('ratings', 'book_id')):
+            partes = [parte for parte in (tablas[nombre][~tablas[nombre][columna].isin(ids)], nuevas[nombre]) if not parte.empty]
+            tablas[nombre] = pd.concat(partes, ignore_index=True) if partes else nuevas[nombre]
+
+    # Los ids no se reutilizan: con el mismo conteo, una baja más un alta que el delta no trajo cambia la suma
+    ids = tablas['books']['id']
+    if (len(ids), int(ids.sum())) != (huella['count'], huella['id_sum']):
+        print("⚠️ Los libros del snapshot no coinciden con los del servidor; se descarga completo.")
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        return cargar_libros(url, snapshot_dir, page_size, max_workers, timeout, reintentos, backoff)
+
+    if not delta.empty:
+        guardar_snapshot(tablas, url, meta['columnas'], snapshot_dir)
+    df = ensamblar_libros(tablas, meta['columnas'])
+    print(f"\n✅ Snapshot local actualizado ({len(delta)} libros modificados, {len(df)} en total).")
+    return df
+
 # --- 2. Función para obtener información de géneros ---
 def obtener_info_generos(df):
     generos_info = {}
@@ -68,6 +228,23 @@ def obtener_info_generos(df):
         return {}
 
 # --- 3. Función de análisis mejorada ---
+def promedio_por_libro(df):
+    """Promedio de `ratings` por libro (0 si no tiene) con explode + groupby, sin lambdas por fila."""
+    scores = df['ratings'].reset_index(drop=True).explode()
+    scores = pd.to_numeric(scores.str.get('score'), errors='coerce')
+    promedios = scores.groupby(level=0).mean().round(2)
+    return promedios.reindex(range(len(df))).fillna(0).to_numpy()
+
+def tabla_libro_genero(df):
+    """Tabla explotada libro–género: una fila por (posición del libro, id, nombre)."""
+    generos = df['genres'].reset_index(drop=True).explode().dropna()
+    tabla = pd.DataFrame({
+        'libro': generos.index.to_numpy(),
+        'genero_id': generos.str.get('id').to_numpy(),
+        'genero_nombre': generos.str.get('name').to_numpy(),
+    })
+    return tabla.dropna(subset=['genero_id', 'genero_nombre']).drop_duplicates(['libro', 'genero_id'])
+
 def analizar_libros(df, genero_usuario=None):
     resultados = {
         'genero_mas_valorado': None,
@@ -79,56 +256,45 @@ def analizar_libros(df, genero_usuario=None):
 
     try:
         # Calcular rating promedio por libro
-        df['avg_rating'] = df['ratings'].apply(
-            lambda x: round(sum(r['score'] for r in x) / len(x), 2) if x and len(x) > 0 else 0
-        )
+        df['avg_rating'] = promedio_por_libro(df)
         
-        generos_info = obtener_info_generos(df)
-        if not generos_info:
+        tabla = tabla_libro_genero(df)
+        if tabla.empty:
             print("⚠️ No se encontraron géneros válidos para analizar.")
             return resultados
 
-        # Análisis por género
-        genero_ratings = []
-        for genero_id, genero_nombre in generos_info.items():
-            try:
-                libros_genero = df[df['genres'].apply(
-                    lambda x: genero_id in [g['id'] for g in x] if isinstance(x, list) else False
-                )]
-                
-                if not libros_genero.empty:
-                    avg = round(libros_genero['avg_rating'].mean(), 2)
-                    genero_ratings.append((genero_id, genero_nombre, avg))
-            except Exception as e:
-                print(f"⚠️ Error analizando género {genero_id}: {e}")
-                continue
+        # Análisis por género: un solo groupby sobre la tabla explotada (orden de primera aparición)
+        tabla['avg_rating'] = df['avg_rating'].to_numpy()[tabla['libro'].to_numpy()]
+        por_genero = tabla.groupby('genero_id', sort=False).agg(
+            nombre=('genero_nombre', 'first'),
+            promedio=('avg_rating', 'mean'),
+        )
+        por_genero['promedio'] = por_genero['promedio'].round(2)
 
-        if genero_ratings:
-            # Género más valorado
-            genero_mas_valorado = max(genero_ratings, key=lambda x: x[2])
-            resultados['genero_mas_valorado'] = genero_mas_valorado
-            
-            # Promedios por género
-            resultados['promedio_generos'] = {
-                'ids': [x[0] for x in genero_ratings],
-                'nombres': [x[1] for x in genero_ratings],
-                'promedios': [x[2] for x in genero_ratings]
-            }
+        # Promedios por género
+        resultados['promedio_generos'] = {
+            'ids': por_genero.index.tolist(),
+            'nombres': por_genero['nombre'].tolist(),
+            'promedios': por_genero['promedio'].tolist()
+        }
+
+        # Género más valorado (el primero en caso de empate, como max())
+        mejor = int(por_genero['promedio'].to_numpy().argmax())
+        resultados['genero_mas_valorado'] = tuple(valores[mejor] for valores in resultados['promedio_generos'].values())
 
         # Top 3 libros global
         resultados['top_3_libros'] = df.sort_values('avg_rating', ascending=False).head(3)
 
         # Análisis por género específico
         if genero_usuario is not None:
-            libros_genero = df[df['genres'].apply(
-                lambda x: genero_usuario in [g['id'] for g in x] if isinstance(x, list) else False
-            )]
+            posiciones = tabla.loc[tabla['genero_id'] == genero_usuario, 'libro'].to_numpy()
+            libros_genero = df.iloc[np.sort(posiciones)]
             
             if not libros_genero.empty:
                 resultados['top_3_genero'] = libros_genero.sort_values('avg_rating', ascending=False).head(3)
                 resultados['genero_actual'] = {
                     'id': genero_usuario,
-                    'nombre': generos_info.get(genero_usuario, 'Desconocido')
+                    'nombre': por_genero['nombre'].get(genero_usuario, 'Desconocido')
                 }
 
     except Exception as e:
@@ -137,12 +303,38 @@ def analizar_libros(df, genero_usuario=None):
     return resultados
 
 # --- 4. Generación de PDF  ---
-def generar_pdf(resultados):
+@functools.lru_cache(maxsize=16)
+def _renderizar_grafico(nombres, promedios, dpi):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(
+        x=list(nombres),
+        y=list(promedios),
+        hue=list(nombres),
+        palette='viridis',
+        legend=False,
+        dodge=False
+    )
+    plt.title('Promedio de Valoraciones por Género', pad=20)
+    plt.xlabel('Género')
+    plt.ylabel('Rating Promedio')
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    plt.close()
+    return buffer.getvalue()
+
+def grafico_promedios(promedio_generos, dpi=300):
+    """PNG (bytes) del gráfico de promedios; se reutiliza mientras los datos no cambien."""
+    return _renderizar_grafico(tuple(promedio_generos['nombres']), tuple(promedio_generos['promedios']), dpi)
+
+def generar_pdf(resultados, grafico=None, sufijo=''):
     if not resultados:
         return False
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    pdf_path = os.path.join(REPORTS_DIR, f'reporte_completo_{timestamp}.pdf')
+    pdf_path = os.path.join(REPORTS_DIR, f'reporte_completo_{timestamp}{sufijo}.pdf')
     
     try:
         doc = SimpleDocTemplate(pdf_path, pagesize=letter)
@@ -162,27 +354,11 @@ def generar_pdf(resultados):
             ))
             elements.append(Spacer(1, 0.2 * inch))
 
-        # 2. Promedios por género (gráfico)
+        # 2. Promedios por género (gráfico renderizado en memoria)
         if resultados['promedio_generos']['ids']:
-            plt.figure(figsize=(10, 6))
-            sns.barplot(
-                x=resultados['promedio_generos']['nombres'],
-                y=resultados['promedio_generos']['promedios'],
-                hue=resultados['promedio_generos']['nombres'],
-                palette='viridis',
-                legend=False,
-                dodge=False
-            )
-            plt.title('Promedio de Valoraciones por Género', pad=20)
-            plt.xlabel('Género')
-            plt.ylabel('Rating Promedio')
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
-            
-            grafico_promedios = os.path.join(REPORTS_DIR, f'promedios_temp_{timestamp}.png')
-            plt.savefig(grafico_promedios, dpi=300, bbox_inches='tight')
-            plt.close()
-            elements.append(Image(grafico_promedios, width=6 * inch, height=4 * inch))
+            if grafico is None:
+                grafico = grafico_promedios(resultados['promedio_generos'])
+            elements.append(Image(io.BytesIO(grafico), width=6 * inch, height=4 * inch))
             elements.append(Spacer(1, 0.3 * inch))
 
         # 3. Top 3 libros global
@@ -234,26 +410,22 @@ def generar_pdf(resultados):
 
         doc.build(elements)
         
-        # Limpiar archivos temporales
-        if 'grafico_promedios' in locals():
-            os.remove(grafico_promedios)
-        
         print(f"\n✅ PDF generado: {pdf_path}")
-        return True
+        return pdf_path
 
     except Exception as e:
         print(f"❌ Error al generar PDF: {e}")
         return False
 
 # --- 5. Generación de Excel  ---
-def generar_excel(resultados):
+def generar_excel(resultados, sufijo=''):
     try:
         if not resultados or resultados['top_3_libros'].empty:
             print("⚠️ No hay datos suficientes para generar Excel")
             return False
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        excel_path = os.path.join(REPORTS_DIR, f'reporte_{timestamp}.xlsx')
+        excel_path = os.path.join(REPORTS_DIR, f'reporte_{timestamp}{sufijo}.xlsx')
 
         # Crear un escritor Excel
         with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
@@ -283,10 +455,12 @@ def generar_excel(resultados):
                 )
                 top_genero = top_genero[['title', 'avg_rating', 'genres']]
                 top_genero.columns = ['Título', 'Rating Promedio', 'Géneros']
-                top_genero.to_excel(writer, sheet_name=f"Top {resultados['genero_actual']['nombre']}", index=False)
+                # Excel limita los nombres de hoja a 31 caracteres sin []:*?/\
+                hoja = re.sub(r'[\[\]:*?/\\]', '', f"Top {resultados['genero_actual']['nombre']}")[:31]
+                top_genero.to_excel(writer, sheet_name=hoja, index=False)
 
         print(f"\n✅ Excel generado: {excel_path}")
-        return True
+        return excel_path
 
     except PermissionError:
         print("❌ Error: No hay permisos para escribir en el directorio")
@@ -294,6 +468,159 @@ def generar_excel(resultados):
         print(f"❌ Error al generar Excel: {e}")
     return False
 
+# --- 5b. Pipeline de reportes ---
+def _cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+# spawn en todas las plataformas: fork con hilos vivos (sesión HTTP, matplotlib) puede bloquear al hijo
+CONTEXTO_PROCESOS = multiprocessing.get_context('spawn')
+_pool_reportes = None
+
+def _pool():
+    """Pool de dos procesos compartido por las llamadas a generar_reportes: el menú lo usa una y otra vez."""
+    global _pool_reportes
+    if _pool_reportes is None:
+        _pool_reportes = ProcessPoolExecutor(max_workers=2, mp_context=CONTEXTO_PROCESOS)
+    return _pool_reportes
+
+def _descartar_pool():
+    global _pool_reportes
+    _pool_reportes = None
+
+def _en_directorio(directorio, funcion, *args):
+    """Corre en el proceso hijo: con spawn no hereda REPORTS_DIR si el padre lo cambió."""
+    global REPORTS_DIR
+    REPORTS_DIR = directorio
+    return funcion(*args)
+
+def generar_reportes(resultados, paralelo=True):
+    """Renderiza el gráfico una vez y genera PDF y Excel en paralelo (pool de procesos reutilizado).
+
+    Devuelve (pdf_exitoso, excel_exitoso) e imprime el tiempo de cada etapa.
+    """
+    tiempos = {}
+    inicio = time.perf_counter()
+    grafico = None
+    if resultados and resultados['promedio_generos']['ids']:
+        grafico, tiempos['gráfico'] = _cronometrar(grafico_promedios, resultados['promedio_generos'])
+
+    if paralelo:
+        pool = _pool()
+        try:
+            futuro_pdf = pool.submit(_en_directorio, REPORTS_DIR, _cronometrar, generar_pdf, resultados, grafico)
+            futuro_excel = pool.submit(_en_directorio, REPORTS_DIR, _cronometrar, generar_excel, resultados)
+            pdf_exitoso, tiempos['pdf'] = futuro_pdf.result()
+            excel_exitoso, tiempos['excel'] = futuro_excel.result()
+        except BrokenProcessPool:
+            _descartar_pool()  # Un proceso murió: la próxima llamada crea otro pool
+            raise
+    else:
+        pdf_exitoso, tiempos['pdf'] = _cronometrar(generar_pdf, resultados, grafico)
+        excel_exitoso, tiempos['excel'] = _cronometrar(generar_excel, resultados)
+    tiempos['total'] = time.perf_counter() - inicio
+
+    print("\n⏱️ Tiempos: " + ", ".join(f"{etapa} {segundos:.2f}s" for etapa, segundos in tiempos.items()))
+    return pdf_exitoso, excel_exitoso
+
+# --- 5c. Modo lote: reportes de todos los géneros en una pasada ---
+def top_n_por_genero(df, n=3):
+    """Top-N de cada género en una sola pasada: tabla explotada ordenada por promedio + groupby().head(n).
+
+    Requiere df['avg_rating'] (lo calcula analizar_libros). Empates: orden original del catálogo.
+    """
+    tabla = tabla_libro_genero(df)
+    tabla['avg_rating'] = df['avg_rating'].to_numpy()[tabla['libro'].to_numpy()]
+    ordenada = tabla.sort_values(['avg_rating', 'libro'], ascending=[False, True], kind='stable')
+    top = ordenada.groupby('genero_id', sort=False).head(n)
+    return {
+        genero_id: (grupo['genero_nombre'].iloc[0], df.iloc[grupo['libro'].to_numpy()])
+        for genero_id, grupo in top.groupby('genero_id', sort=False)
+    }
+
+def _reporte_de_genero(resultados, grafico, sufijo, directorio):
+    global REPORTS_DIR
+    REPORTS_DIR = directorio  # Ver _en_directorio
+    with contextlib.redirect_stdout(io.StringIO()):  # Evita mezclar la salida de los procesos
+        return generar_pdf(resultados, grafico, sufijo), generar_excel(resultados, sufijo)
+
+def generar_lote(df, top_n=3, max_workers=None, generos=None):
+    """Genera PDF y Excel de cada género en procesos paralelos y devuelve el manifiesto."""
+    base = analizar_libros(df)  # Una sola pasada global (calcula también df['avg_rating'])
+    grafico = grafico_promedios(base['promedio_generos']) if base['promedio_generos']['ids'] else None
+    tops = top_n_por_genero(df, top_n)
+    if generos is not None:
+        tops = {genero_id: top for genero_id, top in tops.items() if genero_id in generos}
+
+    salidas = []
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=CONTEXTO_PROCESOS) as executor:  # Un pool por lote
+        futuros = {}
+        for genero_id, (nombre, top) in tops.items():
+            resultados = {**base, 'top_3_genero': top, 'genero_actual': {'id': genero_id, 'nombre': nombre}}
+            futuro = executor.submit(_reporte_de_genero, resultados, grafico, f'_genero_{genero_id}', REPORTS_DIR)
+            futuros[futuro] = (genero_id, nombre)
+        for futuro in as_completed(futuros):
+            genero_id, nombre = futuros[futuro]
+            salida = {'genero_id': genero_id, 'nombre': nombre, 'pdf': None, 'excel': None, 'ok': False, 'error': None}
+            try:
+                pdf, excel = futuro.result()
+                salida.update(pdf=pdf or None, excel=excel or None, ok=bool(pdf and excel))
+            except Exception as e:
+                salida['error'] = str(e)
+            salidas.append(salida)
+
+    salidas.sort(key=lambda salida: salida['genero_id'])
+    return {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'libros': len(df),
+        'generos': len(salidas),
+        'fallidos': sum(not salida['ok'] for salida in salidas),
+        'reportes': salidas,
+    }
+
+# Códigos de salida del modo lote (para cron)
+EXIT_OK, EXIT_PARCIAL, EXIT_SIN_DATOS = 0, 1, 2
+
+def ejecutar_lote(args):
+    df = cargar_libros(args.url)
+    if df.empty:
+        return EXIT_SIN_DATOS
+
+    manifiesto = generar_lote(df, args.top, args.workers, args.generos)
+    ruta = args.manifest or os.path.join(REPORTS_DIR, f"lote_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=2, default=str)
+
+    print(f"\n📦 Lote terminado: {manifiesto['generos']} géneros, {manifiesto['fallidos']} con errores. Manifiesto: {ruta}")
+    if manifiesto['generos'] == 0:
+        return EXIT_SIN_DATOS
+    return EXIT_PARCIAL if manifiesto['fallidos'] else EXIT_OK
+
+def lista_de_ids(valor):
+    """Tipo de argparse para '1,2,3': un ID no numérico sale con el mensaje de uso (código 2)."""
+    try:
+        return {int(g) for g in valor.split(',') if g.strip()} or None
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"se esperaban IDs numéricos separados por comas: {valor!r}")
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Analizador de libros y generador de reportes")
+    subparsers = parser.add_subparsers(dest='comando')
+    subparsers.add_parser('menu', help="Menú interactivo (por defecto)")
+    lote = subparsers.add_parser('lote', help="Genera PDF y Excel de todos los géneros sin interacción")
+    lote.add_argument('--url', default=API_URL, help="URL de /api/books/")
+    lote.add_argument('--top', type=int, default=3, help="Libros por género en cada reporte")
+    lote.add_argument('--workers', type=int, default=None, help="Procesos en paralelo (por defecto, CPUs)")
+    lote.add_argument('--generos', type=lista_de_ids, help="IDs separados por comas (por defecto, todos)")
+    lote.add_argument('--manifest', help="Ruta del manifiesto JSON (por defecto, reportes/lote_<fecha>.json)")
+    args = parser.parse_args(argv)
+
+    if args.comando == 'lote':
+        return ejecutar_lote(args)
+    main()
+    return EXIT_OK
+
 # --- 6. Mostrar resultados en consola ---
 def mostrar_resultados_consola(resultados):
     print("\n" + "="*50)
@@ -342,7 +669,7 @@ def main():
         
         if opcion == '1':
             if df.empty:
-                df = fetch_libros_desde_api()
+                df = cargar_libros()
                 if df.empty:
                     continue
             
@@ -351,8 +678,7 @@ def main():
             
             # Generar ambos reportes
             print("\nGenerando reportes...")
-            pdf_exitoso = generar_pdf(resultados)
-            excel_exitoso = generar_excel(resultados)
+            pdf_exitoso, excel_exitoso = generar_reportes(resultados)
             
             if pdf_exitoso and excel_exitoso:
                 print("\n✅ Ambos reportes generados con éxito")
@@ -365,7 +691,7 @@ def main():
         
         elif opcion == '2':
             if df.empty:
-                df = fetch_libros_desde_api()
+                df = cargar_libros()
                 if df.empty:
                     continue
             
@@ -389,8 +715,7 @@ def main():
                 
                 # Generar ambos reportes
                 print("\nGenerando reportes...")
-                pdf_exitoso = generar_pdf(resultados)
-                excel_exitoso = generar_excel(resultados)
+                pdf_exitoso, excel_exitoso = generar_reportes(resultados)
                 
                 if pdf_exitoso and excel_exitoso:
                     print("\n✅ Ambos reportes generados con éxito")
@@ -412,6 +737,9 @@ def main():
             print("⚠️ Opción no válida. Por favor intente de nuevo.")
 
 if __name__ == "__main__":
+    # Configurar codificación UTF-8
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
     # Verificar dependencias
     try:
         import openpyxl
@@ -420,4 +748,4 @@ if __name__ == "__main__":
         print("pip install openpyxl")
         exit()
 
-    main()
\ No newline at end of file
+    sys.exit(cli())
\ No newline at end of file
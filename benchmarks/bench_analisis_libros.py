@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark de analisis_libros.analizar_libros sobre catálogos sintéticos.
+
+Uso:
+    python benchmarks/bench_analisis_libros.py                       # 10k, 100k y 1M libros × 500 géneros
+    python benchmarks/bench_analisis_libros.py --libros 50000 --generos 100
+
+Los dicts de géneros y calificaciones se comparten entre libros para que el
+catálogo de 1M quepa en memoria; pandas ve la misma estructura que devuelve la API.
+'''
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import analisis_libros  # noqa: E402
+
+
+def catalogo_sintetico(num_libros, num_generos, generos_por_libro=3, ratings_por_libro=4, seed=0):
+    rng = np.random.default_rng(seed)
+    generos = [{'id': i, 'name': f'Género {i}'} for i in range(1, num_generos + 1)]
+    scores = [{'score': s} for s in range(1, 6)]
+    ids_generos = rng.integers(0, num_generos, size=(num_libros, generos_por_libro))
+    ids_scores = rng.integers(0, 5, size=(num_libros, ratings_por_libro))
+    cantidad = rng.integers(0, ratings_por_libro + 1, size=num_libros)
+    return pd.DataFrame({
+        'title': [f'Libro {i}' for i in range(num_libros)],
+        'genres': [[generos[g] for g in fila] for fila in ids_generos.tolist()],
+        'ratings': [[scores[s] for s in fila[:n]] for fila, n in zip(ids_scores.tolist(), cantidad.tolist())],
+    })
+
+
+def medir(num_libros, num_generos, genero_usuario=1):
+    df = catalogo_sintetico(num_libros, num_generos)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultados = analisis_libros.analizar_libros(df, genero_usuario)
+    segundos = time.perf_counter() - inicio
+    print(f"{num_libros:>10,} libros × {num_generos:>4} géneros: {segundos:8.2f} s "
+          f"({len(resultados['promedio_generos']['ids'])} géneros analizados)")
+    return segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--libros', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--generos', type=int, default=500)
+    args = parser.parse_args()
+    for num_libros in args.libros:
+        medir(num_libros, args.generos)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark de las vistas de lectura async (/api/books/async/...) contra sus equivalentes síncronas bajo ASGI.
+
+Levanta bobeda.asgi en el mismo proceso (django.test.AsyncClient habla ASGI con el handler real,
+middlewares incluidos). Siembra un catálogo con generar_catalogo y lanza N peticiones con C
+en vuelo a la vez contra cada endpoint, en versión síncrona y async. Informa peticiones por segundo
+y latencias p50/p95.
+
+Con SQLite las consultas no esperan red. --latencia-ms agrega una espera por consulta para simular
+una base remota. Con PostgreSQL se usa la base configurada.
+
+Uso:
+    python benchmarks/bench_async.py
+    python benchmarks/bench_async.py --concurrencia 1 20 --peticiones 400 --latencia-ms 2
+    DJANGO_SETTINGS_MODULE=otra.config python benchmarks/bench_async.py --libros 5000
+'''
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bobeda.settings')
+
+import django  # noqa: E402
+from asgiref.sync import ThreadSensitiveContext  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test import AsyncClient  # noqa: E402
+from django.test.runner import DiscoverRunner  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from libros.models import Book, Genre  # noqa: E402
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'libros': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},  # Se mide el cálculo, no el acierto
+}
+
+
+def escenarios():
+    """(nombre, url síncrona, url async, parámetros)."""
+    libro = Book.objects.order_by('-rating_count').first()
+    genero = Genre.objects.order_by('pk').first()
+    return [
+        ('book-list', reverse('book-list'), reverse('async-book-list'), {'page_size': 50, 'page': 2}),
+        ('book-detail', reverse('book-detail', args=[libro.pk]), reverse('async-book-detail', args=[libro.pk]), {}),
+        ('rating-list', reverse('rating-list', args=[libro.pk]), reverse('async-rating-list', args=[libro.pk]), {}),
+        ('book-recommend', reverse('book-recommend'), reverse('async-book-recommend'), {'genres': genero.pk, 'min_rating': 4}),
+        ('libros-analisis', reverse('libros-analisis'), reverse('async-libros-analisis'), {}),
+    ]
+
+
+async def carga(url, params, peticiones, concurrencia):
+    client = AsyncClient()
+    latencias = []
+    pendientes = iter(range(peticiones))
+
+    async def trabajador():
+        for _ in pendientes:
+            inicio = time.perf_counter()
+            # Como ASGIHandler: sin esto AsyncClient manda todo el código síncrono de todas las peticiones a un único hilo
+            async with ThreadSensitiveContext():
+                response = await client.get(url, params)
+            latencias.append(time.perf_counter() - inicio)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} respondió {response.status_code}')
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    total = time.perf_counter() - inicio
+    cuantiles = statistics.quantiles(latencias, n=20)
+    return {'rps': peticiones / total, 'p50_ms': statistics.median(latencias) * 1000, 'p95_ms': cuantiles[18] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--libros', type=int, default=2000)
+    parser.add_argument('--usuarios', type=int, default=500)
+    parser.add_argument('--calificaciones', type=int, default=20000)
+    parser.add_argument('--peticiones', type=int, default=200, help='Peticiones por endpoint, modo y concurrencia.')
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--latencia-ms', type=float, default=0, help='Espera agregada a cada consulta SQL.')
+    args = parser.parse_args()
+
+    def latencia(execute, sql, params, many, context):
+        time.sleep(args.latencia_ms / 1000)
+        return execute(sql, params, many, context)
+
+    def instrumentar(sender, connection, **kwargs):
+        # Las conexiones son por hilo: cada hilo nuevo del adaptador abre la suya
+        connection.execute_wrappers.append(latencia)
+
+    setup_test_environment(debug=False)
+    runner = DiscoverRunner(verbosity=0)
+    bases_de_datos = runner.setup_databases()
+    try:
+        with override_settings(CACHES=CACHES, SLOW_REQUEST_THRESHOLD_MS=None):
+            call_command('generar_catalogo', libros=args.libros, autores=max(args.libros // 10, 1), generos=20,
+                         usuarios=args.usuarios, calificaciones=args.calificaciones, stdout=StringIO())
+            casos = escenarios()
+            if args.latencia_ms:
+                connection_created.connect(instrumentar)
+            print(f"{'endpoint':<16} {'C':>3}  {'sync req/s':>10} {'p50':>8} {'p95':>8}  {'async req/s':>11} {'p50':>8} {'p95':>8}")
+            for nombre, sincrona, asincrona, params in casos:
+                for concurrencia in args.concurrencia:
+                    asyncio.run(carga(sincrona, params, min(concurrencia * 2, args.peticiones), concurrencia))  # Calentamiento
+                    s = asyncio.run(carga(sincrona, params, args.peticiones, concurrencia))
+                    a = asyncio.run(carga(asincrona, params, args.peticiones, concurrencia))
+                    print(f"{nombre:<16} {concurrencia:>3}  {s['rps']:>10.1f} {s['p50_ms']:>7.1f}ms {s['p95_ms']:>7.1f}ms"
+                          f"  {a['rps']:>11.1f} {a['p50_ms']:>7.1f}ms {a['p95_ms']:>7.1f}ms")
+    finally:
+        connection_created.disconnect(instrumentar)
+        runner.teardown_databases(bases_de_datos)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark de los endpoints de libros/urls.py y accounts/urls.py: consultas SQL, tiempo y memoria pico.
+
+Siembra un catálogo sintético (libros × géneros × usuarios × calificaciones) en la base de pruebas,
+mide cada endpoint y compara con benchmarks/baselines.json. Sale con código 1 si alguno empeora más
+allá del umbral (consultas, cualquier aumento; tiempo y memoria, el porcentaje indicado) o si falta
+la línea base del motor, del perfil o del endpoint. Corre con benchmarks/settings_sqlite.py: las líneas
+base registradas son de SQLite. Con otro motor (DJANGO_SETTINGS_MODULE) hay que registrarlas antes con
+--actualizar; si no, sale con código 1 sin medir.
+
+Uso:
+    python benchmarks/bench_endpoints.py                          # perfil "chico" contra las líneas base
+    python benchmarks/bench_endpoints.py --perfil chico mediano --repeticiones 10
+    python benchmarks/bench_endpoints.py --actualizar             # reescribe las líneas base de este motor
+    DJANGO_SETTINGS_MODULE=otra.config python benchmarks/bench_endpoints.py --actualizar  # otro motor
+
+Cada medición corre dentro de una transacción que se revierte, así los POST no alteran las siguientes,
+y con la caché de resultados invalidada, para medir siempre el cálculo y no el acierto.
+Los tiempos dependen de la máquina: actualice las líneas base en la misma máquina donde se comparan.
+'''
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings_sqlite')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.runner import DiscoverRunner  # noqa: E402
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from accounts import urls as accounts_urls  # noqa: E402
+from libros import cache, jobs, recomendador  # noqa: E402
+from libros import urls as libros_urls  # noqa: E402
+from libros.models import Author, Book, Genre, Rating, ReportJob  # noqa: E402
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+PERFILES = {
+    'chico': {'libros': 200, 'generos': 10, 'usuarios': 50, 'ratings_por_usuario': 10},
+    'mediano': {'libros': 2000, 'generos': 30, 'usuarios': 300, 'ratings_por_usuario': 20},
+    'grande': {'libros': 20000, 'generos': 100, 'usuarios': 2000, 'ratings_por_usuario': 30},
+}
+PASSWORD = 'bench-password'
+
+
+def sembrar(libros, generos, usuarios, ratings_por_usuario, generos_por_libro=2, seed=0):
+    """Catálogo sintético con bulk_create; los agregados se recalculan al final con el comando del repo."""
+    rng = np.random.default_rng(seed)
+    autores = Author.objects.bulk_create([Author(name=f'Autor {i}', bio=f'Biografía del autor {i}') for i in range(max(libros // 10, 1))])
+    generos_db = Genre.objects.bulk_create([Genre(name=f'Género {i}') for i in range(generos)])
+    libros_db = Book.objects.bulk_create([
+        Book(title=f'Libro {i}', author=autores[i % len(autores)], published_date=date(1950, 1, 1) + timedelta(days=7 * i),
+             isbn=f'{i:013d}', stock=i % 50)
+        for i in range(libros)
+    ], batch_size=2000)
+    Through = Book.genres.through
+    Through.objects.bulk_create([
+        Through(book_id=libro.pk, genre_id=generos_db[g].pk)
+        for libro, fila in zip(libros_db, rng.integers(0, generos, size=(libros, generos_por_libro)).tolist())
+        for g in set(fila)
+    ], batch_size=5000)
+    lector = User.objects.create_user('bench', password=PASSWORD)
+    usuarios_db = [lector] + User.objects.bulk_create([User(username=f'usuario{i}') for i in range(usuarios - 1)])
+    ratings = []
+    for usuario in usuarios_db:
+        elegidos = rng.choice(libros, size=min(ratings_por_usuario, libros), replace=False)
+        ratings += [Rating(user=usuario, book=libros_db[i], score=int(s))
+                    for i, s in zip(elegidos.tolist(), rng.integers(1, 6, size=len(elegidos)).tolist())]
+    Rating.objects.bulk_create(ratings, batch_size=5000)
+    call_command('rebuild_rating_aggregates', stdout=open(os.devnull, 'w'))
+    return lector, libros_db[0], generos_db[0]
+
+
+def escenarios(lector, libro, genero):
+    """(método, url, datos, autenticado) por nombre de ruta; toda ruta de las urls medidas debe figurar."""
+    job_listo = ReportJob.objects.create(key='bench', genre_ids=[genero.pk], format='xlsx')
+    jobs.procesar(job_listo.pk)
+    otro = Book.objects.exclude(rating__user=lector).order_by('pk').first()
+    return {
+        'book-list': ('get', reverse('book-list'), {}, False),
+        'book-detail': ('get', reverse('book-detail', args=[libro.pk]), {}, False),
+        'book-search': ('get', reverse('book-search'), {'q': 'libro autor'}, False),
+        'book-export': ('get', reverse('book-export'), {'format': 'jsonl'}, False),
+        'book-fingerprint': ('get', reverse('book-fingerprint'), {}, False),
+        'rating-list': ('get', reverse('rating-list', args=[libro.pk]), {}, False),
+        'rating-create': ('post', reverse('rating-create'), {'book': otro.pk, 'score': 4}, True),
+        'rating-bulk': ('post', reverse('rating-bulk'), [{'book': b, 'score': 3} for b in
+                        Book.objects.exclude(rating__user=lector).order_by('pk').values_list('pk', flat=True)[:50]], True),
+        'book-recommend': ('get', reverse('book-recommend'), {'genres': genero.pk, 'min_rating': 3}, False),
+        'book-recommend-me': ('get', reverse('book-recommend-me'), {}, True),
+        'book-leaderboard': ('get', reverse('book-leaderboard'), {'genre': genero.pk}, False),
+        'libros-analisis': ('get', reverse('libros-analisis'), {}, False),
+        'genre-stats': ('get', reverse('genre-stats'), {}, False),
+        'libros-por-genero': ('get', reverse('libros-por-genero'), {'genre_id': genero.pk, 'min_rating': 3}, False),
+        'report-job-create': ('post', reverse('report-job-create'), {'genres': [genero.pk], 'format': 'pdf'}, True),
+        'report-job-detail': ('get', reverse('report-job-detail', args=[job_listo.pk]), {}, True),
+        'report-job-download': ('get', reverse('report-job-download', args=[job_listo.pk]), {}, True),
+        'async-book-list': ('get', reverse('async-book-list'), {}, False),
+        'async-book-detail': ('get', reverse('async-book-detail', args=[libro.pk]), {}, False),
+        'async-rating-list': ('get', reverse('async-rating-list', args=[libro.pk]), {}, False),
+        'async-book-recommend': ('get', reverse('async-book-recommend'), {'genres': genero.pk, 'min_rating': 3}, False),
+        'async-libros-analisis': ('get', reverse('async-libros-analisis'), {}, False),
+        'signup': ('post', reverse('signup'), {'username': 'nuevo', 'email': 'nuevo@example.com', 'password': PASSWORD}, False),
+        'login': ('post', reverse('login'), {'username': 'bench', 'password': PASSWORD}, False),
+    }
+
+
+def llamar(client, metodo, url, datos):
+    with transaction.atomic():
+        cache.invalidate()
+        if metodo == 'get':
+            response = client.get(url, datos)
+        else:
+            response = client.post(url, datos, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        else:
+            response.content
+        transaction.set_rollback(True)
+    if response.status_code >= 400:
+        raise RuntimeError(f'{url} respondió {response.status_code}: {getattr(response, "data", "")}')
+    return response
+
+
+def medir(client, token, escenario, repeticiones):
+    metodo, url, datos, autenticado = escenario
+    client.credentials(**({'HTTP_AUTHORIZATION': f'Bearer {token}'} if autenticado else {}))
+    llamar(client, metodo, url, datos)  # Calentamiento (imports, caches de Django)
+    tiempos, consultas = [], 0
+    for _ in range(repeticiones):
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            llamar(client, metodo, url, datos)
+            tiempos.append(time.perf_counter() - inicio)
+        # SAVEPOINT/ROLLBACK de la transacción de medición no cuentan
+        consultas = max(consultas, sum(1 for q in capturadas.captured_queries if 'SAVEPOINT' not in q['sql']))
+    tracemalloc.start()
+    llamar(client, metodo, url, datos)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'queries': consultas, 'time_ms': round(statistics.median(tiempos) * 1000, 2), 'peak_kb': round(pico / 1024, 1)}
+
+
+def comparar(resultados, base, umbral_tiempo, umbral_memoria, tolerancia_ms=5):
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = base.get(nombre)
+        if anterior is None:
+            regresiones.append(f"{nombre}: sin línea base; use --actualizar para crearla")
+            continue
+        if actual['queries'] > anterior['queries']:
+            regresiones.append(f"{nombre}: {anterior['queries']} → {actual['queries']} consultas")
+        # Los endpoints de pocos ms varían más que el umbral por ruido: se exige además una diferencia absoluta
+        if actual['time_ms'] > max(anterior['time_ms'] * (1 + umbral_tiempo), anterior['time_ms'] + tolerancia_ms):
+            regresiones.append(f"{nombre}: {anterior['time_ms']} → {actual['time_ms']} ms")
+        if actual['peak_kb'] > anterior['peak_kb'] * (1 + umbral_memoria):
+            regresiones.append(f"{nombre}: {anterior['peak_kb']} → {actual['peak_kb']} KB de memoria pico")
+    return regresiones
+
+
+def correr_perfil(nombre, repeticiones):
+    with transaction.atomic():
+        lector, libro, genero = sembrar(**PERFILES[nombre])
+        recomendador.guardar(recomendador.entrenar())
+        casos = escenarios(lector, libro, genero)
+        faltantes = {p.name for p in libros_urls.urlpatterns + accounts_urls.urlpatterns} - casos.keys()
+        if faltantes:
+            raise SystemExit(f'Endpoints sin escenario de benchmark: {sorted(faltantes)}')
+        client, token = APIClient(), str(RefreshToken.for_user(lector).access_token)
+        resultados = {}
+        for ruta, escenario in casos.items():
+            resultados[ruta] = medir(client, token, escenario, repeticiones)
+            r = resultados[ruta]
+            print(f"  {ruta:<22} {r['queries']:>4} consultas {r['time_ms']:>9.2f} ms {r['peak_kb']:>10.1f} KB")
+        transaction.set_rollback(True)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--perfil', nargs='+', choices=PERFILES, default=['chico'])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--umbral-tiempo', type=float, default=0.5, help='Aumento tolerado del tiempo (0.5 = +50%%).')
+    parser.add_argument('--umbral-memoria', type=float, default=0.25, help='Aumento tolerado de la memoria pico.')
+    parser.add_argument('--tolerancia-ms', type=float, default=5, help='Diferencia mínima de tiempo para contar como regresión.')
+    parser.add_argument('--actualizar', action='store_true', help='Guarda los resultados como nuevas líneas base.')
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, encoding='utf-8') as archivo:
+            baselines = json.load(archivo)
+    if not args.actualizar and connection.vendor not in baselines:
+        print(f"❌ Sin líneas base para {connection.vendor}: el gate corre con benchmarks/settings_sqlite.py "
+              f"(o registre las de este motor con --actualizar)")
+        return 1
+
+    setup_test_environment(debug=False)
+    runner = DiscoverRunner(verbosity=0)
+    bases_de_datos = runner.setup_databases()
+    directorio = tempfile.TemporaryDirectory()
+    ajustes = override_settings(
+        REPORT_JOBS_DIR=directorio.name,
+        RECOMMENDER_MODEL_PATH=os.path.join(directorio.name, 'recomendador.npz'),
+        SLOW_REQUEST_THRESHOLD_MS=None,
+    )
+    try:
+        with ajustes, mock.patch.object(jobs, 'get_executor'):  # Los reportes encolados no se ejecutan
+            resultados = {}
+            for perfil in args.perfil:
+                print(f"Perfil {perfil}: {PERFILES[perfil]}")
+                resultados[perfil] = correr_perfil(perfil, args.repeticiones)
+    finally:
+        runner.teardown_databases(bases_de_datos)
+        directorio.cleanup()
+
+    motor = baselines.setdefault(connection.vendor, {})
+    if args.actualizar:
+        motor.update(resultados)
+        with open(args.baselines, 'w', encoding='utf-8') as archivo:
+            json.dump(baselines, archivo, indent=2, ensure_ascii=False, sort_keys=True)
+            archivo.write('\n')
+        print(f"Líneas base actualizadas en {args.baselines}")
+        return 0
+
+    regresiones = []
+    for perfil, medidos in resultados.items():
+        if perfil not in motor:
+            regresiones.append(f"[{perfil}] sin líneas base para {connection.vendor}; use --actualizar para crearlas")
+            continue
+        regresiones += [f"[{perfil}] {r}" for r in comparar(medidos, motor[perfil], args.umbral_tiempo, args.umbral_memoria, args.tolerancia_ms)]
+    for regresion in regresiones:
+        print(f"❌ {regresion}")
+    if not regresiones:
+        print("✅ Sin regresiones")
+    return 1 if regresiones else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,10 @@
+'''
+Configuración del gate de bench_endpoints.py: la de bobeda con SQLite en memoria y sin réplicas.
+
+Las líneas base de benchmarks/baselines.json se registran con este motor; así el gate no depende
+de tener un PostgreSQL a mano ni de su configuración.
+'''
+from bobeda.settings import *  # noqa: F401,F403
+
+DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+DATABASE_REPLICAS = []
@@ -0,0 +1,224 @@
+'''
+RequestTimingMiddleware: mide cada petición y lo expone en la cabecera Server-Timing.
+
+    sql     consultas y tiempo en la base de datos (connection.execute_wrapper, funciona con DEBUG=False)
+    ser     serialización DRF (Serializer.data / ListSerializer.data; incluye las consultas perezosas que dispare)
+    render  Response.rendered_content de DRF
+    total   tiempo completo dentro de Django
+
+Las peticiones que superan SLOW_REQUEST_THRESHOLD_MS se registran como una línea JSON en el logger
+"bobeda.slow_requests", con las SLOW_REQUEST_SQL_LIMIT consultas más lentas (sin parámetros).
+Las respuestas en streaming se renderizan después de salir del middleware: su cabecera cubre solo la vista.
+Funciona igual bajo ASGI, así las vistas async no pasan por un hilo por culpa de un middleware solo síncrono.
+
+ReplicaStickinessMiddleware: lecturas del primario tras escribir (ver bobeda/routers.py).
+'''
+import contextvars
+import hashlib
+import heapq
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from . import routers
+
+logger = logging.getLogger('bobeda.slow_requests')
+
+_medicion = contextvars.ContextVar('medicion_peticion', default=None)
+SQL_MAX_CHARS = 500
+
+
+class Medicion:
+    def __init__(self, peor_sql):
+        self.consultas = 0
+        self.sql = 0.0
+        self.etapas = {'ser': 0.0, 'render': 0.0}
+        self.peor_sql = peor_sql
+        self.peores = []  # heap de (duración, orden, sql)
+        self._profundidad = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.sql += duracion
+            entrada = (duracion, self.consultas, sql[:SQL_MAX_CHARS])
+            if len(self.peores) < self.peor_sql:
+                heapq.heappush(self.peores, entrada)
+            elif self.peor_sql:
+                heapq.heappushpop(self.peores, entrada)
+
+    @contextmanager
+    def etapa(self, nombre):
+        # Solo cuenta la llamada más externa (un serializador puede usar otros adentro)
+        profundidad = self._profundidad.get(nombre, 0)
+        self._profundidad[nombre] = profundidad + 1
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._profundidad[nombre] = profundidad
+            if profundidad == 0:
+                self.etapas[nombre] += time.perf_counter() - inicio
+
+
+def _medido(nombre, fget):
+    def medido(self):
+        medicion = _medicion.get()
+        if medicion is None:
+            return fget(self)
+        with medicion.etapa(nombre):
+            return fget(self)
+    medido._medido = True
+    return property(medido)
+
+
+def _instrumentar_drf():
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, '_medido', False):
+            cls.data = _medido('ser', cls.data.fget)
+    if not getattr(Response.rendered_content.fget, '_medido', False):
+        Response.rendered_content = _medido('render', Response.rendered_content.fget)
+
+
+def _instrumentar_conexiones(pila, medicion):
+    for connection in connections.all():
+        pila.enter_context(connection.execute_wrapper(medicion))
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+        _instrumentar_drf()
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        medicion = Medicion(settings.SLOW_REQUEST_SQL_LIMIT)
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pila:
+                _instrumentar_conexiones(pila, medicion)
+                response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        return self.registrar(request, response, medicion, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        medicion = Medicion(settings.SLOW_REQUEST_SQL_LIMIT)
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        # Las conexiones son por hilo: se instrumentan en el hilo donde corre el ORM de esta petición
+        # (sync_to_async con thread_sensitive, el mismo que usan el ORM async y las vistas síncronas)
+        pila = ExitStack()
+        try:
+            await sync_to_async(_instrumentar_conexiones)(pila, medicion)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+            _medicion.reset(token)
+        return self.registrar(request, response, medicion, time.perf_counter() - inicio)
+
+    def registrar(self, request, response, medicion, total):
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f'sql;dur={medicion.sql * 1000:.1f};desc="{medicion.consultas} queries"',
+                f'ser;dur={medicion.etapas["ser"] * 1000:.1f}',
+                f'render;dur={medicion.etapas["render"] * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        umbral = settings.SLOW_REQUEST_THRESHOLD_MS
+        if umbral is not None and total * 1000 >= umbral:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'sql_ms': round(medicion.sql * 1000, 1),
+                'sql_count': medicion.consultas,
+                'serializer_ms': round(medicion.etapas['ser'] * 1000, 1),
+                'render_ms': round(medicion.etapas['render'] * 1000, 1),
+                'worst_sql': [
+                    {'ms': round(duracion * 1000, 2), 'sql': sql}
+                    for duracion, _, sql in sorted(medicion.peores, reverse=True)
+                ],
+            }, ensure_ascii=False))
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """Read-your-writes entre peticiones (ver bobeda/routers.py).
+
+    Los métodos no seguros leen del primario. Si la petición escribió, el cliente (identificado por su
+    credencial o, sin ella, por una cookie) sigue leyendo del primario REPLICA_STICKY_SECONDS, el retraso
+    de replicación que se tolera. La marca va en la caché 'default', compartida si se define BOBEDA_REDIS_URL;
+    si no, es por proceso y a un cliente Bearer solo lo protege la cookie (si la guarda) o el mismo proceso.
+    """
+    sync_capable = True
+    async_capable = True
+    COOKIE = 'bobeda_primario'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def clave(self, request):
+        credencial = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if credencial:
+            return 'replicas:primario:' + hashlib.sha256(credencial.encode()).hexdigest()
+        return None
+
+    def leer_del_primario(self, request, clave):
+        return (
+            request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+            or self.COOKIE in request.COOKIES
+            or (clave is not None and caches['default'].get(clave) is not None)
+        )
+
+    def marcar(self, response, contexto, clave):
+        if contexto.escribio and settings.DATABASE_REPLICAS:
+            if clave is not None:
+                caches['default'].set(clave, 1, settings.REPLICA_STICKY_SECONDS)
+            response.set_cookie(self.COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        clave = self.clave(request)
+        contexto, token = routers.abrir(self.leer_del_primario(request, clave))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.cerrar(token)
+        return self.marcar(response, contexto, clave)
+
+    async def __acall__(self, request):
+        clave = self.clave(request)
+        contexto, token = routers.abrir(self.leer_del_primario(request, clave))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.cerrar(token)
+        return self.marcar(response, contexto, clave)
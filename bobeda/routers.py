@@ -0,0 +1,79 @@
+'''
+PrimaryReplicaRouter: escrituras al primario ('default'), lecturas repartidas entre DATABASE_REPLICAS.
+
+Para leer lo propio (read-your-writes) se lee del primario cuando:
+    - el contexto abierto (petición, trabajo en segundo plano) ya escribió: db_for_write lo marca;
+    - hay una transacción abierta en el primario (select_for_update, lecturas previas a escribir);
+    - ReplicaStickinessMiddleware lo pidió: métodos no seguros y clientes que escribieron
+      hace menos de REPLICA_STICKY_SECONDS.
+Sin réplicas configuradas todo va a 'default'.
+'''
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Contexto:
+    __slots__ = ('primario', 'escribio')
+
+    def __init__(self, primario=False):
+        self.primario = primario
+        self.escribio = False
+
+
+# Un objeto mutable: sync_to_async copia el contexto, pero las marcas hechas en el hilo del ORM se ven afuera
+_contexto = contextvars.ContextVar('contexto_replicas', default=None)
+
+
+def abrir(primario=False):
+    """Contexto nuevo para una petición; devuelve (contexto, token para cerrar)."""
+    contexto = Contexto(primario)
+    return contexto, _contexto.set(contexto)
+
+
+def cerrar(token):
+    _contexto.reset(token)
+
+
+def usar_primario():
+    """Las lecturas siguientes del contexto abierto van al primario; sin contexto no hace nada.
+
+    Fuera de una petición (hilos de jobs.py, comandos) la unidad de trabajo abre el suyo con abrir()/cerrar():
+    un contexto creado aquí no se cerraría y dejaría el hilo en el primario para siempre.
+    """
+    contexto = _contexto.get()
+    if contexto is not None:
+        contexto.primario = True
+    return contexto
+
+
+def lee_del_primario():
+    """True si el contexto abierto lee del primario (escribió, método no seguro o cliente pegado)."""
+    contexto = _contexto.get()
+    return contexto is not None and contexto.primario
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        contexto = _contexto.get()
+        if (contexto is not None and contexto.primario) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        contexto = usar_primario()
+        if contexto is not None:
+            contexto.escribio = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplicas tienen los mismos datos
+        alias = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in alias and obj2._state.db in alias:
+            return True
+        return None
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bobeda.middleware.RequestTimingMiddleware',  # Primero: mide la petición completa (Server-Timing)
+    'bobeda.middleware.ReplicaStickinessMiddleware',  # Antes de cualquier lectura (sesión, usuario)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,20 +82,105 @@ WSGI_APPLICATION = 'bobeda.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-     'default': {
+# Primario en 'default'; réplicas de lectura opcionales con BOBEDA_DB_REPLICAS="host1:5432,host2:5432"
+# (alias replica1, replica2...). bobeda/routers.py manda las escrituras al primario y reparte las lecturas.
+# Con psycopg 3 + psycopg_pool cada alias usa un pool y CONN_HEALTH_CHECKS hace que el pool verifique
+# la conexión antes de entregarla; con psycopg2 se reutilizan conexiones persistentes (CONN_MAX_AGE).
+DB_POOL_MIN_SIZE = 2
+DB_POOL_MAX_SIZE = 10
+
+
+def _postgres(host, port, **extra):
+    config = {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'bobeda_db',        
-        'USER': 'postgres',           
+        'NAME': 'bobeda_db',
+        'USER': 'postgres',
         'PASSWORD': '5503',
-        'HOST': 'localhost',
-        'PORT': '5432', 
+        'HOST': host,
+        'PORT': port,
+        'CONN_HEALTH_CHECKS': True,
+        **extra,
     }
+    if find_spec('psycopg') and find_spec('psycopg_pool'):
+        config['OPTIONS'] = {'pool': {'min_size': DB_POOL_MIN_SIZE, 'max_size': DB_POOL_MAX_SIZE, 'timeout': 10}}
+    else:
+        config['CONN_MAX_AGE'] = 60
+    return config
+
+
+DATABASES = {'default': _postgres('localhost', '5432')}
+DATABASE_REPLICAS = []
+for numero, destino in enumerate(filter(None, os.environ.get('BOBEDA_DB_REPLICAS', '').split(',')), 1):
+    host, _, port = destino.strip().partition(':')
+    # En los tests la réplica apunta a la base de prueba del primario
+    DATABASES[f'replica{numero}'] = _postgres(host, port or '5432', TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica{numero}')
+DATABASE_ROUTERS = ['bobeda.routers.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = 5  # Retraso de replicación tolerado: lecturas del cliente que escribió y caché de libros/cache.py
+
+# Caché
+# 'libros' guarda resultados de recomendación/análisis: LRU acotado por MAX_ENTRIES y TTL por TIMEOUT.
+# En producción puede apuntar a Redis/Memcached sin cambiar el código.
+# Con BOBEDA_REDIS_URL, 'default' (marcas de ReplicaStickinessMiddleware), 'libros' y 'usuarios' van a Redis
+# y las ven todos los procesos. Sin ella son locmem: la marca de un cliente Bearer solo vale en el proceso que
+# atendió la escritura y los demás procesos sirven resultados previos hasta vencer TIMEOUT.
+REDIS_URL = os.environ.get('BOBEDA_REDIS_URL')
+
+
+def _compartida(location, **locmem):
+    """Redis (TIMEOUT por defecto, 300 s) si hay BOBEDA_REDIS_URL; si no, locmem con estos ajustes."""
+    if REDIS_URL:
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL, 'KEY_PREFIX': location}
+    return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location, **locmem}
+
+
+CACHES = {
+    'default': _compartida('default'),
+    # El token de versión vive junto a los resultados: con varios procesos, solo compartida invalida en todos
+    'libros': _compartida('libros-resultados', TIMEOUT=300, OPTIONS={'MAX_ENTRIES': 1000}),
+    # Usuarios de los tokens JWT (accounts/authentication.py). En locmem una desactivación tarda TIMEOUT
+    # en verse en los demás procesos: por eso es corto
+    'usuarios': _compartida('usuarios', TIMEOUT=30, OPTIONS={'MAX_ENTRIES': 10000}),
+}
+
+LIBROS_CACHE_ALIAS = 'libros'
+ACCOUNTS_CACHE_ALIAS = 'usuarios'
+
+# Reportes generados en segundo plano (libros/jobs.py)
+REPORT_JOBS_DIR = BASE_DIR / 'reportes' / 'trabajos'
+REPORT_JOBS_WORKERS = 2
+
+# Recomendaciones item–item (libros/recomendador.py); se entrena con manage.py entrenar_recomendador
+RECOMMENDER_MODEL_PATH = BASE_DIR / 'modelos' / 'recomendador.npz'
+RECOMMENDER_TOP_K = 50
+
+# Tableros top-N (LeaderboardEntry): tamaño y umbrales de calificaciones mínimas disponibles (?min_ratings=)
+LEADERBOARD_SIZE = 10
+LEADERBOARD_MIN_RATINGS = (1, 10)
+
+# Medición por petición (bobeda/middleware.py)
+SERVER_TIMING_HEADER = True
+SLOW_REQUEST_THRESHOLD_MS = 500  # None desactiva el registro de peticiones lentas
+SLOW_REQUEST_SQL_LIMIT = 5  # Consultas más lentas incluidas en cada registro
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json_line': {'format': '%(message)s'},  # El mensaje ya es JSON
+    },
+    'handlers': {
+        'slow_requests': {'class': 'logging.StreamHandler', 'formatter': 'json_line'},
+    },
+    'loggers': {
+        'bobeda.slow_requests': {'handlers': ['slow_requests'], 'level': 'WARNING', 'propagate': False},
+    },
 }
+TEST_RUNNER = 'bobeda.test_runner.TestRunner'  # Silencia bobeda.slow_requests en manage.py test
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',  # Sin consultar User en cada petición
     ),
 }
 
@@ -0,0 +1,22 @@
+'''
+Runner de manage.py test: silencia el logger de peticiones lentas para que no ensucie la salida.
+
+Las pruebas del middleware lo siguen leyendo con assertLogs/assertNoLogs, que fijan su propio nivel.
+'''
+import logging
+
+from django.test.runner import DiscoverRunner
+
+SLOW_REQUESTS_LOGGER = 'bobeda.slow_requests'
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        logger = logging.getLogger(SLOW_REQUESTS_LOGGER)
+        self._nivel_anterior = logger.level
+        logger.setLevel(logging.CRITICAL + 1)
+
+    def teardown_test_environment(self, **kwargs):
+        logging.getLogger(SLOW_REQUESTS_LOGGER).setLevel(self._nivel_anterior)
+        super().teardown_test_environment(**kwargs)
@@ -3,8 +3,14 @@ from .models import Author  # Importa el modelo Author
 from .models import Book
 from .models import Genre
 from .models import Rating
+from .models import GenreStats
+from .models import ReportJob
+from .models import LeaderboardEntry
 
 admin.site.register(Book)
 admin.site.register(Author)  # Registra el modelo en el admin
 admin.site.register(Genre)
 admin.site.register(Rating)
+admin.site.register(GenreStats)
+admin.site.register(ReportJob)
+admin.site.register(LeaderboardEntry)
@@ -0,0 +1,127 @@
+'''
+Caché de resultados para las vistas de recomendación y análisis.
+
+Las claves incluyen un token de versión del catálogo; cualquier escritura en
+Rating/Book/Genre reemplaza el token (ver signals.py), así que las entradas
+anteriores dejan de leerse y el backend las desaloja por LRU/TTL. El token vive en la
+misma caché que los resultados: con varios procesos debe ser compartida (BOBEDA_REDIS_URL).
+
+Los cálculos leen de las réplicas. Una réplica puede ir hasta REPLICA_STICKY_SECONDS atrás de
+la escritura que cambió el token (que lleva su instante), así que lo calculado dentro de esa
+ventana vence al cerrarse, y quien acaba de escribir (su contexto lee del primario) la salta.
+'''
+import hashlib
+import json
+import math
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+from bobeda import routers
+
+VERSION_KEY = 'libros:catalog-version'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'LIBROS_CACHE_ALIAS', 'default')]
+
+
+def nueva_version():
+    return f'{uuid.uuid4().hex}-{time.time():.3f}'
+
+
+def ventana_de_replicas(version):
+    """Segundos que faltan para que las réplicas alcancen la escritura que creó esta versión (0 si ya pasó)."""
+    if not settings.DATABASE_REPLICAS:
+        return 0
+    try:
+        instante = float(version.partition('-')[2])
+    except ValueError:  # Token sin instante
+        return 0
+    return max(instante + settings.REPLICA_STICKY_SECONDS - time.time(), 0)
+
+
+def _timeout(version):
+    restante = ventana_de_replicas(version)
+    return math.ceil(restante) if restante else DEFAULT_TIMEOUT
+
+
+def _saltar_cache(version):
+    # Quien acaba de escribir lee del primario: una entrada de la ventana pudo salir de una réplica atrasada
+    return bool(ventana_de_replicas(version)) and routers.lee_del_primario()
+
+
+def catalog_version():
+    """Devuelve el token de versión vigente (crea uno nuevo si fue desalojado)."""
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, nueva_version(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def acatalog_version():
+    cache = get_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, nueva_version(), None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Invalida todos los resultados cacheados cambiando el token de versión."""
+    get_cache().set(VERSION_KEY, nueva_version(), None)
+
+
+def make_key(namespace, params, version=None):
+    digest = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f'libros:{namespace}:{version or catalog_version()}:{digest}'
+
+
+def get_or_compute(namespace, params, compute):
+    """Devuelve (datos, hit). `params` debe estar normalizado; `compute` no recibe argumentos."""
+    cache = get_cache()
+    version = catalog_version()  # La versión se lee antes de calcular
+    key = make_key(namespace, params, version)
+    data = None if _saltar_cache(version) else cache.get(key)
+    hit = data is not None
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+    if not hit:
+        data = compute()
+        cache.set(key, data, _timeout(version))
+    return data, hit
+
+
+async def aget_or_compute(namespace, params, compute):
+    """Versión para vistas asíncronas: `compute` es una función async sin argumentos."""
+    cache = get_cache()
+    version = await acatalog_version()
+    key = make_key(namespace, params, version)
+    data = None if _saltar_cache(version) else await cache.aget(key)
+    hit = data is not None
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+    if not hit:
+        data = await compute()
+        await cache.aset(key, data, _timeout(version))
+    return data, hit
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
@@ -0,0 +1,48 @@
+import django_filters
+from django_filters.constants import EMPTY_VALUES
+
+from .models import Book, Rating
+
+
+class OrderingConDesempate(django_filters.OrderingFilter):
+    """Como OrderingFilter pero con el id como último criterio, para paginar de forma estable.
+
+    El id va en la misma dirección que el último campo para que el índice (campo, id) se recorra sin ordenar.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        return qs.order_by(*ordering, '-pk' if ordering[-1].startswith('-') else 'pk')
+
+
+class BookFilter(django_filters.FilterSet):
+    # ?updated_since=2025-07-09T10:00:00Z → libros creados o modificados desde esa fecha (sincronización incremental)
+    updated_since = django_filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+    # Rangos respaldados por índices compuestos (ver Book.Meta.indexes); se combinan con genres=
+    min_rating = django_filters.NumberFilter(field_name='average_rating', lookup_expr='gte')
+    max_rating = django_filters.NumberFilter(field_name='average_rating', lookup_expr='lte')
+    published_after = django_filters.DateFilter(field_name='published_date', lookup_expr='gte')
+    published_before = django_filters.DateFilter(field_name='published_date', lookup_expr='lte')
+    min_stock = django_filters.NumberFilter(field_name='stock', lookup_expr='gte')
+    max_stock = django_filters.NumberFilter(field_name='stock', lookup_expr='lte')
+    # ?ordering=-average_rating,published_date
+    ordering = OrderingConDesempate(fields=(
+        ('average_rating', 'average_rating'),
+        ('published_date', 'published_date'),
+        ('stock', 'stock'),
+        ('author__name', 'author'),
+    ))
+
+    class Meta:
+        model = Book
+        fields = ['genres', 'author']  # Filtra por genres=1, author=3
+
+
+class RatingFilter(django_filters.FilterSet):
+    updated_since = django_filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+
+    class Meta:
+        model = Rating
+        fields = []
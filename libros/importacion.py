@@ -0,0 +1,212 @@
+"""Importación masiva del catálogo desde CSV o JSON Lines (comando importar_catalogo).
+
+Usa las columnas de /api/books/export/ (title, author, published_date, isbn, stock, download_url, genres);
+las demás se ignoran y las opcionales ausentes toman su valor por defecto. En CSV los géneros van separados
+por comas. Si la fila trae genres, reemplaza los géneros del libro; si no, se conservan.
+
+El archivo se lee en streaming y cada lote va en una transacción: autores por nombre, géneros por nombre,
+libros con upsert por ISBN y las filas de libros_genres en bloque. Las filas inválidas van al archivo de
+rechazos con su número de línea y errores. Tras cada lote confirmado se guarda el punto de control
+(filas leídas) y al relanzar se continúa desde ahí; repetir un lote es inocuo porque todo es upsert.
+"""
+import csv
+import json
+import os
+import tempfile
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from . import cache
+from .models import Author, Book, Genre, GenreStats, LeaderboardEntry
+from .serializers import BookImportRowSerializer
+
+LOTE = 2000
+FORMATOS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+CAMPOS_ACTUALIZABLES = ['title', 'author', 'published_date', 'stock', 'download_url', 'updated_at']
+
+
+def leer(archivo, formato):
+    """Genera (línea, fila) sin cargar el archivo; fila es un dict o el error de lectura (str)."""
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            # Las celdas vacías cuentan como ausentes; None es una columna de más o de menos
+            fila = {clave: valor for clave, valor in fila.items() if clave is not None and valor not in ('', None)}
+            if 'genres' in fila:
+                fila['genres'] = [nombre.strip() for nombre in fila['genres'].split(',') if nombre.strip()]
+            yield lector.line_num, fila
+        return
+    for numero, linea in enumerate(archivo, 1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError as e:
+            yield numero, f'JSON inválido: {e}'
+            continue
+        yield numero, fila if isinstance(fila, dict) else 'Se esperaba un objeto JSON.'
+
+
+class Rechazos:
+    """Archivo de filas rechazadas en el mismo formato de entrada, con columnas extra line y errors."""
+
+    def __init__(self, ruta, formato, continuar):
+        self.ruta = ruta
+        self.formato = formato
+        nuevo = not (continuar and os.path.exists(ruta) and os.path.getsize(ruta))
+        self.archivo = open(ruta, 'a' if continuar else 'w', encoding='utf-8', newline='')
+        self.escritor = None
+        self.escribir_encabezado = nuevo
+
+    def agregar(self, linea, fila, errores):
+        if self.formato == 'jsonl':
+            self.archivo.write(json.dumps({'line': linea, 'errors': errores, 'row': fila}, ensure_ascii=False) + '\n')
+            return
+        if self.escritor is None:
+            columnas = ['line', 'errors', 'title', 'author', 'published_date', 'isbn', 'stock', 'download_url', 'genres']
+            self.escritor = csv.DictWriter(self.archivo, columnas, extrasaction='ignore')
+            if self.escribir_encabezado:
+                self.escritor.writeheader()
+        fila = dict(fila) if isinstance(fila, dict) else {}
+        if isinstance(fila.get('genres'), list):
+            fila['genres'] = ', '.join(fila['genres'])
+        self.escritor.writerow({**fila, 'line': linea, 'errors': json.dumps(errores, ensure_ascii=False)})
+
+    def cerrar(self):
+        self.archivo.close()
+
+
+def _autores(nombres):
+    """{nombre: id}; si hay homónimos se usa el más antiguo y los que faltan se crean."""
+    ids = dict(Author.objects.filter(name__in=nombres).order_by('-pk').values_list('name', 'pk'))
+    nuevos = Author.objects.bulk_create([Author(name=nombre) for nombre in sorted(nombres - ids.keys())])
+    ids.update((autor.name, autor.pk) for autor in nuevos)
+    return ids
+
+
+def _generos(nombres):
+    """{nombre: id}, creando los que faltan (y sus estadísticas, porque bulk_create no emite post_save)."""
+    ids = dict(Genre.objects.filter(name__in=nombres).values_list('name', 'pk'))
+    faltan = nombres - ids.keys()
+    if faltan:
+        Genre.objects.bulk_create([Genre(name=nombre) for nombre in sorted(faltan)], ignore_conflicts=True)
+        creados = dict(Genre.objects.filter(name__in=faltan).values_list('name', 'pk'))
+        GenreStats.objects.bulk_create([GenreStats(genre_id=pk) for pk in creados.values()], ignore_conflicts=True)
+        ids.update(creados)
+    return ids
+
+
+def guardar_lote(filas):
+    """Upsert de {isbn: datos validados}; devuelve (creados, actualizados)."""
+    with transaction.atomic():
+        autores = _autores({datos['author'] for datos in filas.values()})
+        generos = _generos({nombre for datos in filas.values() for nombre in datos.get('genres', ())})
+        existentes = set(Book.objects.filter(isbn__in=filas.keys()).values_list('isbn', flat=True))
+        Book.objects.bulk_create(
+            [
+                Book(
+                    isbn=isbn, title=datos['title'], author_id=autores[datos['author']],
+                    published_date=datos['published_date'], stock=datos['stock'], download_url=datos['download_url'],
+                )
+                for isbn, datos in filas.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['isbn'],
+            update_fields=CAMPOS_ACTUALIZABLES,
+        )
+
+        # Géneros: solo se reescriben los libros cuyo conjunto cambió
+        ids = dict(Book.objects.filter(isbn__in=filas.keys()).values_list('isbn', 'pk'))
+        deseados = {ids[isbn]: {generos[nombre] for nombre in datos['genres']}
+                    for isbn, datos in filas.items() if 'genres' in datos}
+        Through = Book.genres.through
+        actuales = {book_id: set() for book_id in deseados}
+        for book_id, genre_id in Through.objects.filter(book_id__in=deseados).values_list('book_id', 'genre_id'):
+            actuales[book_id].add(genre_id)
+        cambiados = [book_id for book_id, genre_ids in deseados.items() if genre_ids != actuales[book_id]]
+        if cambiados:
+            Through.objects.filter(book_id__in=cambiados).delete()
+            Through.objects.bulk_create(
+                [Through(book_id=book_id, genre_id=genre_id) for book_id in cambiados for genre_id in deseados[book_id]]
+            )
+
+            # Los libros nuevos no tienen calificaciones: a sus géneros solo se les suma book_count.
+            # Los existentes pueden aportar calificaciones, así que sus géneros se recalculan.
+            previos = {ids[isbn] for isbn in existentes}
+            recalcular = set().union(*(actuales[b] | deseados[b] for b in cambiados if b in previos))
+            sumar = Counter(genre_id for b in cambiados if b not in previos for genre_id in deseados[b] - recalcular)
+            por_cantidad = {}
+            for genre_id, cantidad in sumar.items():
+                por_cantidad.setdefault(cantidad, []).append(genre_id)
+            for cantidad, genre_ids in por_cantidad.items():
+                GenreStats.objects.filter(genre_id__in=genre_ids).apply_delta(book_count=cantidad)
+            if recalcular:
+                GenreStats.objects.filter(genre_id__in=recalcular).rebuild()
+                LeaderboardEntry.objects.refresh_books([b for b in cambiados if b in previos])
+        transaction.on_commit(cache.invalidate)  # bulk_create no emite post_save
+    return len(filas) - len(existentes), len(existentes)
+
+
+def _guardar_punto_control(ruta, estado):
+    """Escribe el punto de control de forma atómica (archivo temporal + os.replace)."""
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(ruta)), suffix='.json')
+    with os.fdopen(fd, 'w', encoding='utf-8') as archivo:
+        json.dump(estado, archivo)
+    os.replace(temporal, ruta)
+
+
+def importar(ruta, formato=None, lote=LOTE, rechazos=None, punto_control=None, reiniciar=False, avisar=None):
+    """Importa el archivo y devuelve los contadores (filas, creados, actualizados, duplicados, rechazados)."""
+    formato = formato or FORMATOS.get(os.path.splitext(ruta)[1].lower())
+    if formato not in FORMATOS.values():
+        raise ValueError('Formato desconocido: usa un archivo .csv o .jsonl, o indica el formato.')
+    punto_control = punto_control or f'{ruta}.checkpoint.json'
+    rechazos = rechazos or f'{ruta}.rechazos.{formato}'
+    avisar = avisar or (lambda mensaje: None)
+    tamano = os.path.getsize(ruta)
+
+    contadores = {'filas': 0, 'creados': 0, 'actualizados': 0, 'duplicados': 0, 'rechazados': 0}
+    continuar = not reiniciar and os.path.exists(punto_control)
+    if continuar:
+        with open(punto_control, encoding='utf-8') as archivo:
+            estado = json.load(archivo)
+        if estado['tamano'] != tamano:
+            raise ValueError(f'El punto de control {punto_control} es de otra versión del archivo; usa --reiniciar.')
+        contadores = estado['contadores']
+        avisar(f'Continuando tras {contadores["filas"]} filas')
+
+    salida = Rechazos(rechazos, formato, continuar)
+    validador = BookImportRowSerializer()  # Una sola instancia: crear un serializador por fila copia sus campos
+    try:
+        with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+            filas = islice(leer(archivo, formato), contadores['filas'], None)
+            while bloque := list(islice(filas, lote)):
+                validas = {}
+                for linea, fila in bloque:
+                    try:
+                        if not isinstance(fila, dict):
+                            raise serializers.ValidationError({'non_field_errors': [fila]})
+                        datos = validador.run_validation(fila)
+                    except serializers.ValidationError as e:
+                        salida.agregar(linea, fila, e.detail)
+                        contadores['rechazados'] += 1
+                        continue
+                    if datos['isbn'] in validas:
+                        contadores['duplicados'] += 1  # Dentro del lote gana la última aparición
+                    validas[datos['isbn']] = datos
+                creados, actualizados = guardar_lote(validas) if validas else (0, 0)
+                salida.archivo.flush()
+                contadores['filas'] += len(bloque)
+                contadores['creados'] += creados
+                contadores['actualizados'] += actualizados
+                _guardar_punto_control(punto_control, {'archivo': os.path.abspath(ruta), 'tamano': tamano, 'contadores': contadores})
+                avisar(f'{contadores["filas"]} filas: {contadores["creados"]} creados, '
+                       f'{contadores["actualizados"]} actualizados, {contadores["rechazados"]} rechazados')
+    finally:
+        salida.cerrar()
+    if os.path.exists(punto_control):
+        os.remove(punto_control)  # Importación completa: la próxima empieza de cero
+    return contadores
@@ -0,0 +1,96 @@
+"""Cola de reportes respaldada por la tabla ReportJob y un pool de hilos en el proceso.
+
+No hay broker: la fila es el mensaje. Una petición encola (o reutiliza) un trabajo y, tras el
+commit, lo envía al pool; el primer hilo que lo reclama con un UPDATE condicional lo procesa.
+Los trabajos que queden pendientes tras un reinicio se drenan con `manage.py procesar_reportes`.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from bobeda import routers
+
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.REPORT_JOBS_WORKERS, thread_name_prefix='reportes'
+            )
+    return _executor
+
+
+def clave(genre_ids, formato):
+    """Misma clave para el mismo conjunto de géneros y formato, sin importar orden ni repetidos."""
+    normalizado = f"{formato}:{','.join(map(str, sorted(set(genre_ids))))}"
+    return hashlib.sha256(normalizado.encode()).hexdigest()
+
+
+def solicitar(genre_ids, formato, user=None, intentos=3):
+    """Devuelve (trabajo, creado). Si ya hay uno activo idéntico se reutiliza."""
+    key = clave(genre_ids, formato)
+    for intento in range(intentos):
+        existente = ReportJob.objects.filter(key=key, status__in=ReportJob.ACTIVE).first()
+        if existente is not None:
+            return existente, False
+        try:
+            with transaction.atomic():
+                job = ReportJob.objects.create(
+                    key=key, genre_ids=sorted(set(genre_ids)), format=formato, requested_by=user
+                )
+        except IntegrityError:
+            # Otra petición idéntica ganó la carrera (la restricción parcial garantiza un único activo).
+            # Se vuelve a buscar; si el ganador ya terminó, se intenta crear de nuevo.
+            if intento == intentos - 1:
+                raise
+            continue
+        transaction.on_commit(lambda: get_executor().submit(_procesar_en_hilo, job.pk))
+        return job, True
+
+
+def reclamar(job_id):
+    """Pasa el trabajo a 'running' solo si sigue pendiente; True si este llamador lo obtuvo."""
+    return ReportJob.objects.filter(pk=job_id, status=ReportJob.PENDING).update(
+        status=ReportJob.RUNNING, started_at=timezone.now()
+    ) == 1
+
+
+def procesar(job_id):
+    if not reclamar(job_id):
+        return False
+    job = ReportJob.objects.get(pk=job_id)
+    try:
+        from . import reportes  # reportlab/openpyxl/matplotlib solo en los hilos de trabajo
+        ruta = reportes.generar(job)
+    except Exception as exc:
+        logger.exception('Fallo al generar el reporte %s', job_id)
+        ReportJob.objects.filter(pk=job_id).update(
+            status=ReportJob.FAILED, error=str(exc), finished_at=timezone.now()
+        )
+        return False
+    ReportJob.objects.filter(pk=job_id).update(
+        status=ReportJob.DONE, file=str(ruta), finished_at=timezone.now()
+    )
+    return True
+
+
+def _procesar_en_hilo(job_id):
+    _, token = routers.abrir()  # Lee lo propio durante el trabajo, sin dejar el hilo fijo en el primario
+    try:
+        procesar(job_id)
+    finally:
+        routers.cerrar(token)
+        connections.close_all()  # cada hilo abre sus propias conexiones
@@ -0,0 +1,27 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from libros import recomendador
+
+
+class Command(BaseCommand):
+    help = 'Entrena o refresca el modelo de recomendaciones item–item y lo guarda en RECOMMENDER_MODEL_PATH.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help='Recalcula todo en lugar de aplicar solo los cambios.')
+        parser.add_argument('--k', type=int, help='Vecinos por libro (por defecto RECOMMENDER_TOP_K; implica --completo).')
+
+    def handle(self, *args, **options):
+        ruta = settings.RECOMMENDER_MODEL_PATH
+        if options['completo'] or options['k'] or not os.path.exists(ruta):
+            modelo = recomendador.entrenar(options['k'])
+            recalculados = len(modelo.libros)
+        else:
+            modelo, recalculados = recomendador.refrescar(recomendador.cargar(ruta))
+        recomendador.guardar(modelo, ruta)
+        self.stdout.write(self.style.SUCCESS(
+            f'Modelo guardado en {ruta}: {len(modelo.libros)} libros, {len(modelo.usuarios)} usuarios, '
+            f'{recalculados} libros recalculados'
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from libros import sintetico
+
+
+class Command(BaseCommand):
+    help = 'Genera un catálogo sintético (autores, géneros, libros, usuarios y calificaciones) con popularidad Zipf.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--autores', type=int, default=1000)
+        parser.add_argument('--libros', type=int, default=10000)
+        parser.add_argument('--generos', type=int, default=50)
+        parser.add_argument('--usuarios', type=int, default=5000)
+        parser.add_argument('--calificaciones', type=int, default=100000)
+        parser.add_argument('--semilla', type=int, default=0, help='La misma semilla genera los mismos datos.')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Exponente de la popularidad (0 = uniforme).')
+        parser.add_argument('--solape', type=float, default=0.3, help='Probabilidad de cada género extra por libro.')
+        parser.add_argument('--max-generos', type=int, default=3, help='Géneros por libro como máximo.')
+        parser.add_argument('--lote', type=int, default=sintetico.LOTE, help='Filas por bulk_create.')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['solape'] <= 1:
+            raise CommandError('--solape debe estar entre 0 y 1.')
+        try:
+            creados = sintetico.generar(
+                options['autores'], options['libros'], options['generos'], options['usuarios'],
+                options['calificaciones'], semilla=options['semilla'], zipf=options['zipf'],
+                solape=options['solape'], max_generos=options['max_generos'], lote=options['lote'],
+                avisar=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            'Catálogo generado: ' + ', '.join(f'{cantidad} {nombre}' for nombre, cantidad in creados.items())
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from libros import importacion
+
+
+class Command(BaseCommand):
+    help = 'Importa libros, autores y géneros desde un CSV o JSON Lines grande, por lotes y con punto de control.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Por defecto, según la extensión.')
+        parser.add_argument('--lote', type=int, default=importacion.LOTE, help='Filas por transacción.')
+        parser.add_argument('--rechazos', help='Archivo de filas rechazadas (por defecto <archivo>.rechazos.<formato>).')
+        parser.add_argument('--punto-control', help='Por defecto <archivo>.checkpoint.json.')
+        parser.add_argument('--reiniciar', action='store_true', help='Ignora el punto de control y empieza desde el principio.')
+
+    def handle(self, *args, **options):
+        try:
+            contadores = importacion.importar(
+                options['archivo'], formato=options['formato'], lote=options['lote'], rechazos=options['rechazos'],
+                punto_control=options['punto_control'], reiniciar=options['reiniciar'], avisar=self.stdout.write,
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'Importación completa: {contadores["filas"]} filas, {contadores["creados"]} creados, '
+            f'{contadores["actualizados"]} actualizados, {contadores["duplicados"]} duplicados, '
+            f'{contadores["rechazados"]} rechazados'
+        ))
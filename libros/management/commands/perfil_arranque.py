@@ -0,0 +1,74 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MODULOS = ['bobeda.wsgi', 'bobeda.asgi']
+# Solo deben cargarse al generar un reporte, un gráfico o el modelo de recomendaciones
+PESADOS = ['matplotlib', 'seaborn', 'pandas', 'reportlab', 'openpyxl', 'numpy', 'scipy']
+
+CODIGO = '''
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+from django.urls import get_resolver
+get_resolver().url_patterns  # La URLconf (y con ella las vistas) se carga en la primera petición
+print(json.dumps({{'ms': (time.perf_counter() - inicio) * 1000, 'modulos': sorted(sys.modules)}}))
+'''
+LINEA = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def medir(modulo):
+    """Importa el módulo en un intérprete nuevo con -X importtime.
+
+    Devuelve el tiempo total (ms), el tiempo propio por paquete raíz (ms) y los PESADOS que quedaron cargados.
+    """
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CODIGO.format(modulo=modulo)],
+        capture_output=True, text=True, cwd=settings.BASE_DIR, env=os.environ.copy(),
+    )
+    if proceso.returncode:
+        raise CommandError(f'No se pudo importar {modulo}:\n{proceso.stderr[-2000:]}')
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+    paquetes = {}
+    for propio, _, _, nombre in LINEA.findall(proceso.stderr):
+        raiz = nombre.split('.')[0]
+        paquetes[raiz] = paquetes.get(raiz, 0) + int(propio) / 1000
+    cargados = {nombre.split('.')[0] for nombre in resultado['modulos']}
+    return {
+        'ms': resultado['ms'],
+        'modulos': len(resultado['modulos']),
+        'paquetes': dict(sorted(paquetes.items(), key=lambda item: -item[1])),
+        'pesados': [nombre for nombre in PESADOS if nombre in cargados],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mide el arranque en frío de bobeda.wsgi y bobeda.asgi (incluida la URLconf) y lo desglosa por paquete.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modulos', nargs='*', default=MODULOS)
+        parser.add_argument('--repeticiones', type=int, default=3, help='Se informa la más rápida.')
+        parser.add_argument('--top', type=int, default=10, help='Paquetes a listar.')
+        parser.add_argument('--max-ms', type=float, help='Falla si algún módulo tarda más.')
+        parser.add_argument('--permitir-pesados', action='store_true', help='No falla si se cargan los PESADOS.')
+
+    def handle(self, *args, **options):
+        fallas = []
+        for modulo in options['modulos']:
+            medicion = min((medir(modulo) for _ in range(max(options['repeticiones'], 1))), key=lambda m: m['ms'])
+            self.stdout.write(f'{modulo}: {medicion["ms"]:.0f} ms, {medicion["modulos"]} módulos')
+            for paquete, ms in list(medicion['paquetes'].items())[:options['top']]:
+                self.stdout.write(f'  {paquete:<28} {ms:8.1f} ms')
+            self.stdout.write(f'  pesados cargados: {", ".join(medicion["pesados"]) or "ninguno"}')
+            if medicion['pesados'] and not options['permitir_pesados']:
+                fallas.append(f'{modulo} carga {", ".join(medicion["pesados"])}')
+            if options['max_ms'] is not None and medicion['ms'] > options['max_ms']:
+                fallas.append(f'{modulo} tarda {medicion["ms"]:.0f} ms (máximo {options["max_ms"]:.0f})')
+        if fallas:
+            raise CommandError('; '.join(fallas))
+        self.stdout.write(self.style.SUCCESS('Arranque dentro de lo esperado'))
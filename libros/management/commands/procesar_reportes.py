@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from libros import jobs
+from libros.models import ReportJob
+
+
+class Command(BaseCommand):
+    help = 'Procesa los trabajos de reporte pendientes (p. ej. los que quedaron en cola tras un reinicio).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reencolar-tras', type=int, metavar='MINUTOS',
+            help='Vuelve a poner en cola los trabajos "running" que empezaron hace más de MINUTOS minutos.',
+        )
+
+    def handle(self, *args, **options):
+        if options['reencolar_tras'] is not None:
+            limite = timezone.now() - timedelta(minutes=options['reencolar_tras'])
+            reencolados = ReportJob.objects.filter(status=ReportJob.RUNNING, started_at__lt=limite).update(
+                status=ReportJob.PENDING, started_at=None
+            )
+            self.stdout.write(f'{reencolados} trabajos reencolados')
+        pendientes = ReportJob.objects.filter(status=ReportJob.PENDING).order_by('created_at').values_list('pk', flat=True)
+        resultados = [jobs.procesar(pk) for pk in list(pendientes)]
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultados.count(True)} reportes generados, {resultados.count(False)} fallidos u omitidos'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from libros import cache
+from libros.models import Book, Genre, GenreStats, LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los agregados de calificaciones de libros, las estadísticas por género y los tableros top-N.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            actualizados = Book.objects.rebuild_rating_aggregates()
+            GenreStats.objects.bulk_create(
+                [GenreStats(genre=genre) for genre in Genre.objects.filter(stats__isnull=True)]
+            )
+            generos = GenreStats.objects.rebuild()
+            LeaderboardEntry.objects.rebuild()
+            transaction.on_commit(cache.invalidate)
+        self.stdout.write(self.style.SUCCESS(f'Agregados recalculados para {actualizados} libros y {generos} géneros'))
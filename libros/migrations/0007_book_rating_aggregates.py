@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:20
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def rellenar_agregados(apps, schema_editor):
+    Book = apps.get_model('libros', 'Book')
+    Rating = apps.get_model('libros', 'Rating')
+    ratings = Rating.objects.filter(book=OuterRef('pk')).order_by().values('book')
+    rating_count = Coalesce(Subquery(ratings.annotate(c=Count('id')).values('c')), 0)
+    rating_sum = Coalesce(Subquery(ratings.annotate(s=Sum('score')).values('s')), 0)
+    average = Cast(rating_sum, FloatField()) / NullIf(rating_count, Value(0))
+    decimal_field = models.DecimalField(max_digits=3, decimal_places=2)
+    Book.objects.update(
+        rating_count=rating_count,
+        rating_sum=rating_sum,
+        average_rating=Coalesce(Cast(average, decimal_field), Value(Decimal('0.00')), output_field=decimal_field),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0006_book_average_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Número de calificaciones'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Suma de calificaciones'),
+        ),
+        migrations.RunPython(rellenar_agregados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:28
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def crear_estadisticas(apps, schema_editor):
+    Genre = apps.get_model('libros', 'Genre')
+    GenreStats = apps.get_model('libros', 'GenreStats')
+    Rating = apps.get_model('libros', 'Rating')
+    Through = apps.get_model('libros', 'Book').genres.through
+    GenreStats.objects.bulk_create([GenreStats(genre_id=pk) for pk in Genre.objects.values_list('pk', flat=True)])
+
+    libros = Through.objects.filter(genre=OuterRef('genre')).order_by().values('genre')
+    ratings = Rating.objects.filter(book__genres=OuterRef('genre')).order_by().values('book__genres')
+
+    def agregado(queryset, expresion):
+        return Coalesce(Subquery(queryset.annotate(valor=expresion).values('valor')), 0)
+
+    rating_count = agregado(ratings, Count('id'))
+    rating_sum = agregado(ratings, Sum('score'))
+    decimal_field = models.DecimalField(max_digits=3, decimal_places=2)
+    average = Cast(Cast(rating_sum, FloatField()) / NullIf(rating_count, Value(0)), decimal_field)
+    GenreStats.objects.update(
+        book_count=agregado(libros, Count('id')),
+        rating_count=rating_count,
+        rating_sum=rating_sum,
+        average_rating=Coalesce(average, Value(Decimal('0.00')), output_field=decimal_field),
+        **{f'stars_{score}': agregado(ratings, Count('id', filter=Q(score=score))) for score in range(1, 6)},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenreStats',
+            fields=[
+                ('genre', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='libros.genre', verbose_name='Género')),
+                ('book_count', models.PositiveIntegerField(default=0, verbose_name='Número de libros')),
+                ('rating_count', models.PositiveIntegerField(default=0, verbose_name='Número de calificaciones')),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='Suma de calificaciones')),
+                ('average_rating', models.DecimalField(decimal_places=2, default=0.0, max_digits=3, verbose_name='Ranking promedio')),
+                ('stars_1', models.PositiveIntegerField(default=0, verbose_name='Calificaciones de 1 ⭐')),
+                ('stars_2', models.PositiveIntegerField(default=0, verbose_name='Calificaciones de 2 ⭐')),
+                ('stars_3', models.PositiveIntegerField(default=0, verbose_name='Calificaciones de 3 ⭐')),
+                ('stars_4', models.PositiveIntegerField(default=0, verbose_name='Calificaciones de 4 ⭐')),
+                ('stars_5', models.PositiveIntegerField(default=0, verbose_name='Calificaciones de 5 ⭐')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+            ],
+        ),
+        migrations.RunPython(crear_estadisticas, migrations.RunPython.noop),
+    ]
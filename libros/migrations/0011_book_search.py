@@ -0,0 +1,120 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:38
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# PostgreSQL: vector ponderado (título A, autor B, biografía C) en libros_book.search_vector con índice GIN.
+POSTGRES = [
+    """
+    CREATE OR REPLACE FUNCTION libros_book_search_vector() RETURNS trigger AS $$
+    BEGIN
+        SELECT setweight(to_tsvector('spanish', coalesce(NEW.title, '')), 'A')
+            || setweight(to_tsvector('spanish', coalesce(a.name, '')), 'B')
+            || setweight(to_tsvector('spanish', coalesce(a.bio, '')), 'C')
+          INTO NEW.search_vector
+          FROM libros_author a WHERE a.id = NEW.author_id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER libros_book_search_vector
+    BEFORE INSERT OR UPDATE OF title, author_id ON libros_book
+    FOR EACH ROW EXECUTE FUNCTION libros_book_search_vector()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION libros_author_search_vector() RETURNS trigger AS $$
+    BEGIN
+        UPDATE libros_book SET title = title WHERE author_id = NEW.id;  -- recalcula vía el trigger del libro
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER libros_author_search_vector
+    AFTER UPDATE OF name, bio ON libros_author
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.bio IS DISTINCT FROM NEW.bio)
+    EXECUTE FUNCTION libros_author_search_vector()
+    """,
+    "UPDATE libros_book SET title = title",
+    "CREATE INDEX libros_book_search_gin ON libros_book USING gin (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS libros_book_search_gin",
+    "DROP TRIGGER IF EXISTS libros_author_search_vector ON libros_author",
+    "DROP FUNCTION IF EXISTS libros_author_search_vector()",
+    "DROP TRIGGER IF EXISTS libros_book_search_vector ON libros_book",
+    "DROP FUNCTION IF EXISTS libros_book_search_vector()",
+]
+
+# SQLite (pruebas y desarrollo local): tabla FTS5 externa con rowid = id del libro.
+SQLITE = [
+    """
+    CREATE VIRTUAL TABLE libros_book_fts USING fts5(
+        title, author_name, author_bio, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER libros_book_fts_insert AFTER INSERT ON libros_book BEGIN
+        INSERT INTO libros_book_fts (rowid, title, author_name, author_bio)
+        SELECT NEW.id, NEW.title, a.name, coalesce(a.bio, '') FROM libros_author a WHERE a.id = NEW.author_id;
+    END
+    """,
+    """
+    CREATE TRIGGER libros_book_fts_update AFTER UPDATE OF title, author_id ON libros_book BEGIN
+        DELETE FROM libros_book_fts WHERE rowid = OLD.id;
+        INSERT INTO libros_book_fts (rowid, title, author_name, author_bio)
+        SELECT NEW.id, NEW.title, a.name, coalesce(a.bio, '') FROM libros_author a WHERE a.id = NEW.author_id;
+    END
+    """,
+    """
+    CREATE TRIGGER libros_book_fts_delete AFTER DELETE ON libros_book BEGIN
+        DELETE FROM libros_book_fts WHERE rowid = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER libros_author_fts_update AFTER UPDATE OF name, bio ON libros_author BEGIN
+        UPDATE libros_book_fts SET author_name = NEW.name, author_bio = coalesce(NEW.bio, '')
+        WHERE rowid IN (SELECT id FROM libros_book WHERE author_id = NEW.id);
+    END
+    """,
+    """
+    INSERT INTO libros_book_fts (rowid, title, author_name, author_bio)
+    SELECT b.id, b.title, a.name, coalesce(a.bio, '') FROM libros_book b JOIN libros_author a ON a.id = b.author_id
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS libros_author_fts_update",
+    "DROP TRIGGER IF EXISTS libros_book_fts_delete",
+    "DROP TRIGGER IF EXISTS libros_book_fts_update",
+    "DROP TRIGGER IF EXISTS libros_book_fts_insert",
+    "DROP TABLE IF EXISTS libros_book_fts",
+]
+
+
+def _ejecutar(sentencias):
+    def operacion(apps, schema_editor):
+        for sql in sentencias.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operacion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0010_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            _ejecutar({'postgresql': POSTGRES, 'sqlite': SQLITE}),
+            _ejecutar({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0011_book_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['name', 'id'], name='author_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['average_rating', 'id'], name='book_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['published_date', 'id'], name='book_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['stock', 'id'], name='book_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author', 'average_rating', 'id'], name='book_author_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['book', 'score'], name='rating_book_score_idx'),
+        ),
+        # La tabla intermedia de Book.genres es automática: su índice compuesto va en SQL
+        # (genre_id, book_id) cubre ?genres=<id> sin volver a la tabla
+        migrations.RunSQL(
+            'CREATE INDEX book_genres_genre_book_idx ON libros_book_genres (genre_id, book_id)',
+            'DROP INDEX book_genres_genre_book_idx',
+        ),
+    ]
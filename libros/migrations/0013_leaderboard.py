@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def poblar_tableros(apps, schema_editor):
+    Book = apps.get_model('libros', 'Book')
+    Genre = apps.get_model('libros', 'Genre')
+    LeaderboardEntry = apps.get_model('libros', 'LeaderboardEntry')
+    entradas = []
+    for genre_id in [None, *Genre.objects.values_list('pk', flat=True)]:
+        for umbral in settings.LEADERBOARD_MIN_RATINGS:
+            libros = Book.objects.filter(rating_count__gte=max(umbral, 1))
+            if genre_id is not None:
+                libros = libros.filter(genres=genre_id)
+            libros = libros.order_by('-average_rating', '-rating_count', 'pk')[:settings.LEADERBOARD_SIZE]
+            entradas += [
+                LeaderboardEntry(genre_id=genre_id, min_ratings=umbral, **libro)
+                for libro in libros.values('average_rating', 'rating_count', book_id=F('pk'))
+            ]
+    LeaderboardEntry.objects.bulk_create(entradas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0012_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_ratings', models.PositiveIntegerField(verbose_name='Mínimo de calificaciones')),
+                ('average_rating', models.DecimalField(decimal_places=2, max_digits=3, verbose_name='Ranking promedio')),
+                ('rating_count', models.PositiveIntegerField(verbose_name='Número de calificaciones')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='libros.book', verbose_name='Libro')),
+                ('genre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard', to='libros.genre', verbose_name='Género')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['genre', 'min_ratings', '-average_rating', '-rating_count', 'book'], name='leaderboard_board_idx')],
+                'constraints': [models.UniqueConstraint(fields=('genre', 'min_ratings', 'book'), name='leaderboard_unique_book'), models.UniqueConstraint(condition=models.Q(('genre__isnull', True)), fields=('min_ratings', 'book'), name='leaderboard_unique_global_book')],
+            },
+        ),
+        migrations.RunPython(poblar_tableros, migrations.RunPython.noop),
+    ]
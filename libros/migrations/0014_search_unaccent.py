@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# PostgreSQL: configuración spanish_unaccent (unaccent + stemmer español) para que "garcia" encuentre
+# "García", igual que remove_diacritics en el FTS5 de SQLite. La extensión unaccent requiere permisos
+# para CREATE EXTENSION (o que ya esté instalada en la base).
+VECTOR = """
+    CREATE OR REPLACE FUNCTION libros_book_search_vector() RETURNS trigger AS $$
+    BEGIN
+        SELECT setweight(to_tsvector('{config}', coalesce(NEW.title, '')), 'A')
+            || setweight(to_tsvector('{config}', coalesce(a.name, '')), 'B')
+            || setweight(to_tsvector('{config}', coalesce(a.bio, '')), 'C')
+          INTO NEW.search_vector
+          FROM libros_author a WHERE a.id = NEW.author_id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE TEXT SEARCH CONFIGURATION spanish_unaccent (COPY = spanish)",
+    """
+    ALTER TEXT SEARCH CONFIGURATION spanish_unaccent
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem
+    """,
+    VECTOR.format(config='spanish_unaccent'),
+    "UPDATE libros_book SET title = title",
+]
+
+POSTGRES_REVERSE = [
+    VECTOR.format(config='spanish'),
+    "UPDATE libros_book SET title = title",
+    "DROP TEXT SEARCH CONFIGURATION IF EXISTS spanish_unaccent",
+]
+
+
+def _ejecutar(sentencias):
+    def operacion(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for sql in sentencias:
+                schema_editor.execute(sql)
+    return operacion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libros', '0013_leaderboard'),
+    ]
+
+    operations = [
+        migrations.RunPython(_ejecutar(POSTGRES), _ejecutar(POSTGRES_REVERSE)),
+    ]
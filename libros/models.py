@@ -7,9 +7,16 @@ unique=False: Elimina la restricción de unicidad (si no la necesitas)
 
 verbose_name y help_text: Mejoran la experiencia en el panel admin.
 '''
-from django.db import models
+import operator
+import uuid
+from decimal import Decimal
+from functools import reduce
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import User  # Importa el modelo User de Django
-from django.db.models import Avg # Calcular promedio
+from django.db.models import Count, F, FloatField, OuterRef, Prefetch, Q, Subquery, Sum, Value # Calcular promedio
+from django.db.models.functions import Cast, Coalesce, Now, NullIf
+from django.contrib.postgres.search import SearchVectorField
 
 class Author(models.Model):
     name = models.CharField(max_length=100)
@@ -17,6 +24,11 @@ class Author(models.Model):
     email = models.EmailField(blank=True, null=True, unique=False)  #opcional
     bio = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'id'], name='author_name_idx'),  # ?ordering=author
+        ]
+
     def __str__(self):
         return self.name
     
@@ -29,6 +41,48 @@ class Genre(models.Model):
         return self.name
 
 
+class BookQuerySet(models.QuerySet):
+    def with_api_relations(self):
+        """Carga autor, géneros, calificaciones y sus usuarios en un número fijo de consultas."""
+        return self.select_related('author').prefetch_related(
+            'genres',
+            Prefetch('rating_set', queryset=Rating.objects.select_related('user').order_by('id')),
+        )
+
+    def apply_rating_delta(self, count_delta, sum_delta):
+        """Suma los deltas a rating_count/rating_sum y recalcula el promedio en la misma sentencia UPDATE."""
+        new_count = F('rating_count') + count_delta
+        new_sum = F('rating_sum') + sum_delta
+        return self.update(
+            rating_count=new_count,
+            rating_sum=new_sum,
+            average_rating=average_rating_expression(new_sum, new_count),
+            updated_at=Now(),  # update() no aplica auto_now
+        )
+
+    def rebuild_rating_aggregates(self):
+        """Recalcula conteo, suma y promedio desde la tabla de calificaciones en un solo UPDATE."""
+        ratings = Rating.objects.filter(book=OuterRef('pk')).order_by().values('book')
+        new_count = Coalesce(Subquery(ratings.annotate(c=Count('id')).values('c')), 0)
+        new_sum = Coalesce(Subquery(ratings.annotate(s=Sum('score')).values('s')), 0)
+        return self.update(
+            rating_count=new_count,
+            rating_sum=new_sum,
+            average_rating=average_rating_expression(new_sum, new_count),
+            updated_at=Now(),  # update() no aplica auto_now
+        )
+
+
+def average_rating_expression(rating_sum, rating_count):
+    """Expresión SQL de sum/count redondeada a 2 decimales (0 si no hay calificaciones)."""
+    average = Cast(rating_sum, FloatField()) / NullIf(rating_count, Value(0))
+    return Coalesce(
+        Cast(average, models.DecimalField(max_digits=3, decimal_places=2)),
+        Value(Decimal('0.00')),
+        output_field=models.DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
 class Book(models.Model):
     title = models.CharField(max_length=200)
     author = models.ForeignKey(Author, on_delete=models.CASCADE)
@@ -53,12 +107,41 @@ class Book(models.Model):
         default=0.00,
         verbose_name="Ranking promedio" # Calcula el promedio 
     )
+
+    rating_count = models.PositiveIntegerField(default=0, verbose_name="Número de calificaciones")
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name="Suma de calificaciones")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Fecha de actualización")
+    # Título + autor + biografía; lo mantienen triggers de la base de datos (ver migración 0011 y search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        # Filtros de rango y ?ordering= del listado (BookFilter); el id desempata el orden
+        indexes = [
+            models.Index(fields=['average_rating', 'id'], name='book_rating_idx'),
+            models.Index(fields=['published_date', 'id'], name='book_published_idx'),
+            models.Index(fields=['stock', 'id'], name='book_stock_idx'),
+            models.Index(fields=['author', 'average_rating', 'id'], name='book_author_rating_idx'),
+        ]
     
+    AGREGADOS = ('rating_count', 'rating_sum', 'average_rating')
+
+    def save(self, *args, **kwargs):
+        # Los agregados solo los escriben UPDATE atómicos de Rating: guardarlos desde una instancia leída
+        # antes pisaría las calificaciones confirmadas entretanto (p. ej. un PUT/PATCH del libro)
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            diferidos = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                campo.attname for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.AGREGADOS and campo.attname not in diferidos
+            ]
+        super().save(*args, **kwargs)
+
     def update_average_rating(self):
-        """Actualiza el promedio de calificaciones cada vez que se modifica una reseña."""
-        avg_rating = self.rating_set.aggregate(Avg('score'))['score__avg'] or 0
-        self.average_rating = round(avg_rating, 2)
-        self.save()
+        """Recalcula desde cero el agregado de calificaciones de este libro (repara desajustes)."""
+        Book.objects.filter(pk=self.pk).rebuild_rating_aggregates()
+        self.refresh_from_db(fields=['rating_count', 'rating_sum', 'average_rating'])
 
     def __str__(self):
         return self.title
@@ -73,19 +156,319 @@ class Rating(models.Model):
     )
     comment = models.TextField(blank=True, null=True, verbose_name="Comentario")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
 
     class Meta:
         unique_together = ('user', 'book')  # Evita que un usuario califique el mismo libro múltiples veces
+        indexes = [
+            models.Index(fields=['book', 'updated_at'], name='rating_book_updated_idx'),  # ETag de /<id>/ratings/
+            models.Index(fields=['book', 'score'], name='rating_book_score_idx'),  # Recomendaciones por puntaje
+        ]
 
     
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)  # Guarda la calificación
-        self.book.update_average_rating()  # Actualiza el promedio del libro
+        with transaction.atomic():
+            # Bloquea la fila anterior para aplicar el delta correcto si se vuelve a calificar
+            previous = None
+            if self.pk is not None:
+                previous = Rating.objects.select_for_update().filter(pk=self.pk).values_list('book_id', 'score').first()
+            super().save(*args, **kwargs)  # Guarda la calificación
+            if previous is None:
+                self._apply_delta(self.book_id, 1, self.score, {self.score: 1})
+            elif previous[0] == self.book_id:
+                stars = {previous[1]: -1}
+                stars[self.score] = stars.get(self.score, 0) + 1
+                self._apply_delta(self.book_id, 0, self.score - previous[1], stars)
+            else:  # La calificación cambió de libro
+                self._apply_delta(previous[0], -1, -previous[1], {previous[1]: -1})
+                self._apply_delta(self.book_id, 1, self.score, {self.score: 1})
 
     def delete(self, *args, **kwargs):
-        book = self.book
-        super().delete(*args, **kwargs)  # Elimina la calificación
-        book.update_average_rating()  # Actualiza el promedio del libro
+        with transaction.atomic():
+            stored = Rating.objects.select_for_update().filter(pk=self.pk).values_list('book_id', 'score').first()
+            result = super().delete(*args, **kwargs)  # Elimina la calificación
+            if stored is not None:
+                self._apply_delta(stored[0], -1, -stored[1], {stored[1]: -1})
+        return result
+
+    @staticmethod
+    def _apply_delta(book_id, count_delta, sum_delta, stars):
+        """Propaga el cambio al agregado del libro y a las estadísticas de sus géneros."""
+        Book.objects.filter(pk=book_id).apply_rating_delta(count_delta, sum_delta)
+        GenreStats.objects.for_books([book_id]).apply_delta(
+            rating_count=count_delta, rating_sum=sum_delta, stars=stars
+        )
+        LeaderboardEntry.objects.refresh_books([book_id])
         
     def __str__(self):
-        return f"{self.user.username} - {self.book.title} - {self.score}⭐"
\ No newline at end of file
+        return f"{self.user.username} - {self.book.title} - {self.score}⭐"
+
+
+class GenreStatsQuerySet(models.QuerySet):
+    def for_books(self, book_ids):
+        return self.filter(genre__book__in=book_ids)
+
+    def apply_delta(self, book_count=0, rating_count=0, rating_sum=0, stars=None):
+        """Aplica deltas con expresiones F en un solo UPDATE (stars: {puntuación: delta})."""
+        new_count = F('rating_count') + rating_count
+        new_sum = F('rating_sum') + rating_sum
+        cambios = {
+            'book_count': F('book_count') + book_count,
+            'rating_count': new_count,
+            'rating_sum': new_sum,
+            'average_rating': average_rating_expression(new_sum, new_count),
+            'updated_at': Now(),
+        }
+        for score, delta in (stars or {}).items():
+            if delta:
+                cambios[f'stars_{score}'] = F(f'stars_{score}') + delta
+        return self.update(**cambios)
+
+    def apply_book(self, book_id, sign):
+        """Suma (sign=1) o resta (sign=-1) la contribución completa de un libro a estos géneros."""
+        book = Book.objects.filter(pk=book_id).values('rating_count', 'rating_sum').first()
+        if book is None:
+            return 0
+        stars = Rating.objects.filter(book_id=book_id).order_by().values_list('score').annotate(n=Count('id'))
+        return self.apply_delta(
+            book_count=sign,
+            rating_count=sign * book['rating_count'],
+            rating_sum=sign * book['rating_sum'],
+            stars={score: sign * n for score, n in stars},
+        )
+
+    def rebuild(self):
+        """Recalcula todas las columnas desde las tablas base en un solo UPDATE."""
+        libros = Book.genres.through.objects.filter(genre=OuterRef('genre')).order_by().values('genre')
+        ratings = Rating.objects.filter(book__genres=OuterRef('genre')).order_by().values('book__genres')
+
+        def agregado(queryset, expresion):
+            return Coalesce(Subquery(queryset.annotate(valor=expresion).values('valor')), 0)
+
+        new_count = agregado(ratings, Count('id'))
+        new_sum = agregado(ratings, Sum('score'))
+        return self.update(
+            book_count=agregado(libros, Count('id')),
+            rating_count=new_count,
+            rating_sum=new_sum,
+            average_rating=average_rating_expression(new_sum, new_count),
+            updated_at=Now(),
+            **{f'stars_{score}': agregado(ratings, Count('id', filter=Q(score=score))) for score in range(1, 6)},
+        )
+
+
+class GenreStats(models.Model):
+    """Estadísticas por género mantenidas incrementalmente (ver Rating._apply_delta y signals.py)."""
+    genre = models.OneToOneField(Genre, on_delete=models.CASCADE, primary_key=True, related_name='stats', verbose_name="Género")
+    book_count = models.PositiveIntegerField(default=0, verbose_name="Número de libros")
+    rating_count = models.PositiveIntegerField(default=0, verbose_name="Número de calificaciones")
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name="Suma de calificaciones")
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00, verbose_name="Ranking promedio")
+    stars_1 = models.PositiveIntegerField(default=0, verbose_name="Calificaciones de 1 ⭐")
+    stars_2 = models.PositiveIntegerField(default=0, verbose_name="Calificaciones de 2 ⭐")
+    stars_3 = models.PositiveIntegerField(default=0, verbose_name="Calificaciones de 3 ⭐")
+    stars_4 = models.PositiveIntegerField(default=0, verbose_name="Calificaciones de 4 ⭐")
+    stars_5 = models.PositiveIntegerField(default=0, verbose_name="Calificaciones de 5 ⭐")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
+
+    objects = GenreStatsQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.genre} - {self.average_rating}⭐ ({self.rating_count})"
+
+
+CANDADO_TABLERO_GLOBAL = 0x626F6265  # pg_advisory_xact_lock del tablero global
+LEADERBOARD_ORDER = ('-average_rating', '-rating_count', 'book_id')  # Empates: más calificaciones, luego id
+
+
+def _clave_ranking(libro):
+    """Clave de orden de LEADERBOARD_ORDER (menor = mejor) para {'average_rating', 'rating_count', 'book_id'}."""
+    return (-libro['average_rating'], -libro['rating_count'], libro['book_id'])
+
+
+class LeaderboardQuerySet(models.QuerySet):
+    def board(self, genre_id=None, min_ratings=1):
+        return self.filter(genre_id=genre_id, min_ratings=min_ratings).order_by(*LEADERBOARD_ORDER)
+
+    @staticmethod
+    def candidates(genre_id, min_ratings, exclude=(), limit=None):
+        """Mejores libros del alcance desde Book (índice book_rating_idx), como dicts de _clave_ranking."""
+        libros = Book.objects.filter(rating_count__gte=max(min_ratings, 1))
+        if genre_id is not None:
+            libros = libros.filter(genres=genre_id)
+        libros = libros.exclude(pk__in=exclude).order_by('-average_rating', '-rating_count', 'pk')
+        return list(libros.values('average_rating', 'rating_count', book_id=F('pk'))[:limit or settings.LEADERBOARD_SIZE])
+
+    def _bloquear(self, genre_ids):
+        """Serializa las escrituras sobre estos tableros (None = global) aunque estén vacíos o incompletos.
+
+        Se bloquea la fila del género y, para el global, un candado consultivo: un tablero sin
+        LEADERBOARD_SIZE entradas no tiene filas suficientes que bloquear. Siempre en el mismo orden.
+        """
+        conexion = transaction.get_connection()
+        if None in genre_ids:
+            if conexion.vendor == 'postgresql':
+                with conexion.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CANDADO_TABLERO_GLOBAL])
+            elif conexion.vendor != 'sqlite':  # SQLite ya serializa las escrituras
+                list(self.select_for_update().filter(genre__isnull=True).order_by('pk').values_list('pk', flat=True))
+        genre_ids = sorted(g for g in genre_ids if g is not None)
+        if genre_ids:
+            list(Genre.objects.select_for_update(no_key=True).filter(pk__in=genre_ids).order_by('pk').values_list('pk', flat=True))
+
+    def refresh_books(self, book_ids):
+        """Reubica estos libros en el tablero global y en los de sus géneros (actuales o anteriores).
+
+        Sin bloquear, cada libro se compara con el último puesto de cada tablero: solo se bloquean y
+        recalculan los tableros donde ya está o a los que puede entrar, así que un libro lejos del
+        top-N no espera a nadie. Si uno sale o empeora dentro de un tablero, se trae el mejor libro
+        de fuera para ocupar su lugar. Un libro que sube justo cuando otra escritura reordena un
+        tablero puede quedar fuera; rebuild_leaderboards lo corrige.
+        """
+        size = settings.LEADERBOARD_SIZE
+        book_ids = set(book_ids)
+        with transaction.atomic(savepoint=False):
+            libros, generos = {}, {}
+            for fila in Book.objects.filter(pk__in=book_ids).values('average_rating', 'rating_count', 'genres', book_id=F('pk')):
+                genre_id = fila.pop('genres')
+                libros[fila['book_id']] = fila
+                if genre_id is not None:
+                    generos.setdefault(fila['book_id'], set()).add(genre_id)
+            alcances = set().union(*generos.values())
+
+            def califica(book_id, genre_id, umbral):
+                libro = libros.get(book_id)
+                return (
+                    libro is not None and libro['rating_count'] >= max(umbral, 1)
+                    and (genre_id is None or genre_id in generos.get(book_id, ()))
+                )
+
+            # Lectura sin bloqueo; las entradas de estos libros revelan tableros de géneros que ya no tienen
+            vistos = {(genre_id, umbral): [] for genre_id in alcances | {None} for umbral in settings.LEADERBOARD_MIN_RATINGS}
+            for entrada in self.filter(Q(genre__isnull=True) | Q(genre__in=alcances) | Q(book_id__in=book_ids)).values(
+                'genre_id', 'min_ratings', 'average_rating', 'rating_count', 'book_id'
+            ):
+                vistos.setdefault((entrada.pop('genre_id'), entrada.pop('min_ratings')), []).append(entrada)
+            afectados = set()
+            for (genre_id, umbral), entradas in vistos.items():
+                if any(e['book_id'] in book_ids for e in entradas):
+                    afectados.add((genre_id, umbral))
+                    continue
+                ultimo = max(map(_clave_ranking, entradas)) if len(entradas) >= size else None
+                if any(califica(book_id, genre_id, umbral) and (ultimo is None or _clave_ranking(libros[book_id]) < ultimo)
+                       for book_id in book_ids):
+                    afectados.add((genre_id, umbral))
+            if not afectados:
+                return
+
+            self._bloquear({genre_id for genre_id, _ in afectados})
+            tableros = {tablero: {} for tablero in afectados}
+            for entrada in self.filter(reduce(operator.or_, (Q(genre_id=g, min_ratings=u) for g, u in afectados))):
+                tableros[(entrada.genre_id, entrada.min_ratings)][entrada.book_id] = entrada
+
+            salen, entran, cambian = [], [], {}
+            for (genre_id, umbral), entradas in tableros.items():
+                ranking = {book_id: {'book_id': book_id, 'average_rating': e.average_rating, 'rating_count': e.rating_count}
+                           for book_id, e in entradas.items()}
+                empeoraron = 0
+                for book_id in book_ids:
+                    anterior = ranking.pop(book_id, None)
+                    if califica(book_id, genre_id, umbral):
+                        ranking[book_id] = libros[book_id]
+                        if anterior is not None and _clave_ranking(libros[book_id]) > _clave_ranking(anterior):
+                            empeoraron += 1
+                    elif anterior is not None:
+                        empeoraron += 1
+                if empeoraron and len(entradas) >= size:
+                    # Algún libro de fuera puede ahora superar al que bajó (si había lugar, no había nadie más)
+                    for candidato in self.candidates(genre_id, umbral, exclude=ranking.keys(), limit=empeoraron):
+                        ranking[candidato['book_id']] = candidato
+                nuevo = {libro['book_id']: libro for libro in sorted(ranking.values(), key=_clave_ranking)[:size]}
+
+                salen += [e.pk for book_id, e in entradas.items() if book_id not in nuevo]
+                for book_id, libro in nuevo.items():
+                    entrada = entradas.get(book_id)
+                    if entrada is None:
+                        entran.append(LeaderboardEntry(genre_id=genre_id, min_ratings=umbral, **libro))
+                    elif (entrada.average_rating, entrada.rating_count) != (libro['average_rating'], libro['rating_count']):
+                        cambian.setdefault(book_id, []).append(entrada.pk)
+
+            if salen:
+                self.filter(pk__in=salen).delete()
+            self.bulk_create(entran)
+            for book_id, pks in cambian.items():  # Un UPDATE por libro: sus valores son iguales en todos los tableros
+                self.filter(pk__in=pks).update(
+                    average_rating=libros[book_id]['average_rating'], rating_count=libros[book_id]['rating_count']
+                )
+
+    def rebuild(self, genre_ids=None):
+        """Recalcula desde Book los tableros de estos géneros (None = todos; incluye el global si genre_ids es None o contiene None)."""
+        if genre_ids is None:
+            genre_ids = [None, *Genre.objects.values_list('pk', flat=True)]
+        genre_ids = list(genre_ids)
+        with transaction.atomic():
+            alcance = Q(genre__in=[g for g in genre_ids if g is not None])
+            if None in genre_ids:
+                alcance |= Q(genre__isnull=True)
+            self.filter(alcance).delete()
+            return len(self.bulk_create([
+                LeaderboardEntry(genre_id=genre_id, min_ratings=umbral, **libro)
+                for genre_id in genre_ids for umbral in settings.LEADERBOARD_MIN_RATINGS
+                for libro in self.candidates(genre_id, umbral)
+            ]))
+
+
+class LeaderboardEntry(models.Model):
+    """Top-N por género (genre=None: global) y umbral mínimo de calificaciones; ver LeaderboardQuerySet."""
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, null=True, blank=True, related_name='leaderboard', verbose_name="Género")
+    min_ratings = models.PositiveIntegerField(verbose_name="Mínimo de calificaciones")
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='leaderboard_entries', verbose_name="Libro")
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, verbose_name="Ranking promedio")
+    rating_count = models.PositiveIntegerField(verbose_name="Número de calificaciones")
+
+    objects = LeaderboardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['genre', 'min_ratings', 'book'], name='leaderboard_unique_book'),
+            # El global tiene genre NULL, que no colisiona en el UNIQUE anterior
+            models.UniqueConstraint(fields=['min_ratings', 'book'], condition=Q(genre__isnull=True), name='leaderboard_unique_global_book'),
+        ]
+        indexes = [
+            models.Index(fields=['genre', 'min_ratings', '-average_rating', '-rating_count', 'book'], name='leaderboard_board_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.genre or 'Global'} (≥{self.min_ratings}) - {self.book_id}: {self.average_rating}⭐"
+
+
+class ReportJob(models.Model):
+    """Trabajo de reporte en cola (la cola es esta tabla; ver jobs.py)."""
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pendiente'), (RUNNING, 'En curso'), (DONE, 'Terminado'), (FAILED, 'Fallido')]
+    ACTIVE = (PENDING, RUNNING)
+    FORMAT_CHOICES = [('pdf', 'PDF'), ('xlsx', 'Excel')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    key = models.CharField(max_length=64, verbose_name="Clave de deduplicación")  # formato + géneros normalizados
+    genre_ids = models.JSONField(verbose_name="Géneros")
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES, default='pdf', verbose_name="Formato")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Estado")
+    file = models.CharField(max_length=500, blank=True, verbose_name="Archivo")
+    error = models.TextField(blank=True, verbose_name="Error")
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Solicitado por")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Inicio")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+
+    class Meta:
+        constraints = [
+            # Solo un trabajo activo por clave: peticiones idénticas concurrentes comparten trabajo
+            models.UniqueConstraint(fields=['key'], condition=Q(status__in=['pending', 'running']), name='reportjob_unique_active_key'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.format} {self.genre_ids} - {self.status}"
@@ -0,0 +1,249 @@
+"""Recomendaciones item–item ("para mí") a partir de la matriz dispersa usuario × libro de Rating.
+
+El modelo guarda, para cada libro, sus K vecinos más parecidos (coseno entre columnas de la matriz)
+y la propia matriz de calificaciones, así que recomendar no consulta la tabla de calificaciones:
+    puntaje(i) = Σ_j sim(i, j) · (r_uj − NEUTRO)   sobre los libros j que calificó el usuario
+Con NEUTRO = 3, los libros que gustaron (4–5) suman y los que no (1–2) restan.
+
+El refresco incremental recalcula solo los libros con calificaciones nuevas o modificadas (todo cambio
+de calificación actualiza Book.updated_at) y reordena las listas de los demás contra ellos. Al quitar un
+vecino de una lista no se recupera el que estaba en el puesto K+1, así que conviene un entrenamiento
+completo periódico (`manage.py entrenar_recomendador --completo`); también cubre calificaciones
+borradas en cascada al eliminar usuarios, que no tocan Book.updated_at.
+"""
+import os
+import tempfile
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from scipy import sparse
+
+from .models import Book, Rating
+
+NEUTRO = 3
+SOLAPE = timedelta(minutes=5)  # Margen para calificaciones confirmadas durante el refresco anterior
+BLOQUE = 512  # Columnas por producto matricial (acota la memoria a BLOQUE × libros)
+MAX_IDS_POR_CONSULTA = 5000
+MAX_FRACCION_INCREMENTAL = 0.2  # Si cambió una fracción mayor de libros se reentrena completo
+
+
+class Modelo:
+    def __init__(self, libros, usuarios, calificaciones, vecinos, similitudes, entrenado_en):
+        self.libros = libros  # id de libro por columna
+        self.usuarios = usuarios  # id de usuario por fila
+        self.calificaciones = calificaciones  # CSR usuarios × libros
+        self.vecinos = vecinos  # libros × K, -1 = vacío
+        self.similitudes = similitudes
+        self.entrenado_en = entrenado_en
+        self.indice_usuario = {int(pk): fila for fila, pk in enumerate(usuarios)}
+        conteos = np.diff(calificaciones.tocsc().indptr)
+        populares = np.lexsort((libros, -conteos))  # Más calificados primero; empates por id
+        self.populares = populares[conteos[populares] > 0]  # Sin calificaciones (o borrados) no cuentan
+
+    def recomendar(self, user_id, n=10):
+        """Ids de hasta n libros que el usuario no calificó, del más al menos recomendado."""
+        fila = self.indice_usuario.get(user_id)
+        calificados = np.empty(0, dtype=np.int64)
+        elegidos = []
+        if fila is not None:
+            inicio, fin = self.calificaciones.indptr[fila], self.calificaciones.indptr[fila + 1]
+            calificados = self.calificaciones.indices[inicio:fin]
+            pesos = self.calificaciones.data[inicio:fin] - NEUTRO
+            vecinos = self.vecinos[calificados]
+            aportes = self.similitudes[calificados] * pesos[:, None]
+            validos = vecinos >= 0
+            puntajes = np.zeros(len(self.libros))
+            np.add.at(puntajes, vecinos[validos], aportes[validos])
+            puntajes[calificados] = 0
+            candidatos = np.flatnonzero(puntajes > 0)
+            orden = np.lexsort((self.libros[candidatos], -puntajes[candidatos]))
+            elegidos = candidatos[orden][:n].tolist()
+        if len(elegidos) < n:
+            # Sin historial o sin vecinos suficientes: se completa con los más calificados
+            excluidos = set(elegidos) | set(calificados.tolist())
+            for columna in self.populares:
+                if len(elegidos) >= n:
+                    break
+                if columna not in excluidos:
+                    elegidos.append(int(columna))
+        return [int(self.libros[columna]) for columna in elegidos]
+
+
+def _normalizar(calificaciones):
+    """Columnas de norma 1 (CSC), para que el producto de columnas sea el coseno."""
+    columnas = calificaciones.tocsc().astype(np.float32)
+    normas = np.sqrt(np.asarray(columnas.multiply(columnas).sum(axis=0))).ravel()
+    normas[normas == 0] = 1
+    return columnas @ sparse.diags(1 / normas)
+
+
+def _top_k(normalizada, columnas, k):
+    """Vecinos (ids de columna, -1 si no hay) y similitudes de las columnas pedidas."""
+    vecinos = np.full((len(columnas), k), -1, dtype=np.int32)
+    similitudes = np.zeros((len(columnas), k), dtype=np.float32)
+    k_real = min(k, normalizada.shape[1] - 1)
+    if k_real <= 0:
+        return vecinos, similitudes
+    for inicio in range(0, len(columnas), BLOQUE):
+        bloque = np.asarray(columnas[inicio:inicio + BLOQUE])
+        sims = (normalizada[:, bloque].T @ normalizada).toarray()
+        sims[np.arange(len(bloque)), bloque] = -np.inf  # Un libro no es su propio vecino
+        vecinos[inicio:inicio + len(bloque)], similitudes[inicio:inicio + len(bloque)] = _mejores(
+            sims, np.arange(sims.shape[1]), k, k_real
+        )
+    return vecinos, similitudes
+
+
+def _mejores(sims, ids, k, k_real=None):
+    """Top-k por fila de una matriz de candidatos; ids puede ser 1D (común) o 2D (por fila)."""
+    k_real = min(k, sims.shape[1]) if k_real is None else k_real
+    parte = np.argpartition(-sims, k_real - 1, axis=1)[:, :k_real]
+    valores = np.take_along_axis(sims, parte, axis=1)
+    orden = np.argsort(-valores, axis=1, kind='stable')
+    parte, valores = np.take_along_axis(parte, orden, axis=1), np.take_along_axis(valores, orden, axis=1)
+    elegidos = ids[parte] if ids.ndim == 1 else np.take_along_axis(ids, parte, axis=1)
+    vecinos = np.full((sims.shape[0], k), -1, dtype=np.int32)
+    similitudes = np.zeros((sims.shape[0], k), dtype=np.float32)
+    positivos = valores > 0
+    vecinos[:, :k_real] = np.where(positivos, elegidos, -1)
+    similitudes[:, :k_real] = np.where(positivos, valores, 0)
+    return vecinos, similitudes
+
+
+def _calificaciones(filtro=None):
+    ratings = Rating.objects.order_by()
+    if filtro is not None:
+        ratings = ratings.filter(filtro)
+    filas = np.array(list(ratings.values_list('user_id', 'book_id', 'score').iterator(chunk_size=10000)), dtype=np.int64)
+    return filas.reshape(-1, 3)
+
+
+def entrenar(k=None):
+    """Modelo completo desde la tabla de calificaciones."""
+    k = k or settings.RECOMMENDER_TOP_K
+    entrenado_en = timezone.now()
+    filas = _calificaciones()
+    libros = np.array(sorted(Book.objects.values_list('pk', flat=True)), dtype=np.int64)
+    usuarios = np.unique(filas[:, 0])
+    calificaciones = sparse.csr_matrix(
+        (filas[:, 2].astype(np.float32), (np.searchsorted(usuarios, filas[:, 0]), np.searchsorted(libros, filas[:, 1]))),
+        shape=(len(usuarios), len(libros)),
+    )
+    vecinos, similitudes = _top_k(_normalizar(calificaciones), np.arange(len(libros)), k)
+    return Modelo(libros, usuarios, calificaciones, vecinos, similitudes, entrenado_en)
+
+
+def refrescar(modelo):
+    """Aplica los cambios desde el último entrenamiento; devuelve (modelo, libros recalculados)."""
+    k = modelo.vecinos.shape[1]
+    entrenado_en = timezone.now()
+    existentes = np.array(sorted(Book.objects.values_list('pk', flat=True)), dtype=np.int64)
+    cambiados = set(Book.objects.filter(updated_at__gte=modelo.entrenado_en - SOLAPE).values_list('pk', flat=True))
+    cambiados |= set(np.setdiff1d(modelo.libros, existentes).tolist())  # Borrados: quedan sin calificaciones
+    nuevos = np.setdiff1d(existentes, modelo.libros)
+    cambiados |= set(nuevos.tolist())
+    if not cambiados:
+        return Modelo(modelo.libros, modelo.usuarios, modelo.calificaciones, modelo.vecinos,
+                      modelo.similitudes, entrenado_en), 0
+
+    ids = sorted(cambiados)
+    filas = np.concatenate([
+        _calificaciones(Q(book_id__in=ids[i:i + MAX_IDS_POR_CONSULTA]))
+        for i in range(0, len(ids), MAX_IDS_POR_CONSULTA)
+    ])
+    libros = np.concatenate([modelo.libros, nuevos])  # Las columnas existentes conservan su posición
+    usuarios = np.concatenate([modelo.usuarios, np.setdiff1d(np.unique(filas[:, 0]), modelo.usuarios)])
+    orden_libros, orden_usuarios = np.argsort(libros), np.argsort(usuarios)
+
+    def posiciones(valores, ids_ordenados, orden):
+        return orden[np.searchsorted(ids_ordenados[orden], valores)]
+
+    columnas_cambiadas = posiciones(np.array(ids, dtype=np.int64), libros, orden_libros)
+    anterior = modelo.calificaciones.tocoo()
+    conservar = ~np.isin(anterior.col, columnas_cambiadas)
+    calificaciones = sparse.csr_matrix(
+        (
+            np.concatenate([anterior.data[conservar], filas[:, 2].astype(np.float32)]),
+            (
+                np.concatenate([anterior.row[conservar], posiciones(filas[:, 0], usuarios, orden_usuarios)]),
+                np.concatenate([anterior.col[conservar], posiciones(filas[:, 1], libros, orden_libros)]),
+            ),
+        ),
+        shape=(len(usuarios), len(libros)),
+    )
+    if len(columnas_cambiadas) > MAX_FRACCION_INCREMENTAL * len(libros):
+        # Con tantos cambios sale más barato recalcular todo
+        vecinos, similitudes = _top_k(_normalizar(calificaciones), np.arange(len(libros)), k)
+        return Modelo(libros, usuarios, calificaciones, vecinos, similitudes, entrenado_en), len(libros)
+
+    normalizada = _normalizar(calificaciones)
+    relleno = len(nuevos)
+    vecinos = np.vstack([modelo.vecinos, np.full((relleno, k), -1, dtype=np.int32)])
+    similitudes = np.vstack([modelo.similitudes, np.zeros((relleno, k), dtype=np.float32)])
+
+    # Listas de los demás libros: fuera los vecinos cambiados, y compiten de nuevo con su similitud actual.
+    # Por bloques de BLOQUE cambiados, como en _top_k: cada bloque se funde con el top-k acumulado
+    similitudes = np.where(np.isin(vecinos, columnas_cambiadas), 0, similitudes)
+    vecinos = np.where(np.isin(vecinos, columnas_cambiadas), -1, vecinos)
+    for inicio in range(0, len(columnas_cambiadas), BLOQUE):
+        bloque = columnas_cambiadas[inicio:inicio + BLOQUE]
+        hacia_bloque = (normalizada.T @ normalizada[:, bloque]).toarray()
+        hacia_bloque[bloque, np.arange(len(bloque))] = -np.inf  # Un libro no es su propio vecino
+        previas = np.where(vecinos < 0, -np.inf, similitudes)
+        candidatos = np.hstack([vecinos, np.broadcast_to(bloque.astype(np.int32), hacia_bloque.shape)])
+        vecinos, similitudes = _mejores(np.hstack([previas, hacia_bloque]), candidatos, k)
+
+    # Listas de los libros cambiados: desde cero
+    vecinos[columnas_cambiadas], similitudes[columnas_cambiadas] = _top_k(normalizada, columnas_cambiadas, k)
+    return Modelo(libros, usuarios, calificaciones, vecinos, similitudes, entrenado_en), len(columnas_cambiadas)
+
+
+def guardar(modelo, ruta=None):
+    """Escribe el modelo de forma atómica (archivo temporal + os.replace)."""
+    ruta = str(ruta or settings.RECOMMENDER_MODEL_PATH)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.npz')
+    with os.fdopen(fd, 'wb') as archivo:
+        np.savez(
+            archivo,
+            libros=modelo.libros, usuarios=modelo.usuarios,
+            indptr=modelo.calificaciones.indptr, indices=modelo.calificaciones.indices,
+            data=modelo.calificaciones.data, vecinos=modelo.vecinos, similitudes=modelo.similitudes,
+            entrenado_en=np.array(modelo.entrenado_en.isoformat()),
+        )
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def cargar(ruta=None):
+    with np.load(str(ruta or settings.RECOMMENDER_MODEL_PATH)) as datos:
+        libros, usuarios = datos['libros'], datos['usuarios']
+        calificaciones = sparse.csr_matrix(
+            (datos['data'], datos['indices'], datos['indptr']), shape=(len(usuarios), len(libros))
+        )
+        return Modelo(libros, usuarios, calificaciones, datos['vecinos'], datos['similitudes'],
+                      parse_datetime(str(datos['entrenado_en'])))
+
+
+_modelo = None
+_modelo_version = None
+_modelo_lock = threading.Lock()
+
+
+def obtener_modelo():
+    """Modelo en memoria del proceso; se recarga cuando cambia el archivo. None si no hay modelo."""
+    global _modelo, _modelo_version
+    ruta = str(settings.RECOMMENDER_MODEL_PATH)
+    try:
+        version = (ruta, os.stat(ruta).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    with _modelo_lock:
+        if version != _modelo_version:
+            _modelo, _modelo_version = cargar(ruta), version
+        return _modelo
@@ -0,0 +1,107 @@
+"""Reportes por conjunto de géneros generados en el servidor (los ejecuta jobs.py).
+
+Los datos salen de GenreStats y de los agregados guardados en Book, sin pasar por la API.
+El gráfico usa Figure + FigureCanvasAgg en lugar de pyplot, que no es seguro entre hilos.
+"""
+import io
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from openpyxl import Workbook
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .models import Book, GenreStats
+
+TOP_N = 3
+
+
+def datos(genre_ids, top_n=TOP_N):
+    """Estadísticas y top-N por promedio (empates por id) de cada género pedido."""
+    generos = []
+    for stats in GenreStats.objects.select_related('genre').filter(genre_id__in=genre_ids).order_by('genre_id'):
+        top = Book.objects.filter(genres=stats.genre_id).order_by('-average_rating', 'pk')
+        generos.append({
+            'id': stats.genre_id,
+            'nombre': stats.genre.name,
+            'libros': stats.book_count,
+            'calificaciones': stats.rating_count,
+            'promedio': float(stats.average_rating),
+            'top': list(top.values_list('title', 'average_rating', 'rating_count')[:top_n]),
+        })
+    return generos
+
+
+def grafico(generos, dpi=150):
+    figura = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figura)
+    ejes = figura.subplots()
+    ejes.bar([g['nombre'] for g in generos], [g['promedio'] for g in generos], color='#3498db')
+    ejes.set_title('Promedio de Valoraciones por Género', pad=20)
+    ejes.set_xlabel('Género')
+    ejes.set_ylabel('Rating Promedio')
+    ejes.tick_params(axis='x', labelrotation=45)
+    figura.tight_layout()
+    buffer = io.BytesIO()
+    figura.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+def generar_pdf(generos, ruta):
+    doc = SimpleDocTemplate(str(ruta), pagesize=letter)
+    styles = getSampleStyleSheet()
+    elements = [Paragraph("ANÁLISIS DE LIBROS POR GÉNERO", styles['Title']), Spacer(1, 0.2 * inch)]
+    if generos:
+        elements.append(Image(io.BytesIO(grafico(generos)), width=6 * inch, height=3.6 * inch))
+        elements.append(Spacer(1, 0.3 * inch))
+    for genero in generos:
+        elements.append(Paragraph(
+            f"{genero['nombre']}: {genero['libros']} libros, {genero['calificaciones']} calificaciones, "
+            f"promedio {genero['promedio']:.2f}",
+            styles['Heading2']
+        ))
+        data = [['Posición', 'Título', 'Rating']]
+        data += [[str(i), titulo, f"{promedio:.2f}"] for i, (titulo, promedio, _) in enumerate(genero['top'], 1)]
+        tabla = Table(data, colWidths=[0.8 * inch, 4 * inch, inch])
+        tabla.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ebf5fb'))
+        ]))
+        elements += [tabla, Spacer(1, 0.3 * inch)]
+    elements.append(Paragraph(f"Reporte generado el {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Italic']))
+    doc.build(elements)
+
+
+def generar_excel(generos, ruta):
+    libro = Workbook()
+    hoja = libro.active
+    hoja.title = 'Géneros'
+    hoja.append(['ID', 'Género', 'Libros', 'Calificaciones', 'Promedio'])
+    for genero in generos:
+        hoja.append([genero['id'], genero['nombre'], genero['libros'], genero['calificaciones'], genero['promedio']])
+    top = libro.create_sheet('Top libros')
+    top.append(['Género', 'Posición', 'Título', 'Rating', 'Calificaciones'])
+    for genero in generos:
+        for i, (titulo, promedio, cantidad) in enumerate(genero['top'], 1):
+            top.append([genero['nombre'], i, titulo, float(promedio), cantidad])
+    libro.save(ruta)
+
+
+GENERADORES = {'pdf': generar_pdf, 'xlsx': generar_excel}
+
+
+def generar(job):
+    """Escribe el reporte del trabajo en REPORT_JOBS_DIR y devuelve su ruta."""
+    directorio = Path(settings.REPORT_JOBS_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    ruta = directorio / f'reporte_{job.pk}.{job.format}'
+    GENERADORES[job.format](datos(job.genre_ids), ruta)
+    return ruta
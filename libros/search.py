@@ -0,0 +1,52 @@
+"""Búsqueda de texto completo sobre título, autor y biografía (índices en la migración 0011).
+
+PostgreSQL usa Book.search_vector (GIN) con ts_rank; SQLite usa la tabla FTS5 libros_book_fts
+con bm25. Cada término se busca como prefijo y todos deben aparecer. Ambos ignoran acentos: la
+configuración spanish_unaccent (migración 0014) y remove_diacritics en FTS5.
+Ojo en SQLite: si una migración futura reconstruye libros_book, hay que recrear sus triggers.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+CONFIG = 'spanish_unaccent'  # El trigger de libros_book_search_vector usa la misma
+PESOS_FTS5 = (10.0, 5.0, 1.0)  # title, author_name, author_bio (equivalentes a A, B, C)
+MAX_TERMINOS = 10
+
+
+def terminos(q):
+    return re.findall(r'\w+', q.lower())[:MAX_TERMINOS]
+
+
+def buscar(queryset, q):
+    """Libros que contienen todos los términos de q (como prefijos), anotados con rank y ordenados por él."""
+    palabras = terminos(q)
+    if not palabras:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        consulta = SearchQuery(' & '.join(f'{p}:*' for p in palabras), config=CONFIG, search_type='raw')
+        return queryset.filter(search_vector=consulta).annotate(
+            rank=SearchRank(F('search_vector'), consulta)
+        ).order_by('-rank', 'pk')
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{p}"*' for p in palabras)
+        pesos = ', '.join(map(str, PESOS_FTS5))
+        return queryset.filter(
+            pk__in=RawSQL('SELECT rowid FROM libros_book_fts WHERE libros_book_fts MATCH %s', [match])
+        ).annotate(
+            # bm25 es menor cuanto más relevante: se invierte el signo para ordenar igual que ts_rank
+            rank=RawSQL(
+                f'SELECT -bm25(libros_book_fts, {pesos}) FROM libros_book_fts '
+                f'WHERE libros_book_fts MATCH %s AND rowid = libros_book.id',
+                [match], output_field=FloatField(),
+            )
+        ).order_by('-rank', 'pk')
+    # Otros motores: sin índice, coincidencia simple
+    filtro = Q()
+    for palabra in palabras:
+        filtro &= Q(title__icontains=palabra) | Q(author__name__icontains=palabra) | Q(author__bio__icontains=palabra)
+    return queryset.filter(filtro).order_by('pk')
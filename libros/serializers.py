@@ -7,8 +7,9 @@ BookSerializer y AuthorSerializer: Convierten modelos a JSON
 '''
 
 from rest_framework import serializers
+from django.urls import reverse
 from django.contrib.auth.models import User
-from .models import Book, Author, Genre, Rating
+from .models import Book, Author, Genre, GenreStats, LeaderboardEntry, Rating, ReportJob
 #from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 '''  
@@ -46,13 +47,72 @@ class GenreSerializer(serializers.ModelSerializer):
         model = Genre
         fields = ['id', 'name']
 
+class GenreStatsSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='genre.name', read_only=True)
+    distribution = serializers.SerializerMethodField()  # {'1': n, ..., '5': n}
+
+    class Meta:
+        model = GenreStats
+        fields = ['genre', 'name', 'book_count', 'rating_count', 'average_rating', 'distribution', 'updated_at']
+
+    def get_distribution(self, obj):
+        return {str(score): getattr(obj, f'stars_{score}') for score in range(1, 6)}
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='book.title', read_only=True)
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = ['book', 'title', 'average_rating', 'rating_count']
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    genres = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=200)
+    format = serializers.ChoiceField(choices=ReportJob.FORMAT_CHOICES, default='pdf')
+
+    def validate_genres(self, value):
+        faltantes = set(value) - set(Genre.objects.filter(pk__in=value).values_list('pk', flat=True))
+        if faltantes:
+            raise serializers.ValidationError(f"Géneros inexistentes: {sorted(faltantes)}")
+        return value
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'genre_ids', 'format', 'status', 'error', 'created_at', 'started_at', 'finished_at', 'download_url']
+
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.DONE:
+            return None
+        url = reverse('report-job-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
 class RatingSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)  # Muestra el nombre del usuario
 
     class Meta:
         model = Rating
-        fields = ['id', 'user', 'book', 'score', 'comment', 'created_at']
-        read_only_fields = ['user', 'created_at']  # Campos autogenerados
+        fields = ['id', 'user', 'book', 'score', 'comment', 'created_at', 'updated_at']
+        read_only_fields = ['user', 'created_at', 'updated_at']  # Campos autogenerados
+
+class RatingBulkItemSerializer(serializers.Serializer):
+    # Valida solo la forma; libros y usuarios se resuelven en bloque en la vista
+    book = serializers.IntegerField(min_value=1)
+    score = serializers.ChoiceField(choices=Rating._meta.get_field('score').choices)
+    comment = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    user = serializers.CharField(required=False)  # username; por defecto el usuario autenticado
+
+class BookImportRowSerializer(serializers.Serializer):
+    # Fila de importar_catalogo (columnas de /api/books/export/); autor y géneros van por nombre
+    title = serializers.CharField(max_length=200)
+    author = serializers.CharField(max_length=100)
+    published_date = serializers.DateField()
+    isbn = serializers.CharField(max_length=13)
+    stock = serializers.IntegerField(min_value=0, default=0)
+    download_url = serializers.URLField(max_length=200, allow_null=True, default=None)
+    genres = serializers.ListField(child=serializers.CharField(max_length=100), required=False, max_length=50)
 
 class BookSerializer(serializers.ModelSerializer):
     average_rating = serializers.DecimalField(max_digits=3, decimal_places=2, read_only=True) #nuevo
@@ -72,11 +132,12 @@ class BookSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'author', 'ratings', 'average_rating', ...]  # Añade los campos que ya tenías
 
     def get_average_rating(self, obj):
-        ratings = obj.rating_set.all()
-        if ratings:
-            return sum(r.score for r in ratings) / len(ratings)
-        return 0
+        # Usa el promedio anotado por la consulta o el guardado (el mismo que filtran y ordenan), sin recorrer rating_set
+        if hasattr(obj, 'avg_rating'):
+            return obj.avg_rating or 0
+        return obj.average_rating
     class Meta:
         model = Book
-        fields = ['id', 'title', 'author', 'published_date', 'isbn', 'stock', 'ratings', 'average_rating', 'download_url', 'genres', 'genre_ids',]
+        fields = ['id', 'title', 'author', 'published_date', 'isbn', 'stock', 'ratings', 'average_rating', 'download_url', 'genres', 'genre_ids', 'updated_at',]
+        read_only_fields = ['updated_at']
 
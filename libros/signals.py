@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.functions import Now
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import cache
+from .models import Book, Genre, GenreStats, LeaderboardEntry, Rating
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidar_cache_catalogo(sender, **kwargs):
+    # Tras el commit, para que ninguna lectura concurrente guarde datos viejos bajo la versión nueva
+    transaction.on_commit(cache.invalidate)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def invalidar_cache_generos(sender, action, instance, reverse, pk_set, **kwargs):
+    # Los géneros forman parte del JSON del libro: se actualiza updated_at para su ETag
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        Book.objects.filter(pk=instance.pk).update(updated_at=Now())
+    elif reverse and action in ('post_add', 'post_remove'):
+        Book.objects.filter(pk__in=pk_set).update(updated_at=Now())
+    elif reverse and action == 'pre_clear':
+        Book.objects.filter(genres=instance).update(updated_at=Now())
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(cache.invalidate)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+def actualizar_libros_del_genero(sender, instance, **kwargs):
+    Book.objects.filter(genres=instance).update(updated_at=Now())
+
+
+@receiver(post_save, sender=Genre)
+def crear_estadisticas_genero(sender, instance, created, **kwargs):
+    if created:
+        GenreStats.objects.get_or_create(genre=instance)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def actualizar_estadisticas_genero(sender, action, instance, reverse, pk_set, **kwargs):
+    if not reverse and action == 'post_add':
+        # pk_set solo trae los géneros realmente añadidos: delta con los agregados del libro
+        GenreStats.objects.filter(genre_id__in=pk_set).apply_book(instance.pk, 1)
+    elif not reverse and action == 'pre_clear':
+        GenreStats.objects.for_books([instance.pk]).apply_book(instance.pk, -1)
+    elif not reverse and action == 'post_remove':
+        GenreStats.objects.filter(genre_id__in=pk_set).rebuild()  # pk_set puede incluir géneros no asociados
+    elif reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        GenreStats.objects.filter(genre=instance).rebuild()
+
+
+@receiver(pre_delete, sender=Book)
+def descontar_libro_de_generos(sender, instance, **kwargs):
+    GenreStats.objects.for_books([instance.pk]).apply_book(instance.pk, -1)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def actualizar_tableros_por_generos(sender, action, instance, reverse, pk_set, **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        LeaderboardEntry.objects.refresh_books([instance.pk])
+    elif reverse and action in ('post_add', 'post_remove'):
+        LeaderboardEntry.objects.refresh_books(pk_set)
+    elif reverse and action == 'post_clear':
+        LeaderboardEntry.objects.rebuild([instance.pk])
+
+
+@receiver(pre_delete, sender=Book)
+def recordar_tableros_del_libro(sender, instance, **kwargs):
+    # Las entradas se borran en cascada; después hay que rellenar esos tableros
+    instance._tableros = set(LeaderboardEntry.objects.filter(book=instance).values_list('genre_id', flat=True))
+
+
+@receiver(post_delete, sender=Book)
+def rellenar_tableros_del_libro(sender, instance, **kwargs):
+    if getattr(instance, '_tableros', None):
+        LeaderboardEntry.objects.rebuild(instance._tableros)
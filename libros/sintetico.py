@@ -0,0 +1,173 @@
+"""Catálogo sintético para reproducir en local los volúmenes de producción (comando generar_catalogo).
+
+La popularidad de autores, géneros y libros y la actividad de los usuarios siguen una ley de Zipf con
+exponente `zipf`. Cada libro tiene un género principal y hasta `max_generos - 1` extra, cada uno con
+probabilidad `solape`. Las puntuaciones dependen de una "calidad" oculta por libro más ruido.
+
+Todo sale de numpy.random.default_rng(semilla): la misma semilla sobre una base vacía genera los mismos datos.
+Se inserta por lotes sin señales (bulk_create, o INSERT de varias filas para géneros de libros y calificaciones) y al final se recalculan agregados y tableros.
+"""
+import time
+from datetime import date, timedelta
+from io import StringIO
+from itertools import islice
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Author, Book, Genre, Rating
+
+LOTE = 5000
+MAX_RONDAS = 20  # rondas de muestreo para completar pares (usuario, libro) distintos
+
+NOMBRES = ['Ana', 'Luis', 'María', 'Carlos', 'Lucía', 'Jorge', 'Elena', 'Pablo', 'Sofía', 'Diego',
+           'Carmen', 'Andrés', 'Isabel', 'Miguel', 'Valeria', 'Tomás', 'Julia', 'Mateo', 'Rosa', 'Gabriel']
+APELLIDOS = ['García', 'Rodríguez', 'López', 'Martínez', 'Sánchez', 'Pérez', 'Gómez', 'Díaz', 'Torres', 'Ruiz',
+             'Vargas', 'Castillo', 'Romero', 'Herrera', 'Medina', 'Aguilar', 'Rojas', 'Navarro', 'Molina', 'Ortega']
+PALABRAS = ['sombra', 'jardín', 'memoria', 'río', 'ciudad', 'noche', 'viaje', 'silencio', 'mar', 'fuego',
+            'invierno', 'casa', 'tiempo', 'camino', 'espejo', 'isla', 'luna', 'guerra', 'secreto', 'viento',
+            'montaña', 'sueño', 'biblioteca', 'reino', 'desierto', 'tormenta', 'puerta', 'voz', 'bosque', 'estrella']
+GENEROS = ['Novela', 'Poesía', 'Ensayo', 'Historia', 'Ciencia ficción', 'Fantasía', 'Misterio', 'Romance',
+           'Biografía', 'Infantil', 'Terror', 'Aventura', 'Filosofía', 'Ciencia', 'Teatro', 'Viajes']
+
+
+def _zipf(rng, n, exponente):
+    """Distribución acumulada de Zipf sobre n elementos; el rango de popularidad se asigna al azar."""
+    pesos = 1.0 / np.arange(1, n + 1) ** exponente
+    rng.shuffle(pesos)
+    return np.cumsum(pesos / pesos.sum())
+
+
+def _muestrear(rng, acumulada, cantidad):
+    return np.minimum(np.searchsorted(acumulada, rng.random(cantidad), side='right'), len(acumulada) - 1)
+
+
+def _insertar(modelo, objetos, lote):
+    """bulk_create por lotes desde un iterable; devuelve los ids en el mismo orden."""
+    objetos = iter(objetos)
+    ids = []
+    while bloque := list(islice(objetos, lote)):
+        ids += [obj.pk for obj in modelo.objects.bulk_create(bloque)]
+    return np.array(ids, dtype=np.int64)
+
+
+def _insertar_filas(modelo, campos, filas, lote):
+    """INSERT de varias filas por sentencia, sin instanciar modelos: para las tablas grandes cuyos ids no se necesitan."""
+    fields = [modelo._meta.get_field(campo) for campo in campos]
+    lote = min(lote, connection.ops.bulk_batch_size(fields, [None] * lote) or lote)
+    prefijo = 'INSERT INTO {} ({}) VALUES '.format(
+        connection.ops.quote_name(modelo._meta.db_table),
+        ', '.join(connection.ops.quote_name(field.column) for field in fields),
+    )
+    marcadores = '({})'.format(', '.join(['%s'] * len(fields)))
+    filas = iter(filas)
+    with connection.cursor() as cursor:
+        while bloque := list(islice(filas, lote)):
+            cursor.execute(prefijo + ', '.join([marcadores] * len(bloque)), [valor for fila in bloque for valor in fila])
+
+
+def _pares(rng, acumulada_usuarios, acumulada_libros, total):
+    """Hasta `total` pares (usuario, libro) distintos como claves usuario * n_libros + libro, ordenadas."""
+    n_libros = len(acumulada_libros)
+    claves = np.empty(0, dtype=np.int64)
+    for _ in range(MAX_RONDAS):
+        faltan = total - len(claves)
+        if faltan <= 0:
+            break
+        cantidad = int(faltan * 1.2) + 100  # los repetidos se descartan
+        nuevas = (_muestrear(rng, acumulada_usuarios, cantidad).astype(np.int64) * n_libros
+                  + _muestrear(rng, acumulada_libros, cantidad))
+        claves = np.unique(np.concatenate([claves, nuevas]))
+    if len(claves) > total:
+        claves = np.sort(rng.choice(claves, size=total, replace=False))
+    return claves
+
+
+def generar(autores, libros, generos, usuarios, calificaciones, semilla=0, zipf=1.1, solape=0.3,
+            max_generos=3, lote=LOTE, avisar=None):
+    """Inserta el catálogo y devuelve cuántas filas se crearon de cada tipo."""
+    if min(autores, libros, generos, usuarios) < 1:
+        raise ValueError('Se necesita al menos un autor, un libro, un género y un usuario.')
+    if libros > 10 ** 9:
+        raise ValueError('Como máximo 10^9 libros (el ISBN sintético tiene 9 dígitos de secuencia).')
+    prefijo = f's{semilla}'
+    if (User.objects.filter(username=f'{prefijo}_0').exists()
+            or Genre.objects.filter(name=f'{GENEROS[0]} {prefijo}-0').exists()
+            or Book.objects.filter(isbn=f'9{semilla % 1000:03d}{0:09d}').exists()):
+        raise ValueError(f'Ya hay un catálogo sintético con la semilla {semilla}; usa otra o una base vacía.')
+
+    avisar = avisar or (lambda mensaje: None)
+    rng = np.random.default_rng(semilla)
+    creados = {}
+    inicio = time.perf_counter()
+
+    def paso(nombre, cantidad):
+        creados[nombre] = int(cantidad)
+        avisar(f'{nombre}: {cantidad} ({time.perf_counter() - inicio:.1f} s)')
+
+    with transaction.atomic():
+        nombres = rng.integers(0, len(NOMBRES), autores).tolist()
+        apellidos = rng.integers(0, len(APELLIDOS), (autores, 2)).tolist()
+        autor_ids = _insertar(Author, (
+            Author(name=f'{NOMBRES[n]} {APELLIDOS[a]} {APELLIDOS[b]}', bio=f'Autor sintético {prefijo}-{i}.')
+            for i, (n, (a, b)) in enumerate(zip(nombres, apellidos))
+        ), lote)
+        paso('autores', len(autor_ids))
+
+        genero_ids = _insertar(Genre, (
+            Genre(name=f'{GENEROS[i % len(GENEROS)]} {prefijo}-{i}') for i in range(generos)
+        ), lote)
+        paso('generos', len(genero_ids))
+
+        autor_de = autor_ids[_muestrear(rng, _zipf(rng, autores, zipf), libros)].tolist()
+        largos = rng.integers(1, 5, libros).tolist()
+        palabras = rng.integers(0, len(PALABRAS), (libros, 4)).tolist()
+        dias = rng.integers(0, 125 * 365, libros).tolist()
+        stock = rng.integers(0, 100, libros).tolist()
+        libro_ids = _insertar(Book, (
+            Book(
+                title=' '.join(PALABRAS[p] for p in palabras[i][:largos[i]]).capitalize(),
+                author_id=autor_de[i],
+                published_date=date(1900, 1, 1) + timedelta(days=dias[i]),
+                isbn=f'9{semilla % 1000:03d}{i:09d}',
+                stock=stock[i],
+            )
+            for i in range(libros)
+        ), lote)
+        paso('libros', len(libro_ids))
+
+        # Género principal + extras; se descartan los repetidos dentro de un mismo libro
+        acumulada_generos = _zipf(rng, generos, zipf)
+        extras = rng.binomial(max(max_generos - 1, 0), solape, libros)
+        libro_de = np.concatenate([np.arange(libros), np.repeat(np.arange(libros), extras)])
+        claves = np.unique(libro_de.astype(np.int64) * generos + _muestrear(rng, acumulada_generos, len(libro_de)))
+        libro_de = libro_ids[claves // generos].tolist()
+        genero_de = genero_ids[claves % generos].tolist()
+        _insertar_filas(Book.genres.through, ['book', 'genre'], zip(libro_de, genero_de), lote)
+        paso('libros_generos', len(claves))
+
+        password = make_password(None)  # inutilizable: son solo autores de calificaciones
+        usuario_ids = _insertar(User, (
+            User(username=f'{prefijo}_{i}', password=password) for i in range(usuarios)
+        ), lote)
+        paso('usuarios', len(usuario_ids))
+
+        calidad = rng.normal(3.6, 0.7, libros)
+        claves = _pares(rng, _zipf(rng, usuarios, zipf), _zipf(rng, libros, zipf), min(calificaciones, usuarios * libros))
+        libro_de = claves % libros
+        puntajes = np.clip(np.rint(calidad[libro_de] + rng.normal(0, 0.9, len(claves))), 1, 5).astype(int).tolist()
+        usuario_de = usuario_ids[claves // libros].tolist()
+        libro_de = libro_ids[libro_de].tolist()
+        ahora = Rating._meta.get_field('created_at').get_db_prep_value(timezone.now(), connection)
+        _insertar_filas(Rating, ['user', 'book', 'score', 'created_at', 'updated_at'], (
+            (u, b, s, ahora, ahora) for u, b, s in zip(usuario_de, libro_de, puntajes)
+        ), lote)
+        paso('calificaciones', len(claves))
+
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        avisar(f'agregados y tableros recalculados ({time.perf_counter() - inicio:.1f} s)')
+    return creados
@@ -1,3 +1,1161 @@
-from django.test import TestCase
+import contextvars
+import csv
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, router, transaction
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from bobeda import routers
+from bobeda.middleware import ReplicaStickinessMiddleware
+
+from . import cache, importacion, jobs, recomendador
+from .models import Author, Book, Genre, GenreStats, LeaderboardEntry, Rating, ReportJob
+from .filters import BookFilter
+from .management.commands import perfil_arranque
+from .views import BookExportView
+
+
+def crear_catalogo(num_libros, num_usuarios=3, inicio=0):
+    """Crea libros con autor, dos géneros y una calificación por usuario."""
+    autor, _ = Author.objects.get_or_create(name='Autor')
+    generos = [Genre.objects.get_or_create(name=f'Género {i}')[0] for i in range(2)]
+    usuarios = [User.objects.get_or_create(username=f'usuario{i}')[0] for i in range(num_usuarios)]
+    libros = []
+    for i in range(inicio, inicio + num_libros):
+        libro = Book.objects.create(
+            title=f'Libro {i}', author=autor, published_date=date(2000, 1, 1), isbn=f'{i:013d}'
+        )
+        libro.genres.set(generos)
+        for j, usuario in enumerate(usuarios):
+            Rating.objects.create(user=usuario, book=libro, score=(i + j) % 5 + 1)
+        libros.append(libro)
+    return libros
+
+
+class BookReadQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_listado_usa_consultas_fijas(self):
+        crear_catalogo(2)
+        # Huella para ETag + libros + géneros + calificaciones con usuario
+        with self.assertNumQueries(4):
+            self.client.get(reverse('book-list'))
+
+        crear_catalogo(8, inicio=2)  # Más libros no deben sumar consultas
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('book-list'))
+        self.assertEqual(len(response.data), 10)
+
+    def test_detalle_usa_consultas_fijas(self):
+        libro = crear_catalogo(1)[0]
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('book-detail', args=[libro.pk]))
+        self.assertEqual(len(response.data['ratings']), 3)
+        self.assertEqual(response.data['ratings'][0]['user'], 'usuario0')
+
+    def test_promedio_es_el_guardado(self):
+        libro = crear_catalogo(1)[0]
+        rating = Rating.objects.get(book=libro, score=3)
+        rating.score = 4
+        rating.save()  # 7 / 3: se muestra redondeado, como lo filtra min_rating
+        response = self.client.get(reverse('book-detail', args=[libro.pk]))
+        self.assertEqual(response.data['average_rating'], Decimal('2.33'))
+        self.assertEqual(json.loads(response.content)['average_rating'], 2.33)
+        self.assertEqual(len(self.client.get(reverse('book-list'), {'min_rating': '2.33'}).data), 1)
+
+    def test_promedio_sin_calificaciones(self):
+        autor = Author.objects.create(name='Autor')
+        libro = Book.objects.create(title='Vacío', author=autor, published_date=date(2000, 1, 1), isbn='1')
+        response = self.client.get(reverse('book-detail', args=[libro.pk]))
+        self.assertEqual(response.data['average_rating'], 0)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.libro = crear_catalogo(2)[0]
+
+    def test_listado_responde_304_sin_serializar(self):
+        url = reverse('book-list')
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            no_modificado = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+
+    def test_etag_depende_del_filtro(self):
+        url = reverse('book-list')
+        todos = self.client.get(url)
+        filtrados = self.client.get(url, {'genres': self.libro.genres.first().pk})
+        self.assertNotEqual(todos['ETag'], filtrados['ETag'])
+
+    def test_calificacion_nueva_cambia_etag_del_libro_y_sus_ratings(self):
+        urls = [reverse('book-list'), reverse('rating-list', args=[self.libro.pk])]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        usuario = User.objects.create_user(username='nuevo', password='x')
+        Rating.objects.create(user=usuario, book=self.libro, score=2)
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+    def test_borrar_calificacion_cambia_etag(self):
+        url = reverse('rating-list', args=[self.libro.pk])
+        etag = self.client.get(url)['ETag']
+        Rating.objects.filter(book=self.libro).first().delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_borrar_libro_no_responde_304_por_fecha(self):
+        url = reverse('book-list')
+        response = self.client.get(url)
+        Book.objects.filter(pk=self.libro.pk).delete()  # No mueve el máximo updated_at
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_cambio_de_generos_actualiza_el_libro(self):
+        antes = Book.objects.get(pk=self.libro.pk).updated_at
+        self.libro.genres.clear()
+        self.assertGreater(Book.objects.get(pk=self.libro.pk).updated_at, antes)
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.libro = crear_catalogo(1, num_usuarios=0)[0]
+        self.usuarios = [User.objects.create_user(username=f'lector{i}', password='x') for i in range(2)]
+
+    def test_crear_y_recalificar_aplica_delta(self):
+        rating = Rating.objects.create(user=self.usuarios[0], book=self.libro, score=5)
+        Rating.objects.create(user=self.usuarios[1], book=self.libro, score=2)
+        self.libro.refresh_from_db()
+        self.assertEqual((self.libro.rating_count, self.libro.rating_sum), (2, 7))
+        self.assertEqual(self.libro.average_rating, Decimal('3.50'))
+
+        rating.score = 1
+        rating.save()
+        self.libro.refresh_from_db()
+        self.assertEqual((self.libro.rating_count, self.libro.rating_sum), (2, 3))
+        self.assertEqual(self.libro.average_rating, Decimal('1.50'))
+
+    def test_eliminar_resta_la_calificacion(self):
+        rating = Rating.objects.create(user=self.usuarios[0], book=self.libro, score=4)
+        rating.delete()
+        self.libro.refresh_from_db()
+        self.assertEqual((self.libro.rating_count, self.libro.rating_sum), (0, 0))
+        self.assertEqual(self.libro.average_rating, Decimal('0.00'))
+
+    def test_guardar_no_recorre_todas_las_calificaciones(self):
+        Rating.objects.create(user=self.usuarios[0], book=self.libro, score=4)
+        # SAVEPOINT + INSERT + UPDATE del libro + UPDATE de sus géneros + tableros (libro, entradas, bloqueo
+        # de géneros, entradas bloqueadas, UPDATE) + RELEASE, sin AVG sobre todas las calificaciones
+        with self.assertNumQueries(10):
+            Rating.objects.create(user=self.usuarios[1], book=self.libro, score=3)
+
+    def test_actualizar_el_libro_no_pisa_los_agregados(self):
+        libro = Book.objects.get(pk=self.libro.pk)  # Leído antes de la calificación
+        Rating.objects.create(user=self.usuarios[0], book=self.libro, score=4)
+        libro.stock = 7
+        libro.save()
+        self.client.patch(reverse('book-detail', args=[self.libro.pk]), {'title': 'Nuevo'}, content_type='application/json')
+        self.libro.refresh_from_db()
+        self.assertEqual((self.libro.title, self.libro.stock), ('Nuevo', 7))
+        self.assertEqual((self.libro.rating_count, self.libro.rating_sum), (1, 4))
+
+    def test_comando_repara_desajustes(self):
+        Rating.objects.create(user=self.usuarios[0], book=self.libro, score=4)
+        Rating.objects.create(user=self.usuarios[1], book=self.libro, score=1)
+        Book.objects.update(rating_count=99, rating_sum=0, average_rating=0)
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.libro.refresh_from_db()
+        self.assertEqual((self.libro.rating_count, self.libro.rating_sum), (2, 5))
+        self.assertEqual(self.libro.average_rating, Decimal('2.50'))
+
+
+class RatingBulkCreateTests(TestCase):
+    def setUp(self):
+        self.libros = crear_catalogo(3, num_usuarios=0)
+        self.usuario = User.objects.create_user(username='lector', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_upsert_con_resultados_por_item(self):
+        Rating.objects.create(user=self.usuario, book=self.libros[0], score=1)
+        payload = [
+            {'book': self.libros[0].pk, 'score': 5},  # ya existía: se actualiza
+            {'book': self.libros[1].pk, 'score': 4},
+            {'book': self.libros[1].pk, 'score': 2},  # repetido en el lote: gana el último
+            {'book': 999999, 'score': 3},
+            {'book': self.libros[2].pk, 'score': 9},
+        ]
+        response = self.client.post(reverse('rating-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        estados = [r['status'] for r in response.data['results']]
+        self.assertEqual(estados, ['updated', 'duplicate', 'created', 'invalid', 'invalid'])
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+
+        self.libros[0].refresh_from_db()
+        self.libros[1].refresh_from_db()
+        self.assertEqual((self.libros[0].rating_count, self.libros[0].rating_sum), (1, 5))
+        self.assertEqual((self.libros[1].rating_count, self.libros[1].rating_sum), (1, 2))
+
+    def test_consultas_no_crecen_con_el_lote(self):
+        usuarios = [User(username=f'socio{i}') for i in range(20)]
+        User.objects.bulk_create(usuarios)
+        self.usuario.is_staff = True
+        self.usuario.save()
+        payload = [
+            {'book': libro.pk, 'score': (i % 5) + 1, 'user': f'socio{i}'}
+            for i in range(20) for libro in self.libros
+        ]
+        # usuarios, libros, existentes, INSERT ... ON CONFLICT, UPDATE de libros y de géneros,
+        # tableros (libros, entradas, bloqueo de géneros, entradas bloqueadas, altas), savepoints
+        with self.assertNumQueries(13):
+            response = self.client.post(reverse('rating-bulk'), payload, format='json')
+        self.assertEqual(response.data['created'], 60)
+        self.assertEqual(Book.objects.get(pk=self.libros[0].pk).rating_count, 20)
+
+    def test_solo_personal_califica_por_otros(self):
+        User.objects.create_user(username='otro', password='x')
+        response = self.client.post(
+            reverse('rating-bulk'), [{'book': self.libros[0].pk, 'score': 3, 'user': 'otro'}], format='json'
+        )
+        self.assertEqual(response.data['results'][0]['status'], 'invalid')
+        self.assertFalse(Rating.objects.exists())
+
+    def test_conflicto_al_escribir_responde_409(self):
+        with mock.patch.object(Rating.objects, 'bulk_create', side_effect=IntegrityError):
+            response = self.client.post(reverse('rating-bulk'), [{'book': self.libros[0].pk, 'score': 3}], format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Rating.objects.exists())
+
+    def test_rechaza_cuerpo_que_no_es_lista(self):
+        response = self.client.post(reverse('rating-bulk'), {'book': 1, 'score': 3}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.libro = crear_catalogo(1)[0]
+        self.genero = self.libro.genres.first()
+        cache.get_cache().clear()
+        cache.reset_stats()
+
+    def test_parametros_normalizados_comparten_entrada(self):
+        url = reverse('book-recommend')
+        primera = self.client.get(url, {'genres': f'{self.genero.pk},', 'min_rating': '1'})
+        with self.assertNumQueries(0):
+            segunda = self.client.get(url, {'genres': f' {self.genero.pk}', 'min_rating': '1.0'})
+        self.assertEqual((primera['X-Cache'], segunda['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(primera.data, segunda.data)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_calificacion_invalida_resultados(self):
+        url = reverse('libros-por-genero')
+        params = {'genre_id': self.genero.pk}
+        self.client.get(url, params)
+        usuario = User.objects.create_user(username='nuevo', password='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user=usuario, book=self.libro, score=5)
+        response = self.client.get(url, params)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data[0]['ratings']), 4)
+
+    def test_cambio_de_generos_invalida_analisis(self):
+        url = reverse('libros-analisis')
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.libro.genres.remove(self.genero)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data), 1)
+
+    def test_version_desalojada_no_sirve_datos_viejos(self):
+        url = reverse('libros-analisis')
+        self.client.get(url)
+        cache.get_cache().delete(cache.VERSION_KEY)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+
+class BookExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        crear_catalogo(5)
+
+    def test_jsonl_por_defecto(self):
+        response = self.client.get(reverse('book-export'))
+        self.assertTrue(response.streaming)
+        filas = [json.loads(linea) for linea in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(filas), 5)
+        self.assertEqual(filas[0]['genres'], ['Género 0', 'Género 1'])
+        self.assertEqual(filas[0]['rating_count'], 3)
+
+    def test_csv_con_encabezado(self):
+        response = self.client.get(reverse('book-export'), {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        filas = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(filas[0], BookExportView.columnas)
+        self.assertEqual(len(filas), 6)
+        self.assertEqual(filas[1][7], 'Género 0, Género 1')
+
+    def test_generos_se_cargan_por_bloque(self):
+        with mock.patch.object(BookExportView, 'chunk_size', 2):
+            response = self.client.get(reverse('book-export'))
+            # 1 consulta de libros + 1 de géneros por cada bloque de 2 (3 bloques)
+            with self.assertNumQueries(4):
+                b''.join(response.streaming_content)
+
+
+class BookPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        crear_catalogo(5)
+
+    def test_sin_page_size_devuelve_lista_completa(self):
+        response = self.client.get(reverse('book-list'))
+        self.assertEqual(len(response.data), 5)
+
+    def test_paginas_ordenadas(self):
+        response = self.client.get(reverse('book-list'), {'page_size': 2, 'page': 3})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([libro['title'] for libro in response.data['results']], ['Libro 4'])
+
+
+class GenreStatsTests(TestCase):
+    def setUp(self):
+        self.libros = crear_catalogo(3)  # 3 libros × 2 géneros × 3 calificaciones
+        self.generos = list(Genre.objects.order_by('pk'))
+
+    def assertEstadisticasCoinciden(self):
+        esperadas = {
+            (stats.pk, stats.book_count, stats.rating_count, stats.rating_sum, stats.average_rating,
+             stats.stars_1, stats.stars_2, stats.stars_3, stats.stars_4, stats.stars_5)
+            for stats in GenreStats.objects.all()
+        }
+        GenreStats.objects.rebuild()
+        recalculadas = {
+            (stats.pk, stats.book_count, stats.rating_count, stats.rating_sum, stats.average_rating,
+             stats.stars_1, stats.stars_2, stats.stars_3, stats.stars_4, stats.stars_5)
+            for stats in GenreStats.objects.all()
+        }
+        self.assertEqual(esperadas, recalculadas)
+
+    def test_incremental_coincide_con_recalculo(self):
+        stats = GenreStats.objects.get(genre=self.generos[0])
+        self.assertEqual((stats.book_count, stats.rating_count), (3, 9))
+        self.assertEstadisticasCoinciden()
+
+    def test_recalificar_mueve_la_distribucion(self):
+        rating = Rating.objects.filter(book=self.libros[0]).first()
+        rating.score = 5 if rating.score != 5 else 1
+        rating.save()
+        self.assertEstadisticasCoinciden()
+        rating.delete()
+        self.assertEstadisticasCoinciden()
+
+    def test_cambios_de_generos_y_borrado_de_libros(self):
+        nuevo = Genre.objects.create(name='Nuevo')
+        self.libros[0].genres.add(nuevo)
+        self.assertEqual(GenreStats.objects.get(genre=nuevo).rating_count, 3)
+        self.libros[1].genres.remove(self.generos[0])
+        self.libros[2].genres.clear()
+        nuevo.book_set.add(self.libros[2])
+        self.assertEstadisticasCoinciden()
+        self.libros[0].delete()
+        self.assertEstadisticasCoinciden()
+
+    def test_endpoint_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            response = APIClient().get(reverse('genre-stats'))
+        self.assertEqual(response.data[0]['name'], 'Género 0')
+        self.assertEqual(sum(response.data[0]['distribution'].values()), 9)
+
+
+class UpdatedSinceFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.libros = crear_catalogo(3)
+        Book.objects.update(updated_at=datetime(2025, 1, 1, tzinfo=timezone.utc))
+        Rating.objects.update(updated_at=datetime(2025, 1, 1, tzinfo=timezone.utc))
+
+    def test_libros_modificados_desde(self):
+        usuario = User.objects.create_user(username='nuevo', password='x')
+        Rating.objects.create(user=usuario, book=self.libros[1], score=4)  # Actualiza el libro
+        response = self.client.get(reverse('book-list'), {'updated_since': '2025-06-01T00:00:00Z'})
+        self.assertEqual([libro['id'] for libro in response.data], [self.libros[1].pk])
+
+    def test_calificaciones_modificadas_desde(self):
+        rating = Rating.objects.filter(book=self.libros[0]).first()
+        rating.comment = 'Editado'
+        rating.save()
+        url = reverse('rating-list', args=[self.libros[0].pk])
+        response = self.client.get(url, {'updated_since': '2025-06-01T00:00:00Z'})
+        self.assertEqual([r['id'] for r in response.data], [rating.pk])
+
+    def test_huella_con_conteo_y_suma_de_ids(self):
+        self.libros[0].delete()
+        response = self.client.get(reverse('book-fingerprint'))
+        self.assertEqual(response.data, {'count': 2, 'id_sum': self.libros[1].pk + self.libros[2].pk})
+
+
+class ReportJobTests(TestCase):
+    def setUp(self):
+        crear_catalogo(3)
+        self.generos = list(Genre.objects.order_by('pk').values_list('pk', flat=True))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('lector'))
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(REPORT_JOBS_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def solicitar(self, generos, formato='pdf'):
+        with mock.patch.object(jobs, 'get_executor') as executor, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('report-job-create'), {'genres': generos, 'format': formato}, format='json')
+        return response, executor.return_value.submit
+
+    def test_peticiones_identicas_comparten_trabajo(self):
+        primera, submit = self.solicitar(self.generos)
+        self.assertEqual(primera.status_code, 202)
+        submit.assert_called_once_with(jobs._procesar_en_hilo, mock.ANY)
+        segunda, submit = self.solicitar(list(reversed(self.generos)) + self.generos[:1])
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.data['id'], primera.data['id'])
+        submit.assert_not_called()
+        otro_formato, _ = self.solicitar(self.generos, 'xlsx')
+        self.assertNotEqual(otro_formato.data['id'], primera.data['id'])
+        self.assertEqual(ReportJob.objects.count(), 2)
+
+    def test_carrera_con_trabajo_ya_terminado_crea_otro(self):
+        crear = ReportJob.objects.create
+        intentos = []
+
+        def ganador_termina(**kwargs):
+            # Otro proceso creó el trabajo activo y terminó antes de que este lo buscara
+            intentos.append(kwargs)
+            if len(intentos) == 1:
+                raise IntegrityError
+            return crear(**kwargs)
+
+        with mock.patch.object(ReportJob.objects, 'create', side_effect=ganador_termina), \
+                mock.patch.object(jobs, 'get_executor'):
+            job, creado = jobs.solicitar(self.generos, 'pdf')
+        self.assertTrue(creado)
+        self.assertEqual(len(intentos), 2)
+        self.assertEqual(ReportJob.objects.get().pk, job.pk)
+
+    def test_procesar_y_descargar(self):
+        from openpyxl import load_workbook
+
+        response, _ = self.solicitar(self.generos[:1], 'xlsx')
+        job_id = response.data['id']
+        self.assertIsNone(response.data['download_url'])
+        self.assertTrue(jobs.procesar(job_id))
+        self.assertFalse(jobs.procesar(job_id))  # Ya reclamado: no se procesa dos veces
+
+        estado = self.client.get(reverse('report-job-detail', args=[job_id]))
+        self.assertEqual(estado.data['status'], 'done')
+        descarga = self.client.get(estado.data['download_url'])
+        self.assertEqual(descarga.status_code, 200)
+        hoja = load_workbook(ReportJob.objects.get(pk=job_id).file)['Top libros']
+        self.assertEqual(hoja.max_row, 4)  # Encabezado + top 3
+        descarga.close()
+
+        # Terminado el anterior, una petición idéntica genera un reporte nuevo
+        nueva, _ = self.solicitar(self.generos[:1], 'xlsx')
+        self.assertEqual(nueva.status_code, 202)
+
+    def test_pdf_y_comando_drena_pendientes(self):
+        response, _ = self.solicitar(self.generos)
+        call_command('procesar_reportes', stdout=StringIO())
+        job = ReportJob.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, 'done')
+        with open(job.file, 'rb') as archivo:
+            self.assertEqual(archivo.read(4), b'%PDF')
+
+    def test_fallo_queda_registrado(self):
+        response, _ = self.solicitar(self.generos)
+        with mock.patch('libros.reportes.generar', side_effect=RuntimeError('sin disco')), \
+                self.assertLogs('libros.jobs', 'ERROR'):
+            self.assertFalse(jobs.procesar(response.data['id']))
+        estado = self.client.get(reverse('report-job-detail', args=[response.data['id']]))
+        self.assertEqual((estado.data['status'], estado.data['error']), ('failed', 'sin disco'))
+        descarga = self.client.get(reverse('report-job-download', args=[response.data['id']]))
+        self.assertEqual(descarga.status_code, 409)
+
+    def test_validacion_y_autenticacion(self):
+        response, _ = self.solicitar([999])
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(None)
+        response, _ = self.solicitar(self.generos)
+        self.assertEqual(response.status_code, 401)
+
+
+class BookSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        gabo = Author.objects.create(name='Gabriel García Márquez', bio='Escritor colombiano, premio Nobel.')
+        cortazar = Author.objects.create(name='Julio Cortázar', bio='Escritor argentino.')
+        self.cien = Book.objects.create(title='Cien años de soledad', author=gabo, published_date=date(1967, 5, 30), isbn='1')
+        self.amor = Book.objects.create(title='El amor en los tiempos del cólera', author=gabo, published_date=date(1985, 1, 1), isbn='2')
+        self.rayuela = Book.objects.create(title='Rayuela', author=cortazar, published_date=date(1963, 1, 1), isbn='3')
+        self.colombia = Book.objects.create(title='Historia de Colombia', author=cortazar, published_date=date(2000, 1, 1), isbn='4')
+
+    def buscar(self, q, **params):
+        response = self.client.get(reverse('book-search'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [libro['id'] for libro in response.data['results']]
+
+    def test_prefijos_y_todos_los_terminos(self):
+        self.assertEqual(self.buscar('sole'), [self.cien.pk])
+        self.assertEqual(self.buscar('garcia'), [self.cien.pk, self.amor.pk])  # Sin acentos
+        self.assertEqual(self.buscar('garcia colera'), [self.amor.pk])
+        self.assertEqual(self.buscar('inexistente'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Configuración de texto de PostgreSQL')
+    def test_vector_de_postgres_sin_acentos(self):
+        vector = Book.objects.filter(pk=self.cien.pk).values_list('search_vector', flat=True).get()
+        self.assertIn("'garci", vector)
+        self.assertNotIn('garcí', vector)
+
+    def test_titulo_pesa_mas_que_biografia(self):
+        self.assertEqual(self.buscar('colombia')[0], self.colombia.pk)
+        self.assertEqual(set(self.buscar('colombia')), {self.colombia.pk, self.cien.pk, self.amor.pk})
+
+    def test_indice_se_mantiene_con_cambios(self):
+        self.rayuela.title = 'Rayuela (edición revisada)'
+        self.rayuela.save()
+        self.assertEqual(self.buscar('revisada'), [self.rayuela.pk])
+        Author.objects.filter(name='Julio Cortázar').update(bio='Autor de cuentos fantásticos.')
+        self.assertEqual(self.buscar('fantasticos'), [self.rayuela.pk, self.colombia.pk])
+        self.cien.delete()
+        self.assertEqual(self.buscar('sole'), [])
+
+    def test_paginacion_y_consultas(self):
+        with self.assertNumQueries(4):  # Total + página + géneros + calificaciones
+            response = self.client.get(reverse('book-search'), {'q': 'escritor', 'page_size': 2})
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(len(self.buscar('escritor', page_size=2, page=2)), 2)
+
+    def test_q_obligatorio(self):
+        self.assertEqual(self.client.get(reverse('book-search')).status_code, 400)
+        self.assertEqual(self.client.get(reverse('book-search'), {'q': '¿?'}).data['results'], [])
+
+
+class BookListFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Catálogo sembrado con bulk_create: valores repartidos para que los rangos sean selectivos y, tras
+        # ANALYZE, el planificador elija los índices de Book por sí mismo
+        cls.autores = Author.objects.bulk_create([Author(name=f'Autor {i:02d}') for i in range(20)])
+        cls.generos = Genre.objects.bulk_create([Genre(name=f'Género {i}') for i in range(10)])
+        Book.objects.bulk_create([
+            Book(title=f'Libro {i}', author=cls.autores[i % 20], published_date=date(1950, 1, 1) + timedelta(days=7 * i),
+                 isbn=f'{i:013d}', stock=i % 50, average_rating=Decimal(i % 500) / 100)
+            for i in range(2000)
+        ])
+        Through = Book.genres.through
+        libros = list(Book.objects.values_list('pk', flat=True))
+        Through.objects.bulk_create([
+            Through(book_id=pk, genre_id=cls.generos[(i + k) % 10].pk) for i, pk in enumerate(libros) for k in range(2)
+        ])
+        usuario = User.objects.create(username='lector')
+        Rating.objects.bulk_create([Rating(user=usuario, book_id=pk, score=pk % 5 + 1) for pk in libros])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def sin_seqscan(self):
+        # Así solo se prueba que el índice existe y es usable, no que el planificador lo elige
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def filtrar(self, query):
+        return BookFilter(QueryDict(query), queryset=Book.objects.all()).qs
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = queryset.explain()
+        self.assertIn(indice, plan, plan)
+
+    def test_rangos_usan_indices(self):
+        self.assertUsaIndice(self.filtrar('min_rating=4.9'), 'book_rating_idx')
+        self.assertUsaIndice(self.filtrar('published_after=1985-01-01&ordering=published_date'), 'book_published_idx')
+        self.assertUsaIndice(self.filtrar('min_stock=48&max_stock=49'), 'book_stock_idx')
+        self.assertUsaIndice(self.filtrar(f'author={self.autores[3].pk}&ordering=-average_rating'), 'book_author_rating_idx')
+
+    def test_indices_sobre_tablas_chicas_o_con_alternativas(self):
+        # Con 20 autores ordenar en memoria es más barato; la tabla intermedia (10 géneros) y Rating tienen
+        # además los índices de sus claves foráneas, que a este tamaño el planificador puede preferir
+        self.sin_seqscan()
+        self.assertUsaIndice(self.filtrar('ordering=author'), 'author_name_idx')
+        self.assertUsaIndice(self.filtrar(f'genres={self.generos[0].pk}'), 'book_genres_genre_book_idx')
+        self.assertUsaIndice(Rating.objects.filter(book_id=1, score__gte=4), 'rating_book_score_idx')
+
+    def test_filtros_combinados_y_orden_estable(self):
+        response = self.client.get(reverse('book-list'), {
+            'genres': self.generos[0].pk, 'min_rating': '4.00', 'max_rating': '4.50',
+            'published_before': '1980-01-01', 'ordering': '-average_rating',
+        })
+        esperados = Book.objects.filter(
+            genres=self.generos[0], average_rating__range=(Decimal('4.00'), Decimal('4.50')),
+            published_date__lte=date(1980, 1, 1),
+        ).order_by('-average_rating', '-pk')
+        self.assertEqual([libro['id'] for libro in response.data], list(esperados.values_list('pk', flat=True)))
+        self.assertTrue(response.data)
+
+        response = self.client.get(reverse('book-list'), {'ordering': 'author,stock', 'page_size': 3})
+        self.assertEqual([libro['id'] for libro in response.data['results']], list(
+            Book.objects.order_by('author__name', 'stock', 'pk').values_list('pk', flat=True)[:3]
+        ))
+
+
+class RecommendedForMeTests(TestCase):
+    def setUp(self):
+        autor = Author.objects.create(name='Autor')
+        self.libros = {
+            titulo: Book.objects.create(title=titulo, author=autor, published_date=date(2000, 1, 1), isbn=titulo)
+            for titulo in 'ABCDE'
+        }
+        self.yo = User.objects.create_user('yo')
+        # A y B gustan a los mismos lectores; C y D también entre sí
+        for i in range(3):
+            self.calificar(User.objects.create_user(f'ab{i}'), A=5, B=5, **({'E': 3} if i == 0 else {}))
+        for i in range(2):
+            self.calificar(User.objects.create_user(f'cd{i}'), C=4, D=5)
+        self.client = APIClient()
+        self.client.force_authenticate(self.yo)
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(RECOMMENDER_MODEL_PATH=f'{directorio.name}/modelo.npz', RECOMMENDER_TOP_K=3)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        solape = mock.patch.object(recomendador, 'SOLAPE', timedelta(0))  # Todo ocurre en el mismo instante
+        solape.start()
+        self.addCleanup(solape.stop)
+
+    def calificar(self, usuario, **puntajes):
+        for titulo, score in puntajes.items():
+            Rating.objects.create(user=usuario, book=self.libros[titulo], score=score)
+
+    def ids(self, *titulos):
+        return [self.libros[titulo].pk for titulo in titulos]
+
+    def vecinos(self, modelo):
+        return {
+            int(modelo.libros[i]): {int(modelo.libros[j]): round(float(s), 5) for j, s in zip(fila, sims) if j >= 0}
+            for i, (fila, sims) in enumerate(zip(modelo.vecinos, modelo.similitudes))
+        }
+
+    def test_recomienda_vecinos_de_lo_que_gusto(self):
+        self.calificar(self.yo, A=5, C=1)
+        recomendador.guardar(recomendador.entrenar())
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('book-recommend-me'), {'limit': 3})
+        self.assertEqual([libro['id'] for libro in response.data], self.ids('B', 'E', 'D'))
+        self.assertEqual(len(consultas), 1)
+        self.assertNotIn('libros_rating', consultas[0]['sql'])
+
+    def test_usuario_sin_historial_recibe_populares(self):
+        recomendador.guardar(recomendador.entrenar())
+        response = self.client.get(reverse('book-recommend-me'), {'limit': 2})
+        self.assertEqual([libro['id'] for libro in response.data], self.ids('A', 'B'))
+
+    def test_refresco_incremental_coincide_con_entrenamiento(self):
+        modelo = recomendador.entrenar(k=10)
+        self.calificar(self.yo, A=5, D=4)
+        Rating.objects.filter(book=self.libros['E']).first().delete()
+        nuevo = Book.objects.create(title='F', author=self.libros['A'].author, published_date=date(2000, 1, 1), isbn='F')
+        Rating.objects.create(user=self.yo, book=nuevo, score=5)
+        borrado = self.libros['C'].pk
+        self.libros['C'].delete()
+
+        with mock.patch.object(recomendador, 'MAX_FRACCION_INCREMENTAL', 1), \
+                mock.patch.object(recomendador, 'BLOQUE', 2):  # Varios bloques de libros cambiados
+            refrescado, recalculados = recomendador.refrescar(modelo)
+        self.assertEqual(recalculados, 5)  # A, C, D, E y F
+        completo = recomendador.entrenar(k=10)
+        self.assertEqual(
+            {pk: vecinos for pk, vecinos in self.vecinos(refrescado).items() if pk != borrado},
+            self.vecinos(completo),
+        )
+        self.assertEqual(recomendador.refrescar(refrescado)[0].recomendar(self.yo.pk, 3),
+                         completo.recomendar(self.yo.pk, 3))
+
+    def test_modelo_persistido_y_comando(self):
+        self.assertEqual(self.client.get(reverse('book-recommend-me')).status_code, 503)
+        call_command('entrenar_recomendador', stdout=StringIO())
+        modelo = recomendador.cargar()
+        self.assertEqual(self.vecinos(modelo), self.vecinos(recomendador.entrenar()))
+        self.calificar(self.yo, B=5)
+        salida = StringIO()
+        call_command('entrenar_recomendador', stdout=salida)
+        self.assertIn('1 libros recalculados', salida.getvalue())
+        self.assertIs(recomendador.obtener_modelo(), recomendador.obtener_modelo())  # Sin recargar si no cambió
+        self.assertEqual(self.client.get(reverse('book-recommend-me')).status_code, 200)
+
+
+@override_settings(LEADERBOARD_SIZE=2, LEADERBOARD_MIN_RATINGS=(1, 3))
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.autor = Author.objects.create(name='Autor')
+        self.generos = [Genre.objects.create(name=f'Género {i}') for i in range(2)]
+        self.usuarios = [User.objects.create(username=f'lector{i}') for i in range(4)]
+        self.libros = []
+        for i in range(4):
+            libro = Book.objects.create(title=f'Libro {i}', author=self.autor, published_date=date(2000, 1, 1), isbn=str(i))
+            libro.genres.set(self.generos[:1] if i < 2 else self.generos)
+            self.libros.append(libro)
+
+    def calificar(self, libro, *puntajes):
+        for usuario, score in zip(self.usuarios, puntajes):
+            Rating.objects.update_or_create(user=usuario, book=libro, defaults={'score': score})
+
+    def tablero(self, genre=None, min_ratings=1):
+        return list(LeaderboardEntry.objects.board(genre and genre.pk, min_ratings).values_list('book_id', flat=True))
+
+    def assertCoincideConRecalculo(self):
+        tableros = {
+            (genre, umbral): self.tablero(genre, umbral)
+            for genre in [None, *self.generos] for umbral in (1, 3)
+        }
+        LeaderboardEntry.objects.rebuild()
+        for (genre, umbral), libros in tableros.items():
+            self.assertEqual(libros, self.tablero(genre, umbral), (genre, umbral))
+
+    def test_entra_sube_y_sale_con_desempate(self):
+        l0, l1, l2, l3 = self.libros
+        self.calificar(l0, 4)
+        self.calificar(l1, 4, 4)  # Mismo promedio que l0 pero más calificaciones
+        self.assertEqual(self.tablero(), [l1.pk, l0.pk])
+        self.calificar(l2, 5)
+        self.assertEqual(self.tablero(), [l2.pk, l1.pk])
+        self.calificar(l3, 4)  # Empata con l0: gana el id menor, pero no entra
+        self.calificar(l2, 1)  # Baja: entra el mejor de fuera
+        self.assertEqual(self.tablero(), [l1.pk, l0.pk])
+        self.assertEqual(self.tablero(self.generos[1]), [l3.pk, l2.pk])
+        self.assertCoincideConRecalculo()
+
+    def test_umbral_de_calificaciones(self):
+        self.calificar(self.libros[0], 5)
+        self.calificar(self.libros[1], 3, 3, 3)
+        self.assertEqual(self.tablero(min_ratings=3), [self.libros[1].pk])
+        Rating.objects.filter(book=self.libros[1]).first().delete()
+        self.assertEqual(self.tablero(min_ratings=3), [])
+        self.assertCoincideConRecalculo()
+
+    def test_cambios_de_generos_y_borrado(self):
+        for i, libro in enumerate(self.libros):
+            self.calificar(libro, 5 - i)
+        self.assertEqual(self.tablero(self.generos[0]), [self.libros[0].pk, self.libros[1].pk])
+        self.libros[0].genres.remove(self.generos[0])
+        self.assertEqual(self.tablero(self.generos[0]), [self.libros[1].pk, self.libros[2].pk])
+        self.generos[1].book_set.add(self.libros[0])
+        self.assertEqual(self.tablero(self.generos[1]), [self.libros[0].pk, self.libros[2].pk])
+        self.libros[1].delete()
+        self.assertEqual(self.tablero(), [self.libros[0].pk, self.libros[2].pk])
+        self.assertEqual(self.tablero(self.generos[0]), [self.libros[2].pk, self.libros[3].pk])
+        self.generos[1].book_set.clear()
+        self.assertEqual(self.tablero(self.generos[1]), [])
+        self.assertCoincideConRecalculo()
+
+    @override_settings(LEADERBOARD_SIZE=1)
+    def test_libro_lejos_del_tablero_no_bloquea(self):
+        self.calificar(self.libros[0], 5)
+        self.calificar(self.libros[2], 5)
+        # SAVEPOINT + INSERT + UPDATE del libro y de sus géneros + tableros (libro, entradas) + RELEASE
+        with CaptureQueriesContext(connection) as consultas:
+            Rating.objects.create(user=self.usuarios[0], book=self.libros[1], score=1)
+        self.assertEqual(len(consultas), 7)
+        self.assertFalse([c for c in consultas if 'FROM "libros_genre"' in c['sql']])
+        self.assertEqual(self.tablero(self.generos[0]), [self.libros[0].pk])
+        self.assertCoincideConRecalculo()
+
+    def test_endpoint_lee_solo_el_tablero(self):
+        self.calificar(self.libros[2], 5, 5, 4)
+        self.calificar(self.libros[3], 5)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('book-leaderboard'), {'genre': self.generos[1].pk})
+        self.assertEqual([(e['rank'], e['book'], e['title']) for e in response.data['results']],
+                         [(1, self.libros[3].pk, 'Libro 3'), (2, self.libros[2].pk, 'Libro 2')])
+        response = self.client.get(reverse('book-leaderboard'), {'min_ratings': 3, 'limit': 1})
+        self.assertEqual([e['book'] for e in response.data['results']], [self.libros[2].pk])
+        self.assertEqual(self.client.get(reverse('book-leaderboard'), {'min_ratings': 2}).status_code, 400)
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        crear_catalogo(3)
+
+    def metricas(self, response):
+        return dict(parte.split(';', 1) for parte in response['Server-Timing'].split(', '))
+
+    @override_settings(DEBUG=False, SLOW_REQUEST_THRESHOLD_MS=None)
+    def test_cabecera_server_timing(self):
+        response = self.client.get(reverse('book-list'))
+        metricas = self.metricas(response)
+        self.assertEqual(set(metricas), {'sql', 'ser', 'render', 'total'})
+        self.assertIn('desc="4 queries"', metricas['sql'])
+        self.assertGreater(float(metricas['ser'].removeprefix('dur=')), 0)
+        self.assertGreater(float(metricas['render'].removeprefix('dur=')), 0)
+
+    @override_settings(DEBUG=False, SLOW_REQUEST_THRESHOLD_MS=0, SLOW_REQUEST_SQL_LIMIT=2)
+    def test_registro_de_peticiones_lentas(self):
+        with self.assertLogs('bobeda.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('book-list'), {'ordering': 'stock'})
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual((registro['path'], registro['status'], registro['sql_count']), ('/api/books/?ordering=stock', 200, 4))
+        self.assertEqual(len(registro['worst_sql']), 2)
+        self.assertGreaterEqual(registro['worst_sql'][0]['ms'], registro['worst_sql'][1]['ms'])
+        self.assertTrue(registro['worst_sql'][0]['sql'].startswith('SELECT'))
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=60_000)
+    def test_sin_registro_bajo_el_umbral(self):
+        with self.assertNoLogs('bobeda.slow_requests'):
+            self.client.get(reverse('genre-stats'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Decisiones del router y del middleware; .db resuelve el alias sin consultar la base."""
+
+    def setUp(self):
+        _, token = routers.abrir()
+        self.addCleanup(routers.cerrar, token)
+        self.factory = RequestFactory()
+        self.addCleanup(caches['default'].clear)
+
+    def test_lecturas_a_la_replica_y_escrituras_al_primario(self):
+        self.assertEqual(Book.objects.all().db, 'replica1')
+        self.assertEqual(router.db_for_write(Book), 'default')
+        self.assertEqual(Book.objects.all().db, 'default')  # Leer lo propio tras escribir
+
+    def test_primario_explicito_y_transacciones(self):
+        with mock.patch.object(connection, 'in_atomic_block', True):
+            self.assertEqual(Book.objects.all().db, 'default')
+        self.assertEqual(Book.objects.all().db, 'replica1')
+        routers.usar_primario()
+        self.assertEqual(Book.objects.all().db, 'default')
+
+    def test_sin_contexto_escribir_no_fija_el_hilo_al_primario(self):
+        def hilo_sin_peticion():
+            router.db_for_write(ReportJob)
+            return Book.objects.all().db
+        self.assertEqual(contextvars.Context().run(hilo_sin_peticion), 'replica1')
+
+    def test_trabajo_en_segundo_plano_lee_lo_propio_solo_mientras_corre(self):
+        vistos = []
+
+        def procesar(job_id):
+            router.db_for_write(ReportJob)
+            vistos.append(Book.objects.all().db)
+
+        def hilo_del_pool():
+            jobs._procesar_en_hilo(1)
+            return Book.objects.all().db
+
+        with mock.patch.object(jobs, 'procesar', procesar), mock.patch.object(jobs.connections, 'close_all'):
+            self.assertEqual(contextvars.Context().run(hilo_del_pool), 'replica1')
+        self.assertEqual(vistos, ['default'])
+
+    def test_calculos_cacheados_leen_de_la_replica(self):
+        async def calcular():
+            return await sync_to_async(lambda: Book.objects.all().db)()
+
+        def alias():
+            return Book.objects.all().db
+
+        cache.invalidate()
+        self.assertEqual(cache.get_or_compute('prueba', {}, alias), ('replica1', False))
+        self.assertEqual(async_to_sync(cache.aget_or_compute)('prueba-async', {}, calcular), ('replica1', False))
+        # Lo calculado en la ventana de retraso vence al cerrarse; fuera de ella dura el TIMEOUT normal
+        self.assertLessEqual(cache._timeout(cache.catalog_version()), 5)
+        self.assertIs(cache._timeout('version-0.000'), DEFAULT_TIMEOUT)
+        self.assertEqual(cache.get_or_compute('prueba', {}, alias), ('replica1', True))
+
+        routers.usar_primario()  # Quien acaba de escribir no usa lo que pudo salir de una réplica atrasada
+        self.assertEqual(cache.get_or_compute('prueba', {}, alias), ('default', False))
+        self.assertEqual(async_to_sync(cache.aget_or_compute)('prueba-async', {}, calcular), ('default', False))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_sin_replicas(self):
+        self.assertEqual(Book.objects.all().db, 'default')
+
+    def middleware(self, escribir=False):
+        def get_response(request):
+            request.alias = Book.objects.all().db
+            if escribir:
+                router.db_for_write(Book)
+            return HttpResponse()
+        return ReplicaStickinessMiddleware(get_response)
+
+    def test_cliente_que_escribio_lee_del_primario(self):
+        credencial = {'HTTP_AUTHORIZATION': 'Bearer abc'}
+        post = self.factory.post('/api/books/', **credencial)
+        response = self.middleware(escribir=True)(post)
+        self.assertEqual(post.alias, 'default')
+        self.assertEqual(response.cookies[ReplicaStickinessMiddleware.COOKIE]['max-age'], 5)
+
+        siguiente = self.factory.get('/api/books/', **credencial)  # Sin la cookie: lo marca la caché
+        self.middleware()(siguiente)
+        self.assertEqual(siguiente.alias, 'default')
+        otro = self.factory.get('/api/books/', HTTP_AUTHORIZATION='Bearer xyz')
+        self.middleware()(otro)
+        self.assertEqual(otro.alias, 'replica1')
+
+        anonimo = self.factory.get('/api/books/')
+        anonimo.COOKIES[ReplicaStickinessMiddleware.COOKIE] = '1'
+        self.middleware()(anonimo)
+        self.assertEqual(anonimo.alias, 'default')
+
+    def test_lectura_sin_escrituras_no_marca(self):
+        get = self.factory.get('/api/books/', HTTP_AUTHORIZATION='Bearer abc')
+        response = self.middleware()(get)
+        self.assertEqual(get.alias, 'replica1')
+        self.assertNotIn(ReplicaStickinessMiddleware.COOKIE, response.cookies)
+        self.assertEqual(Book.objects.all().db, 'replica1')  # El contexto de la petición no se filtra
+
+
+@skipUnless('replica1' in settings.DATABASES, 'Requiere BOBEDA_DB_REPLICAS')
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaIntegrationTests(TransactionTestCase):
+    """Peticiones completas con primario y réplica (en los tests, la réplica espeja la base del primario)."""
+    databases = {'default', 'replica1'} & set(settings.DATABASES)  # El runner valida los alias aunque se omita
+
+    def setUp(self):
+        self.libro = crear_catalogo(1)[0]
+        User.objects.create_user('lector', password='secreta')
+        caches['default'].clear()
+        cache.invalidate()
+        self.client = APIClient()
+
+    def consultas(self, peticion):
+        """(respuesta, consultas al primario, consultas a la réplica)."""
+        with CaptureQueriesContext(connections['default']) as primario, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = peticion()
+        return response, len(primario), len(replica)
+
+    def test_lee_de_la_replica_y_lo_propio_del_primario(self):
+        _, primario, replica = self.consultas(lambda: self.client.get(reverse('book-list')))
+        self.assertEqual((primario, bool(replica)), (0, True))
+
+        token = self.client.post(reverse('login'), {'username': 'lector', 'password': 'secreta'}).json()['access']
+        autenticado = APIClient()
+        autenticado.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = autenticado.post(reverse('rating-create'), {'book': self.libro.pk, 'score': 5}, format='json')
+        self.assertEqual(response.status_code, 201)
+        _, primario, replica = self.consultas(lambda: autenticado.get(reverse('book-list')))
+        self.assertEqual((bool(primario), replica), (True, 0))
+        _, primario, replica = self.consultas(lambda: self.client.get(reverse('book-list')))
+        self.assertEqual((primario, bool(replica)), (0, True))  # Otro cliente sigue en la réplica
+
+    def test_resultados_cacheados_se_calculan_en_la_replica(self):
+        response, primario, replica = self.consultas(lambda: self.client.get(reverse('libros-analisis')))
+        self.assertEqual((response['X-Cache'], primario, bool(replica)), ('MISS', 0, True))
+        response, primario, replica = self.consultas(lambda: self.client.get(reverse('libros-analisis')))
+        self.assertEqual((response['X-Cache'], primario, replica), ('HIT', 0, 0))
+
+
+class GenerarCatalogoTests(TestCase):
+    opciones = dict(autores=5, libros=40, generos=4, usuarios=12, calificaciones=150, semilla=3, stdout=StringIO())
+
+    def volcado(self):
+        return (
+            list(Book.objects.order_by('isbn').values_list('isbn', 'title', 'author__name', 'rating_count')),
+            list(Book.genres.through.objects.order_by('book__isbn', 'genre__name').values_list('book__isbn', 'genre__name')),
+            list(Rating.objects.order_by('user__username', 'book__isbn').values_list('user__username', 'book__isbn', 'score')),
+        )
+
+    def test_genera_catalogo_con_agregados(self):
+        call_command('generar_catalogo', **self.opciones)
+        self.assertEqual((Author.objects.count(), Book.objects.count(), Genre.objects.count(), User.objects.count()),
+                         (5, 40, 4, 12))
+        self.assertEqual(Rating.objects.count(), 150)
+        self.assertFalse(Book.objects.filter(genres__isnull=True).exists())
+        self.assertEqual(sum(Book.objects.values_list('rating_count', flat=True)), 150)
+        self.assertEqual(GenreStats.objects.count(), 4)
+        self.assertTrue(LeaderboardEntry.objects.filter(genre__isnull=True).exists())
+
+    def test_misma_semilla_mismos_datos(self):
+        with transaction.atomic():
+            call_command('generar_catalogo', **self.opciones)
+            primero = self.volcado()
+            transaction.set_rollback(True)
+        call_command('generar_catalogo', **self.opciones)
+        self.assertEqual(self.volcado(), primero)
+
+    def test_rechaza_semilla_repetida(self):
+        call_command('generar_catalogo', **self.opciones)
+        with self.assertRaisesMessage(CommandError, 'semilla 3'):
+            call_command('generar_catalogo', **self.opciones)
+
+
+class ImportarCatalogoTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def escribir(self, nombre, contenido):
+        ruta = f'{self.directorio}/{nombre}'
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(contenido)
+        return ruta
+
+    def jsonl(self, nombre, filas):
+        return self.escribir(nombre, ''.join(
+            fila if isinstance(fila, str) else json.dumps(fila) + '\n' for fila in filas
+        ))
+
+    def fila(self, i, **extra):
+        return {'title': f'Importado {i}', 'author': f'Autor {i % 2}', 'published_date': '2001-02-03',
+                'isbn': f'978{i:010d}', 'stock': i, 'genres': ['Drama', f'Género {i % 3}'], **extra}
+
+    def estadisticas(self):
+        return list(GenreStats.objects.order_by('genre__name').values_list('genre__name', 'book_count', 'rating_count'))
+
+    def test_importa_jsonl_y_rechaza_filas_invalidas(self):
+        ruta = self.jsonl('libros.jsonl', [
+            self.fila(1), self.fila(2), 'no es json\n', self.fila(3, published_date='ayer'), self.fila(4, isbn=''),
+        ])
+        salida = StringIO()
+        call_command('importar_catalogo', ruta, lote=2, stdout=salida)
+        self.assertIn('2 creados, 0 actualizados, 0 duplicados, 3 rechazados', salida.getvalue())
+        libro = Book.objects.select_related('author').get(isbn=f'978{1:010d}')
+        self.assertEqual((libro.title, libro.author.name, libro.stock), ('Importado 1', 'Autor 1', 1))
+        self.assertEqual(sorted(libro.genres.values_list('name', flat=True)), ['Drama', 'Género 1'])
+        self.assertEqual(self.estadisticas(), [('Drama', 2, 0), ('Género 1', 1, 0), ('Género 2', 1, 0)])
+        with open(f'{ruta}.rechazos.jsonl', encoding='utf-8') as archivo:
+            rechazos = [json.loads(linea) for linea in archivo]
+        self.assertEqual([r['line'] for r in rechazos], [3, 4, 5])
+        self.assertIn('published_date', rechazos[1]['errors'])
+        self.assertFalse(os.path.exists(f'{ruta}.checkpoint.json'))
+
+    def test_csv_actualiza_por_isbn_y_reemplaza_generos(self):
+        libro = crear_catalogo(1)[0]
+        ruta = self.escribir('libros.csv', (
+            'id,title,author,published_date,isbn,stock,download_url,genres\n'
+            f'99,Nuevo título,Otra Autora,1999-09-09,{libro.isbn},7,,"Drama, Género 0"\n'
+            f',Sin géneros,Otra Autora,1999-09-09,0000000000777,1,https://ejemplo.com/a.pdf,\n'
+        ))
+        call_command('importar_catalogo', ruta, stdout=StringIO())
+        libro.refresh_from_db()
+        self.assertEqual((libro.title, libro.author.name, libro.stock, libro.rating_count), ('Nuevo título', 'Otra Autora', 7, 3))
+        self.assertEqual(sorted(libro.genres.values_list('name', flat=True)), ['Drama', 'Género 0'])
+        self.assertEqual(Book.objects.get(isbn='0000000000777').download_url, 'https://ejemplo.com/a.pdf')
+        incremental = self.estadisticas()
+        GenreStats.objects.rebuild()
+        self.assertEqual(incremental, self.estadisticas())
+        self.assertEqual(Author.objects.filter(name='Otra Autora').count(), 1)
+
+    def test_continua_desde_el_punto_de_control(self):
+        ruta = self.jsonl('libros.jsonl', [self.fila(i) for i in range(6)] + ['{}\n'])
+        guardar_lote = importacion.guardar_lote
+        llamadas = []
+
+        def falla_en_el_segundo(filas):
+            llamadas.append(len(filas))
+            if len(llamadas) == 2:
+                raise RuntimeError('caída')
+            return guardar_lote(filas)
+
+        with mock.patch.object(importacion, 'guardar_lote', falla_en_el_segundo), self.assertRaises(RuntimeError):
+            call_command('importar_catalogo', ruta, lote=3, stdout=StringIO())
+        self.assertEqual(Book.objects.count(), 3)
+        with open(f'{ruta}.checkpoint.json', encoding='utf-8') as archivo:
+            self.assertEqual(json.load(archivo)['contadores']['filas'], 3)
+
+        salida = StringIO()
+        call_command('importar_catalogo', ruta, lote=3, stdout=salida)
+        self.assertIn('Continuando tras 3 filas', salida.getvalue())
+        self.assertIn('7 filas, 6 creados, 0 actualizados, 0 duplicados, 1 rechazados', salida.getvalue())
+        self.assertEqual(Book.objects.count(), 6)
+        self.assertFalse(os.path.exists(f'{ruta}.checkpoint.json'))
+
+
+class PerfilArranqueTests(TestCase):
+    def test_wsgi_y_asgi_no_cargan_dependencias_pesadas(self):
+        for modulo in perfil_arranque.MODULOS:
+            with self.subTest(modulo=modulo):
+                medicion = perfil_arranque.medir(modulo)
+                self.assertEqual(medicion['pesados'], [])
+                self.assertIn('django', medicion['paquetes'])
+
+    def test_comando_falla_si_supera_el_maximo(self):
+        with self.assertRaisesMessage(CommandError, 'bobeda.wsgi tarda'):
+            call_command('perfil_arranque', 'bobeda.wsgi', repeticiones=1, max_ms=1, stdout=StringIO())
+
+
+class AsyncReadViewsTests(TestCase):
+    """Las vistas async responden lo mismo que sus equivalentes síncronas."""
+
+    def setUp(self):
+        self.libros = crear_catalogo(5)
+
+    def assertMismaRespuesta(self, sincrona, asincrona, params=None):
+        esperada = self.client.get(sincrona, params or {})
+        response = self.client.get(asincrona, params or {})
+        self.assertEqual(response.status_code, esperada.status_code)
+        self.assertEqual(response.json(), esperada.json())
+        return response
+
+    def test_listado_detalle_y_calificaciones(self):
+        genero = Genre.objects.get(name='Género 0')
+        self.assertMismaRespuesta(reverse('book-list'), reverse('async-book-list'))
+        self.assertMismaRespuesta(reverse('book-list'), reverse('async-book-list'),
+                                  {'genres': genero.pk, 'ordering': '-average_rating', 'min_rating': 2})
+        libro = self.libros[2]
+        self.assertMismaRespuesta(reverse('book-detail', args=[libro.pk]), reverse('async-book-detail', args=[libro.pk]))
+        self.assertMismaRespuesta(reverse('book-detail', args=[999]), reverse('async-book-detail', args=[999]))
+        self.assertMismaRespuesta(reverse('rating-list', args=[libro.pk]), reverse('async-rating-list', args=[libro.pk]))
+        self.assertMismaRespuesta(reverse('book-list'), reverse('async-book-list'), {'genres': 999})
+
+    def test_paginacion(self):
+        for params in ({'page_size': 2, 'page': 2}, {'page_size': 2, 'page': 'last'}, {'page_size': 2}):
+            with self.subTest(**params):
+                esperada = self.client.get(reverse('book-list'), params).json()
+                data = self.client.get(reverse('async-book-list'), params).json()
+                self.assertEqual((data['count'], data['results']), (esperada['count'], esperada['results']))
+                for enlace in ('next', 'previous'):
+                    self.assertEqual(bool(data[enlace]), bool(esperada[enlace]))
+                    if data[enlace]:
+                        self.assertIn('/api/books/async/?', data[enlace])
+        for page in (4, 0, 'x'):
+            self.assertEqual(self.client.get(reverse('async-book-list'), {'page_size': 2, 'page': page}).status_code, 404)
+
+    def test_recomendaciones_y_analisis_con_cache(self):
+        genero = Genre.objects.get(name='Género 1')
+        params = {'genres': str(genero.pk), 'min_rating': 2}
+        cache.invalidate()
+        response = self.assertMismaRespuesta(reverse('book-recommend'), reverse('async-book-recommend'), params)
+        self.assertEqual(response['X-Cache'], 'HIT')  # Comparte claves con la vista síncrona
+        cache.invalidate()
+        self.assertEqual(self.client.get(reverse('async-libros-analisis'))['X-Cache'], 'MISS')
+        self.assertMismaRespuesta(reverse('libros-analisis'), reverse('async-libros-analisis'))
+
+    async def test_etag_y_server_timing_bajo_asgi(self):
+        url = reverse('async-book-list')
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="4 queries"', response['Server-Timing'])  # Huella + libros y dos prefetch
+        no_modificada = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(no_modificada.status_code, 304)
+        self.assertIn('desc="1 queries"', no_modificada['Server-Timing'])
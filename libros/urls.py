@@ -1,12 +1,30 @@
 from django.urls import path
-from libros.views import BookListCreateView, BookDetailView, RatingCreateView, RatingListView, BookRecommendationView, LibrosAnalisisView,LibrosPorGeneroView
+from libros.views import BookListCreateView, BookDetailView, BookExportView, RatingCreateView, RatingBulkCreateView, RatingListView, BookRecommendationView, LibrosAnalisisView, GenreStatsView, LibrosPorGeneroView
+from libros.views import BookFingerprintView, BookSearchView, RecommendedForMeView, LeaderboardView, ReportJobCreateView, ReportJobDetailView, ReportJobDownloadView
+from libros.views import AsyncBookListView, AsyncBookDetailView, AsyncRatingListView, AsyncBookRecommendationView, AsyncLibrosAnalisisView
 
 urlpatterns = [
     path('', BookListCreateView.as_view(), name='book-list'),
     path('<int:pk>/', BookDetailView.as_view(), name='book-detail'),
+    path('search/', BookSearchView.as_view(), name='book-search'),  # ?q=&page=
+    path('export/', BookExportView.as_view(), name='book-export'),  # ?format=jsonl|csv
+    path('huella/', BookFingerprintView.as_view(), name='book-fingerprint'),  # Conteo y suma de ids (bajas)
     path('<int:book_id>/ratings/', RatingListView.as_view(), name='rating-list'),
     path('ratings/create/', RatingCreateView.as_view(), name='rating-create'),
+    path('ratings/bulk/', RatingBulkCreateView.as_view(), name='rating-bulk'),
     path('recommend/', BookRecommendationView.as_view(), name='book-recommend'),
+    path('recommend/me/', RecommendedForMeView.as_view(), name='book-recommend-me'),
     path('analisis/', LibrosAnalisisView.as_view(), name='libros-analisis'),
+    path('top/', LeaderboardView.as_view(), name='book-leaderboard'),  # ?genre=&min_ratings=&limit=
+    path('analisis/generos/', GenreStatsView.as_view(), name='genre-stats'),
+    path('reportes/', ReportJobCreateView.as_view(), name='report-job-create'),
+    path('reportes/<uuid:pk>/', ReportJobDetailView.as_view(), name='report-job-detail'),
+    path('reportes/<uuid:pk>/descarga/', ReportJobDownloadView.as_view(), name='report-job-download'),
     path('recomendaciones/', LibrosPorGeneroView.as_view(), name='libros-por-genero'),
+    # Lectura asíncrona (ASGI): mismas respuestas que book-list, book-detail, rating-list, book-recommend y libros-analisis
+    path('async/', AsyncBookListView.as_view(), name='async-book-list'),
+    path('async/<int:pk>/', AsyncBookDetailView.as_view(), name='async-book-detail'),
+    path('async/<int:book_id>/ratings/', AsyncRatingListView.as_view(), name='async-rating-list'),
+    path('async/recommend/', AsyncBookRecommendationView.as_view(), name='async-book-recommend'),
+    path('async/analisis/', AsyncLibrosAnalisisView.as_view(), name='async-libros-analisis'),
 ]
\ No newline at end of file
@@ -1,17 +1,38 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Q, Avg
+from django.db.models import Q, Avg, Count, Max, Sum
+from django.db import IntegrityError, transaction
+from django.conf import settings
 from rest_framework import status
 from django.contrib.auth.models import User
 from rest_framework import generics, permissions
-from .models import Rating, Book, Genre, Author
-from .serializers import RatingSerializer
+from .models import Rating, Book, Genre, GenreStats, Author, ReportJob, LeaderboardEntry
+from .serializers import RatingSerializer, RatingBulkItemSerializer
 from django_filters.rest_framework import DjangoFilterBackend  #django-filter
-from .serializers import BookSerializer, AuthorSerializer
+from .filters import BookFilter, RatingFilter
+from .serializers import BookSerializer, AuthorSerializer, GenreStatsSerializer
+from .serializers import ReportJobCreateSerializer, ReportJobSerializer, LeaderboardEntrySerializer
+from . import cache, jobs, search
 
 import os
-import matplotlib.pyplot as plt
 from django.http import FileResponse  # Muestra el
+import csv
+import hashlib
+import json
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, quote_etag
+import operator
+from functools import reduce
+import math
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 '''
 #Vista de Registro (Signup)
@@ -31,23 +52,161 @@ class LoginView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 '''
-#Vistas CRUD para Libros
+HUELLA = {'last_modified': Max('updated_at'), 'total': Count('pk', distinct=True)}
 
 
-class BookListCreateView(generics.ListCreateAPIView):
-    queryset = Book.objects.all()
-    serializer_class = BookSerializer
+def validadores(request, huella):
+    """ETag de una lista a partir de su huella: máximo updated_at + conteo.
+
+    No se envía Last-Modified: borrar una fila (o que salga del filtro) no mueve el máximo updated_at,
+    así que un If-Modified-Since solo respondería 304 con datos viejos. El conteo del ETag sí lo detecta.
+    """
+    last_modified = huella['last_modified']
+    return quote_etag(hashlib.md5(
+        f"{request.get_full_path()}|{last_modified and last_modified.isoformat()}|{huella['total']}".encode()
+    ).hexdigest())
+
+
+def con_validadores(response, etag):
+    response['ETag'] = etag
+    return response
+
+
+class ConditionalListMixin:
+    """GET condicional: ETag desde una sola consulta (máximo updated_at + conteo).
+
+    Si el cliente ya tiene la versión vigente se responde 304 sin serializar nada.
+    """
+
+    def get_fingerprint_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        etag = validadores(request, self.get_fingerprint_queryset().order_by().aggregate(**HUELLA))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        return con_validadores(super().list(request, *args, **kwargs), etag)
+
+
+class BookPagination(PageNumberPagination):
+    """Paginación opcional: sin ?page_size= la respuesta sigue siendo la lista completa."""
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class SearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+#Vistas CRUD para Libros
+
 
 class BookDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Book.objects.all()
+    queryset = Book.objects.with_api_relations()  # Consultas fijas por petición
     serializer_class = BookSerializer
 
 
-class BookListCreateView(generics.ListCreateAPIView):
-    queryset = Book.objects.all()
+class BookListCreateView(ConditionalListMixin, generics.ListCreateAPIView):
+    queryset = Book.objects.with_api_relations().order_by('pk')  # Consultas fijas sin importar cuántos libros
     serializer_class = BookSerializer
+    pagination_class = BookPagination  # ?page_size=200&page=3
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['genres']  # Filtra por genres=1
+    filterset_class = BookFilter  # genres, author, updated_since, rangos y ordering (ver filters.py)
+
+    def get_fingerprint_queryset(self):
+        return self.filter_queryset(Book.objects.all())  # Sin prefetch: solo se agrega
+
+
+class BookSearchView(generics.ListAPIView):
+    """Búsqueda de texto completo (?q=) por título, autor y biografía; resultados por relevancia y paginados."""
+    serializer_class = BookSerializer
+    pagination_class = SearchPagination
+
+    def get_queryset(self):
+        q = self.request.query_params.get('q', '').strip()
+        if not q:
+            raise ValidationError({'q': 'Este parámetro es obligatorio.'})
+        return search.buscar(Book.objects.with_api_relations(), q)
+
+class BookFingerprintView(APIView):
+    """Conteo y suma de ids del catálogo en una consulta: la sincronización incremental detecta bajas con ellos."""
+
+    def get(self, request):
+        huella = Book.objects.order_by().aggregate(count=Count('pk'), id_sum=Sum('pk'))
+        return Response({'count': huella['count'], 'id_sum': huella['id_sum'] or 0})
+
+class JSONLinesRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False, default=str) + '\n'  # Solo para errores
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return '\n'.join(f'{clave},{valor}' for clave, valor in (data or {}).items()) + '\n'  # Solo para errores
+
+
+class _Echo:
+    """Buffer mínimo para que csv.writer devuelva cada línea en lugar de acumularla."""
+    def write(self, value):
+        return value
+
+
+class BookExportView(APIView):
+    """Exporta el catálogo completo en JSON Lines o CSV con memoria constante.
+
+    Recorre los libros con un cursor del servidor (iterator) y carga los géneros por bloque;
+    el resumen de calificaciones sale de los agregados guardados en Book.
+    """
+    renderer_classes = [JSONLinesRenderer, CSVRenderer]
+    chunk_size = 2000
+    columnas = ['id', 'title', 'author', 'published_date', 'isbn', 'stock', 'download_url', 'genres', 'rating_count', 'average_rating']
+
+    def get_queryset(self):
+        return Book.objects.select_related('author').prefetch_related('genres').order_by('pk')
+
+    def filas(self):
+        for book in self.get_queryset().iterator(chunk_size=self.chunk_size):  # prefetch por bloque
+            yield {
+                'id': book.pk,
+                'title': book.title,
+                'author': book.author.name,
+                'published_date': book.published_date.isoformat(),
+                'isbn': book.isbn,
+                'stock': book.stock,
+                'download_url': book.download_url,
+                'genres': [genre.name for genre in book.genres.all()],
+                'rating_count': book.rating_count,
+                'average_rating': float(book.average_rating),
+            }
+
+    def get(self, request):
+        if request.accepted_renderer.format == 'csv':
+            contenido = self._csv(csv.writer(_Echo()))
+            extension = 'csv'
+        else:
+            contenido = (json.dumps(fila, ensure_ascii=False) + '\n' for fila in self.filas())
+            extension = 'jsonl'
+        response = StreamingHttpResponse(contenido, content_type=request.accepted_renderer.media_type + '; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="libros.{extension}"'
+        return response
+
+    def _csv(self, writer):
+        yield writer.writerow(self.columnas)
+        for fila in self.filas():
+            fila['genres'] = ', '.join(fila['genres'])
+            yield writer.writerow([fila[columna] for columna in self.columnas])
 
 
 class RatingCreateView(generics.CreateAPIView):
@@ -58,53 +217,361 @@ class RatingCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)  # Asigna automáticamente el usuario logueado
 
-class RatingListView(generics.ListAPIView):
+class RatingBulkCreateView(APIView):
+    """Crea o actualiza calificaciones en lote (upsert sobre user+book)."""
+    permission_classes = [permissions.IsAuthenticated]
+    max_items = 50000
+    batch_size = 1000
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Se esperaba una lista de calificaciones.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return Response({'detail': f'Máximo {self.max_items} calificaciones por lote.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        validos = []
+        for index, item in enumerate(items):
+            serializer = RatingBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                validos.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': serializer.errors}
+
+        try:
+            with transaction.atomic():
+                self.upsert(request, validos, results)
+        except IntegrityError:
+            # Un usuario borrado entre la validación y la escritura
+            return Response({'detail': 'Un usuario del lote dejó de existir; reintenta.'}, status=status.HTTP_409_CONFLICT)
+
+        resumen = {estado: 0 for estado in ('created', 'updated', 'duplicate', 'invalid')}
+        for result in results:
+            resumen[result['status']] += 1
+        return Response({**resumen, 'results': results})
+
+    def upsert(self, request, validos, results):
+        # Resuelve usuarios y libros con una consulta cada uno; los libros quedan bloqueados hasta el commit
+        # para que uno borrado entretanto no rompa el upsert
+        usernames = {data['user'] for _, data in validos if data.get('user') not in (None, request.user.username)}
+        user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk')) if usernames else {}
+        libros = Book.objects.select_for_update(no_key=True).filter(pk__in={data['book'] for _, data in validos})
+        book_ids = set(libros.values_list('pk', flat=True))
+
+        ratings = {}  # (user_id, book_id) -> (index, Rating); la última aparición gana
+        for index, data in validos:
+            username = data.get('user')
+            if username is None or username == request.user.username:
+                user_id = request.user.pk
+            elif not request.user.is_staff:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'user': ['Solo el personal puede calificar en nombre de otros usuarios.']}}
+                continue
+            elif username not in user_ids:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'user': [f'El usuario "{username}" no existe.']}}
+                continue
+            else:
+                user_id = user_ids[username]
+            if data['book'] not in book_ids:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'book': [f'El libro {data["book"]} no existe.']}}
+                continue
+
+            key = (user_id, data['book'])
+            if key in ratings:
+                anterior = ratings[key][0]
+                results[anterior] = {'index': anterior, 'status': 'duplicate', 'superseded_by': index}
+            ratings[key] = (index, Rating(user_id=user_id, book_id=data['book'], score=data['score'], comment=data.get('comment')))
+
+        if ratings:
+            # Pares exactos: un Q por usuario con sus libros (normalmente uno solo)
+            por_usuario = {}
+            for user_id, book_id in ratings:
+                por_usuario.setdefault(user_id, set()).add(book_id)
+            existentes = set(Rating.objects.filter(
+                reduce(operator.or_, (Q(user_id=user_id, book_id__in=libros) for user_id, libros in por_usuario.items()))
+            ).values_list('user_id', 'book_id'))
+            Rating.objects.bulk_create(
+                [rating for _, rating in ratings.values()],
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=['user', 'book'],
+                update_fields=['score', 'comment', 'updated_at'],
+            )
+            # Un solo recálculo por libro afectado, no uno por fila
+            book_ids = {book_id for _, book_id in ratings}
+            Book.objects.filter(pk__in=book_ids).rebuild_rating_aggregates()
+            GenreStats.objects.for_books(book_ids).rebuild()
+            LeaderboardEntry.objects.refresh_books(book_ids)
+            transaction.on_commit(cache.invalidate)  # bulk_create no emite post_save
+            for key, (index, _) in ratings.items():
+                results[index] = {'index': index, 'status': 'updated' if key in existentes else 'created'}
+
+
+class RatingListView(ConditionalListMixin, generics.ListAPIView):
     serializer_class = RatingSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = RatingFilter  # updated_since=<ISO 8601>
 
     def get_queryset(self):
         book_id = self.kwargs['book_id']
-        return Rating.objects.filter(book_id=book_id)
+        return Rating.objects.filter(book_id=book_id).select_related('user')
     
 class BookRecommendationView(APIView):
     def get(self, request):
         # Parámetros del usuario (ej: /api/books/recommend/?genres=1,2&min_rating=4)
-        genre_ids = request.GET.get('genres', '').split(',')  # Ej: '1,2' → [1, 2]
+        genre_ids = sorted({g.strip() for g in request.GET.get('genres', '').split(',') if g.strip()})  # Ej: '2,1' → ['1', '2']
         min_rating = float(request.GET.get('min_rating', 0))  # Valoración mínima
 
-        # Filtra libros que tengan AL MENOS UNO de los géneros solicitados
-        books = Book.objects.filter(
-            genres__id__in=genre_ids
-        ).annotate(
-            avg_rating=Avg('rating__score')  # Anotación para el promedio
-        ).filter(
-            avg_rating__gte=min_rating  # Filtra por valoración mínima
-        ).order_by(
-            '-avg_rating'  # Ordena de mejor a peor valoración
-        ).distinct()  # Evita duplicados
-
-        # Serializa los resultados
-        serializer = BookSerializer(books, many=True)
-        return Response(serializer.data)
+        def calcular():
+            # Filtra libros que tengan AL MENOS UNO de los géneros solicitados
+            books = Book.objects.filter(
+                genres__id__in=genre_ids
+            ).annotate(
+                avg_rating=Avg('rating__score')  # Anotación para el promedio
+            ).filter(
+                avg_rating__gte=min_rating  # Filtra por valoración mínima
+            ).order_by(
+                '-avg_rating'  # Ordena de mejor a peor valoración
+            ).distinct().with_api_relations()  # Evita duplicados
+
+            # Serializa los resultados
+            return list(BookSerializer(books, many=True).data)
+
+        data, hit = cache.get_or_compute('recommend', {'genres': genre_ids, 'min_rating': min_rating}, calcular)
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
     
+class RecommendedForMeView(APIView):
+    """Recomendaciones item–item para el usuario autenticado (?limit=10). Usa el modelo precalculado:
+    no consulta la tabla de calificaciones, solo los libros elegidos."""
+    permission_classes = [permissions.IsAuthenticated]
+    max_limit = 50
+
+    def get(self, request):
+        from . import recomendador  # numpy/scipy solo cuando se usa
+
+        try:
+            limit = min(max(int(request.GET.get('limit', 10)), 1), self.max_limit)
+        except ValueError:
+            raise ValidationError({'limit': 'Debe ser un número entero.'})
+        modelo = recomendador.obtener_modelo()
+        if modelo is None:
+            return Response(
+                {'error': 'El modelo de recomendaciones aún no se ha entrenado'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        ids = modelo.recomendar(request.user.pk, limit)
+        libros = Book.objects.select_related('author').in_bulk(ids)
+        data = [
+            {'id': libro.pk, 'title': libro.title, 'author': libro.author.name, 'average_rating': libro.average_rating}
+            for libro in (libros.get(pk) for pk in ids) if libro is not None  # Borrados desde el entrenamiento
+        ]
+        return Response(data)
+
 class LibrosAnalisisView(APIView):
     def get(self, request):
-        libros = Book.objects.annotate(
-            avg_rating=Avg('rating__score')
-        ).values('id', 'title', 'genres', 'avg_rating')
-        return Response(list(libros))
+        def calcular():
+            libros = Book.objects.annotate(
+                avg_rating=Avg('rating__score')
+            ).values('id', 'title', 'genres', 'avg_rating')
+            return list(libros)
+
+        data, hit = cache.get_or_compute('analisis', {}, calcular)
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+    
+class GenreStatsView(generics.ListAPIView):
+    """Estadísticas precalculadas por género (libros, calificaciones, promedio y distribución)."""
+    queryset = GenreStats.objects.select_related('genre').order_by('genre_id')
+    serializer_class = GenreStatsSerializer
     
+class LeaderboardView(APIView):
+    """Top-N precalculado (?genre=<id>, sin él: global; ?min_ratings= de LEADERBOARD_MIN_RATINGS; ?limit=).
+
+    Lee a lo sumo LEADERBOARD_SIZE filas de LeaderboardEntry: el costo no depende del tamaño del catálogo.
+    """
+
+    def get(self, request):
+        try:
+            genre_id = int(request.GET['genre']) if request.GET.get('genre') else None
+            min_ratings = int(request.GET.get('min_ratings', settings.LEADERBOARD_MIN_RATINGS[0]))
+            limit = min(max(int(request.GET.get('limit', settings.LEADERBOARD_SIZE)), 1), settings.LEADERBOARD_SIZE)
+        except ValueError:
+            raise ValidationError('genre, min_ratings y limit deben ser números enteros.')
+        if min_ratings not in settings.LEADERBOARD_MIN_RATINGS:
+            raise ValidationError({'min_ratings': f'Valores disponibles: {list(settings.LEADERBOARD_MIN_RATINGS)}'})
+        entradas = LeaderboardEntry.objects.board(genre_id, min_ratings).select_related('book')[:limit]
+        results = LeaderboardEntrySerializer(entradas, many=True).data
+        for rank, entrada in enumerate(results, 1):
+            entrada['rank'] = rank
+        return Response({'genre': genre_id, 'min_ratings': min_ratings, 'results': results})
+
+class ReportJobCreateView(APIView):
+    """Encola un reporte (PDF/Excel) para un conjunto de géneros; peticiones idénticas en curso comparten trabajo."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = ReportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, creado = jobs.solicitar(
+            serializer.validated_data['genres'], serializer.validated_data['format'], request.user
+        )
+        return Response(
+            ReportJobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED if creado else status.HTTP_200_OK,
+        )
+
+class ReportJobDetailView(generics.RetrieveAPIView):
+    """Estado del trabajo; cuando termina incluye download_url."""
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobSerializer
+
+class ReportJobDownloadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        job = generics.get_object_or_404(ReportJob, pk=pk)
+        if job.status != ReportJob.DONE:
+            return Response({'status': job.status, 'error': job.error or None}, status=status.HTTP_409_CONFLICT)
+        if not os.path.exists(job.file):
+            return Response({'error': 'El archivo del reporte ya no existe'}, status=status.HTTP_410_GONE)
+        return FileResponse(open(job.file, 'rb'), as_attachment=True, filename=os.path.basename(job.file))
+
 class LibrosPorGeneroView(APIView):
     def get(self, request):
         genre_id = request.GET.get('genre_id')
         min_rating = float(request.GET.get('min_rating', 0))
-        
-        libros = Book.objects.filter(
-            genres__id=genre_id
-        ).annotate(
-            avg_rating=Avg('rating__score')
-        ).filter(
-            avg_rating__gte=min_rating
-        ).order_by('-avg_rating')
-        
-        serializer = BookSerializer(libros, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+
+        def calcular():
+            libros = Book.objects.filter(
+                genres__id=genre_id
+            ).annotate(
+                avg_rating=Avg('rating__score')
+            ).filter(
+                avg_rating__gte=min_rating
+            ).order_by('-avg_rating').with_api_relations()
+            return list(BookSerializer(libros, many=True).data)
+
+        params = {'genre_id': genre_id.strip() if genre_id else None, 'min_rating': min_rating}
+        data, hit = cache.get_or_compute('por-genero', params, calcular)
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+
+# Vistas asíncronas de solo lectura (/api/books/async/...): mismas respuestas que sus equivalentes
+# síncronas, con el ORM async de Django. Bajo ASGI no ocupan un hilo del adaptador mientras esperan.
+
+def _json(data, status=200, headers=None):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json', headers=headers)
+
+
+def _filtrar(filterset):
+    # Algunos filtros (genres, author) validan contra la base: se evalúa en el hilo del ORM
+    return filterset.qs if filterset.is_valid() else None
+
+
+async def _lista(queryset, chunk_size=2000):
+    return [obj async for obj in queryset.aiterator(chunk_size=chunk_size)]
+
+
+async def _listar_condicional(request, queryset, serializer_class, pagination=None):
+    """GET condicional como ConditionalListMixin: primero la huella y, si no hay 304, las filas."""
+    page_size = pagination.get_page_size(Request(request)) if pagination else None
+    numero = None  # None con page_size: ?page=last, se resuelve al conocer el total
+    filas = queryset
+    if page_size:
+        page = request.GET.get(pagination.page_query_param, 1)
+        try:
+            numero = None if page == 'last' else int(page)
+        except ValueError:
+            numero = 0
+        if numero is not None and numero < 1:
+            return _json({'detail': pagination.invalid_page_message}, status=404)
+        filas = None if numero is None else queryset[(numero - 1) * page_size:numero * page_size]
+
+    # Huella y filas en serie: el ORM async corre todas las consultas en el mismo hilo, agruparlas no las solapa
+    huella = await queryset.order_by().aaggregate(**HUELLA)
+    etag = validadores(request, huella)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    if page_size:
+        paginas = max(math.ceil(huella['total'] / page_size), 1)
+        if numero is None:
+            numero = paginas
+            filas = queryset[(numero - 1) * page_size:numero * page_size]
+        elif numero > paginas:
+            return _json({'detail': pagination.invalid_page_message}, status=404)
+    objetos = await _lista(filas)
+    data = serializer_class(objetos, many=True).data
+    if page_size:
+        url = request.build_absolute_uri()
+        anterior = None
+        if numero == 2:
+            anterior = remove_query_param(url, pagination.page_query_param)
+        elif numero > 2:
+            anterior = replace_query_param(url, pagination.page_query_param, numero - 1)
+        data = {
+            'count': huella['total'],
+            'next': replace_query_param(url, pagination.page_query_param, numero + 1) if numero < paginas else None,
+            'previous': anterior,
+            'results': data,
+        }
+    return con_validadores(_json(data), etag)
+
+
+class AsyncBookListView(View):
+    """GET /api/books/ en versión async: mismos filtros, paginación opcional y ETag."""
+
+    async def get(self, request):
+        filterset = BookFilter(request.GET, queryset=Book.objects.order_by('pk'), request=request)
+        libros = await sync_to_async(_filtrar)(filterset)
+        if libros is None:
+            return _json(filterset.errors, status=400)
+        return await _listar_condicional(request, libros.with_api_relations(), BookSerializer, BookPagination())
+
+
+class AsyncBookDetailView(View):
+    async def get(self, request, pk):
+        try:
+            libro = await Book.objects.with_api_relations().aget(pk=pk)
+        except Book.DoesNotExist:
+            return _json({'detail': 'No Book matches the given query.'}, status=404)
+        return _json(BookSerializer(libro).data)
+
+
+class AsyncRatingListView(View):
+    async def get(self, request, book_id):
+        filterset = RatingFilter(request.GET, queryset=Rating.objects.filter(book_id=book_id).select_related('user'))
+        ratings = await sync_to_async(_filtrar)(filterset)
+        if ratings is None:
+            return _json(filterset.errors, status=400)
+        return await _listar_condicional(request, ratings, RatingSerializer)
+
+
+class AsyncBookRecommendationView(View):
+    async def get(self, request):
+        genre_ids = sorted({g.strip() for g in request.GET.get('genres', '').split(',') if g.strip()})
+        min_rating = float(request.GET.get('min_rating', 0))
+
+        async def calcular():
+            books = Book.objects.filter(
+                genres__id__in=genre_ids
+            ).annotate(
+                avg_rating=Avg('rating__score')
+            ).filter(
+                avg_rating__gte=min_rating
+            ).order_by('-avg_rating').distinct().with_api_relations()
+            return list(BookSerializer(await _lista(books), many=True).data)
+
+        data, hit = await cache.aget_or_compute('recommend', {'genres': genre_ids, 'min_rating': min_rating}, calcular)
+        return _json(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+
+class AsyncLibrosAnalisisView(View):
+    async def get(self, request):
+        async def calcular():
+            libros = Book.objects.annotate(avg_rating=Avg('rating__score')).values('id', 'title', 'genres', 'avg_rating')
+            return [fila async for fila in libros]
+
+        data, hit = await cache.aget_or_compute('analisis', {}, calcular)
+        return _json(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
@@ -0,0 +1,330 @@
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase, mock
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+import analisis_libros
+
+
+def libro_api(i, updated_at=None):
+    """Libro con la misma forma que devuelve BookSerializer."""
+    return {
+        'id': i,
+        'title': f'Libro {i}',
+        'genres': [{'id': i % 3 + 1, 'name': f'Género {i % 3 + 1}'}],
+        'ratings': [{'id': i, 'user': 'lector', 'score': i % 5 + 1}],
+        'updated_at': updated_at or f'2025-07-{i:02d}T10:00:00Z',
+    }
+
+
+class ApiSustituta(BaseHTTPRequestHandler):
+    """Imita /api/books/ con paginación opcional y updated_since.
+
+    La primera petición a la página 2 falla con 503 salvo que `fallo_enviado` ya sea True.
+    """
+    max_page_size = 1000
+
+    def do_GET(self):
+        servidor = self.server
+        with servidor.lock:
+            servidor.en_curso += 1
+            servidor.max_en_curso = max(servidor.max_en_curso, servidor.en_curso)
+            servidor.peticiones += 1
+            servidor.consultas.append(self.path)
+        try:
+            time.sleep(0.05)
+            params = {clave: valor[0] for clave, valor in parse_qs(urlparse(self.path).query).items()}
+            if params.get('page') == '2' and not servidor.fallo_enviado:
+                servidor.fallo_enviado = True
+                return self._responder(503, {'detail': 'ocupado'})
+            libros = servidor.libros
+            if urlparse(self.path).path.endswith('/huella/'):
+                return self._responder(200, {'count': len(libros), 'id_sum': sum(libro['id'] for libro in libros)})
+            if 'updated_since' in params:
+                desde = pd.Timestamp(params['updated_since'])
+                libros = [libro for libro in libros if pd.Timestamp(libro['updated_at']) >= desde]
+            if 'page_size' not in params:
+                return self._responder(200, libros)
+            page_size = min(int(params['page_size']), self.max_page_size)
+            inicio = (int(params.get('page', 1)) - 1) * page_size
+            self._responder(200, {
+                'count': len(libros),
+                'results': libros[inicio:inicio + page_size],
+            })
+        finally:
+            with servidor.lock:
+                servidor.en_curso -= 1
+
+    def _responder(self, status, data):
+        cuerpo = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ApiSustitutaTestCase(TestCase):
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), ApiSustituta)
+        self.servidor.lock = threading.Lock()
+        self.servidor.en_curso = self.servidor.max_en_curso = self.servidor.peticiones = 0
+        self.servidor.consultas = []
+        self.servidor.fallo_enviado = False
+        self.servidor.libros = [libro_api(i) for i in range(1, 8)]
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        self.url = f'http://127.0.0.1:{self.servidor.server_port}/api/books/'
+
+
+class FetchLibrosTests(ApiSustitutaTestCase):
+
+    def fetch(self, **kwargs):
+        kwargs.setdefault('backoff', 0)
+        with redirect_stdout(io.StringIO()):
+            return analisis_libros.fetch_libros_desde_api(self.url, **kwargs)
+
+    def test_une_paginas_en_orden_y_reintenta(self):
+        df = self.fetch(page_size=2, max_workers=2)
+        self.assertEqual(df['title'].tolist(), [f'Libro {i}' for i in range(1, 8)])
+        self.assertTrue(self.servidor.fallo_enviado)
+        self.assertEqual(self.servidor.peticiones, 5)  # 4 páginas + 1 reintento
+
+    def test_paralelismo_acotado(self):
+        self.fetch(page_size=1, max_workers=3)
+        self.assertGreater(self.servidor.max_en_curso, 1)
+        self.assertLessEqual(self.servidor.max_en_curso, 3)
+
+    def test_respeta_limite_de_pagina_del_servidor(self):
+        ApiSustituta.max_page_size = 3
+        self.addCleanup(setattr, ApiSustituta, 'max_page_size', 1000)
+        df = self.fetch(page_size=100)
+        self.assertEqual(len(df), 7)
+
+    def test_error_persistente_devuelve_dataframe_vacio(self):
+        df = self.fetch(page_size=2, reintentos=0)
+        self.assertTrue(df.empty)
+
+
+class SnapshotTests(ApiSustitutaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.servidor.fallo_enviado = True  # Sin 503: aquí se cuentan las peticiones
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, True)
+
+    def cargar(self):
+        with redirect_stdout(io.StringIO()):
+            return analisis_libros.cargar_libros(self.url, self.directorio, page_size=3, backoff=0)
+
+    def test_catalogo_sin_cambios_no_vuelve_a_descargar(self):
+        completo = self.cargar()
+        self.servidor.consultas.clear()
+        df = self.cargar()
+        # Delta (solo el libro dentro del margen de solape) + huella (conteo y suma de ids)
+        self.assertEqual(len(self.servidor.consultas), 2)
+        self.assertIn('updated_since=', self.servidor.consultas[0])
+        pd.testing.assert_frame_equal(df, completo)
+
+    def test_delta_aplica_altas_y_modificaciones(self):
+        self.cargar()
+        modificado = libro_api(2, updated_at='2025-08-01T00:00:00Z')
+        modificado['title'] = 'Libro 2 revisado'
+        modificado['ratings'].append({'id': 99, 'user': 'otro', 'score': 1})
+        self.servidor.libros[1] = modificado
+        self.servidor.libros.append(libro_api(8, updated_at='2025-08-01T00:00:00Z'))
+        df = self.cargar()
+        self.assertEqual(len(df), 8)
+        fila = df[df['id'] == 2].iloc[0]
+        self.assertEqual(fila['title'], 'Libro 2 revisado')
+        self.assertEqual([r['score'] for r in fila['ratings']], [3, 1])
+
+    def test_bajas_fuerzan_descarga_completa(self):
+        self.cargar()
+        del self.servidor.libros[0]
+        df = self.cargar()
+        self.assertEqual(df['id'].tolist(), list(range(2, 8)))
+
+    def test_alta_y_baja_con_el_mismo_conteo_fuerzan_descarga_completa(self):
+        self.cargar()
+        del self.servidor.libros[0]
+        self.servidor.libros.append(libro_api(8, updated_at='2025-01-01T00:00:00Z'))  # Fuera del delta
+        df = self.cargar()
+        self.assertEqual(df['id'].tolist(), list(range(2, 9)))
+
+    def test_sin_pyarrow_descarga_completa(self):
+        with mock.patch.object(pd.DataFrame, 'to_feather', side_effect=ImportError), \
+                mock.patch.object(pd, 'read_feather', side_effect=ImportError):
+            self.cargar()
+            self.servidor.consultas.clear()
+            df = self.cargar()
+        self.assertEqual(len(df), 7)
+        self.assertNotIn('updated_since=', self.servidor.consultas[0])
+
+    def test_sin_conexion_usa_el_snapshot(self):
+        completo = self.cargar()
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        with redirect_stdout(io.StringIO()):
+            df = analisis_libros.cargar_libros(self.url, self.directorio, reintentos=0, timeout=0.5)
+        pd.testing.assert_frame_equal(df, completo)
+
+
+def analisis_referencia(df, genero_usuario):
+    """Algoritmo original (un recorrido por género) usado como oráculo."""
+    promedios = df['ratings'].apply(lambda x: round(sum(r['score'] for r in x) / len(x), 2) if x else 0)
+    generos = {}
+    for lista in df['genres']:
+        for g in lista:
+            generos.setdefault(g['id'], g['name'])
+    por_genero = []
+    for genero_id, nombre in generos.items():
+        mascara = df['genres'].apply(lambda x: genero_id in [g['id'] for g in x])
+        por_genero.append((genero_id, nombre, round(promedios[mascara].mean(), 2)))
+    mascara = df['genres'].apply(lambda x: genero_usuario in [g['id'] for g in x])
+    return promedios.tolist(), por_genero, max(por_genero, key=lambda x: x[2]), df[mascara]['title'].tolist()
+
+
+class AnalizarLibrosTests(TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        generos = [{'id': i, 'name': f'Género {i}'} for i in range(1, 25)]
+        self.df = pd.DataFrame([
+            {
+                'title': f'Libro {i}',
+                'genres': rng.sample(generos, rng.randint(0, 3)),
+                'ratings': [{'score': rng.randint(1, 5)} for _ in range(rng.randint(0, 6))],
+            }
+            for i in range(800)
+        ])
+
+    def analizar(self, df, genero=None):
+        with redirect_stdout(io.StringIO()):
+            return analisis_libros.analizar_libros(df, genero)
+
+    def test_coincide_con_el_algoritmo_original(self):
+        promedios, por_genero, mejor, titulos_genero = analisis_referencia(self.df, 5)
+        resultados = self.analizar(self.df, 5)
+        self.assertEqual(self.df['avg_rating'].tolist(), promedios)
+        self.assertEqual(resultados['promedio_generos'], {
+            'ids': [g[0] for g in por_genero],
+            'nombres': [g[1] for g in por_genero],
+            'promedios': [g[2] for g in por_genero],
+        })
+        self.assertEqual(resultados['genero_mas_valorado'], mejor)
+        self.assertEqual(resultados['genero_actual'], {'id': 5, 'nombre': 'Género 5'})
+        self.assertTrue(set(resultados['top_3_genero']['title']) <= set(titulos_genero))
+        self.assertEqual(
+            resultados['top_3_genero']['avg_rating'].tolist(),
+            sorted(self.df[self.df['title'].isin(titulos_genero)]['avg_rating'], reverse=True)[:3],
+        )
+
+    def test_indice_no_consecutivo(self):
+        df = self.df.set_index(self.df.index * 2)
+        resultados = self.analizar(df)
+        self.assertEqual(len(resultados['promedio_generos']['ids']), 24)
+
+    def test_sin_generos(self):
+        df = pd.DataFrame([{'title': 'Solo', 'genres': [], 'ratings': [{'score': 4}]}])
+        resultados = self.analizar(df)
+        self.assertIsNone(resultados['genero_mas_valorado'])
+
+
+class GenerarReportesTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, True)
+        parche = mock.patch.object(analisis_libros, 'REPORTS_DIR', self.directorio)
+        parche.start()
+        self.addCleanup(parche.stop)
+        df = pd.DataFrame([libro_api(i) for i in range(1, 8)])
+        with redirect_stdout(io.StringIO()):
+            self.resultados = analisis_libros.analizar_libros(df, 1)
+        analisis_libros._renderizar_grafico.cache_clear()
+
+    def generar(self, paralelo):
+        with redirect_stdout(io.StringIO()) as salida:
+            exitos = analisis_libros.generar_reportes(self.resultados, paralelo=paralelo)
+        return exitos, salida.getvalue()
+
+    def test_genera_pdf_y_excel_en_paralelo(self):
+        exitos, salida = self.generar(paralelo=True)
+        self.assertTrue(all(exitos))
+        extensiones = sorted(os.path.splitext(nombre)[1] for nombre in os.listdir(self.directorio))
+        self.assertEqual(extensiones, ['.pdf', '.xlsx'])  # Sin PNG temporales
+        self.assertIn('⏱️ Tiempos: gráfico', salida)
+
+    def test_reutiliza_un_pool_spawn_entre_llamadas(self):
+        self.generar(paralelo=True)
+        pool = analisis_libros._pool()
+        exitos, _ = self.generar(paralelo=True)
+        self.assertTrue(all(exitos))
+        self.assertIs(analisis_libros._pool(), pool)
+        self.assertEqual(pool._mp_context.get_start_method(), 'spawn')
+        self.assertEqual({os.path.splitext(nombre)[1] for nombre in os.listdir(self.directorio)}, {'.pdf', '.xlsx'})
+
+    def test_grafico_se_reutiliza_si_los_datos_no_cambian(self):
+        self.generar(paralelo=False)
+        self.generar(paralelo=False)
+        info = analisis_libros._renderizar_grafico.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 1))
+
+
+class ModoLoteTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, True)
+        parche = mock.patch.object(analisis_libros, 'REPORTS_DIR', self.directorio)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.df = pd.DataFrame([libro_api(i) for i in range(1, 8)])
+
+    def test_top_n_de_todos_los_generos_en_una_pasada(self):
+        with redirect_stdout(io.StringIO()):
+            analisis_libros.analizar_libros(self.df)
+        tops = analisis_libros.top_n_por_genero(self.df, 2)
+        self.assertEqual(sorted(tops), [1, 2, 3])
+        for genero_id, (nombre, top) in tops.items():
+            with redirect_stdout(io.StringIO()):
+                esperado = analisis_libros.analizar_libros(self.df.copy(), genero_id)['top_3_genero']
+            self.assertEqual(nombre, f'Género {genero_id}')
+            self.assertEqual(top['avg_rating'].tolist(), esperado['avg_rating'].head(2).tolist())
+
+    def test_cli_genera_manifiesto_y_codigo_de_salida(self):
+        manifiesto = os.path.join(self.directorio, 'manifiesto.json')
+        with mock.patch.object(analisis_libros, 'cargar_libros', return_value=self.df), redirect_stdout(io.StringIO()):
+            codigo = analisis_libros.cli(['lote', '--workers', '2', '--manifest', manifiesto])
+        self.assertEqual(codigo, analisis_libros.EXIT_OK)
+        with open(manifiesto, encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+        self.assertEqual([r['genero_id'] for r in datos['reportes']], [1, 2, 3])
+        for reporte in datos['reportes']:
+            self.assertTrue(reporte['ok'])
+            self.assertTrue(os.path.exists(reporte['pdf']) and os.path.exists(reporte['excel']))
+
+    def test_cli_sin_datos(self):
+        with mock.patch.object(analisis_libros, 'cargar_libros', return_value=pd.DataFrame()):
+            codigo = analisis_libros.cli(['lote'])
+        self.assertEqual(codigo, analisis_libros.EXIT_SIN_DATOS)
+
+    def test_cli_generos_invalidos_sale_con_uso(self):
+        with mock.patch.object(analisis_libros, 'cargar_libros') as cargar, redirect_stderr(io.StringIO()) as errores:
+            with self.assertRaises(SystemExit) as salida:
+                analisis_libros.cli(['lote', '--generos', '1,dos'])
+        self.assertEqual(salida.exception.code, 2)
+        self.assertIn('usage:', errores.getvalue())
+        cargar.assert_not_called()